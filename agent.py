@@ -7,12 +7,17 @@ import asyncio
 import logging
 from dotenv import load_dotenv
 
-from livekit.agents import AutoSubscribe, JobContext, WorkerOptions, cli
+from livekit.agents import AutoSubscribe, JobContext, JobExecutorType, WorkerOptions, cli
 from livekit.agents.voice import Agent, AgentSession
 from livekit.plugins import google
 
 import config
-from automation_tools import ALL_TOOLS, get_browser
+from automation_tools import ALL_TOOLS, get_browser, release_browser, stop_demonstration
+from barge_in import BargeInMonitor
+from demo_queue import demo_queue
+from prewarm import prewarm, warmup
+from room_video import BrowserVideoPublisher
+from worker_load import default_capacity
 
 # Load environment variables
 load_dotenv()
@@ -26,27 +31,33 @@ async def entrypoint(ctx: JobContext):
     """Main entry point for each participant session"""
     
     logger.info(f"New teaching session started for room: {ctx.room.name}")
+    # A session loop that falls behind (audio, tools) counts towards the worker's load
+    default_capacity.probe.watch(asyncio.get_running_loop())
     
     # Wait for a participant to connect
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
     
-    # Pre-launch browser with Google Docs in the background
-    # This reduces latency when user asks for help
-    logger.info("Pre-launching browser with Google Docs...")
-    browser_task = asyncio.create_task(get_browser())
-    
-    # Wait for a participant
-    participant = await ctx.wait_for_participant()
-    logger.info(f"Learner joined: {participant.identity}")
-    
-    # Ensure browser is fully initialized before proceeding
-    try:
-        await browser_task
-        logger.info("✅ Browser pre-launched and ready!")
-    except Exception as e:
-        logger.warning(f"Browser pre-launch warning: {e}")
-    
+    browser_task = None
+    barge_in = None
+    video = None
     try:
+        # Lease a browser page with Google Docs in the background
+        # This reduces latency when user asks for help
+        logger.info("Leasing browser page with Google Docs...")
+        browser_task = asyncio.create_task(get_browser(ctx.room.name))
+        
+        # Wait for a participant
+        participant = await ctx.wait_for_participant()
+        logger.info(f"Learner joined: {participant.identity}")
+        
+        # Ensure browser is fully initialized before proceeding
+        browser = None
+        try:
+            browser = await browser_task
+            logger.info("✅ Browser pre-launched and ready!")
+        except Exception as e:
+            logger.warning(f"Browser pre-launch warning: {e}")
+        
         # Create AgentSession with Gemini Realtime API
         session = AgentSession(
             llm=google.realtime.RealtimeModel(
@@ -72,6 +83,23 @@ async def entrypoint(ctx: JobContext):
         
         logger.info("Session started")
         
+        # Let the learner interrupt a demonstration by talking over it
+        barge_in = BargeInMonitor(
+            on_barge_in=lambda: stop_demonstration(session, ctx.room.name),
+            armed=lambda: demo_queue.depth(ctx.room.name) > 0,
+        )
+        if barge_in.start(ctx.room):
+            logger.info("Barge-in detection enabled")
+        
+        # Let the learner watch the demonstrations when the browser has no window of its own
+        if browser:
+            video = BrowserVideoPublisher()
+            try:
+                if await video.start(ctx.room, browser):
+                    logger.info("Streaming the browser to the room")
+            except Exception as e:
+                logger.warning(f"Browser video unavailable: {e}")
+        
         # Generate greeting
         logger.info("Greeting learner...")
         await session.generate_reply(
@@ -99,6 +127,16 @@ async def entrypoint(ctx: JobContext):
         logger.error(f"Session error: {e}")
         raise
     finally:
+        if browser_task and not browser_task.done():
+            # The learner never joined; stop waiting for a page (release below frees it if it came)
+            browser_task.cancel()
+            await asyncio.gather(browser_task, return_exceptions=True)
+        if barge_in:
+            await barge_in.aclose()
+        if video:
+            await video.aclose()
+        # Recycle the page so nothing from this room leaks into the next one
+        await release_browser(ctx.room.name)
         logger.info("Teaching session ended")
 
 
@@ -106,5 +144,14 @@ if __name__ == "__main__":
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
+            # Run sessions as threads of one process so they share the browser pool
+            job_executor_type=JobExecutorType.THREAD,
+            # Open browser pages on Docs and Gemini connections before taking jobs,
+            # and report full load until that is done so rooms go to warm workers
+            prewarm_fnc=prewarm,
+            load_fnc=warmup.load,
+            # Refuse rooms once the browser pages, memory or event loops are saturated
+            request_fnc=default_capacity.request,
+            load_threshold=config.WORKER_LOAD_THRESHOLD,
         ),
     )
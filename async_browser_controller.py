@@ -0,0 +1,688 @@
+"""
+Async Browser Controller with Gemini Computer Use
+Drives pages with playwright.async_api directly on an event loop, without a browser thread
+"""
+import asyncio
+import time
+from typing import Optional, Dict, Any, Callable, List
+
+from playwright.async_api import async_playwright, Browser, Page, BrowserContext
+
+from google import genai
+from google.genai.types import Part
+
+import config
+from browser_controller import (
+    BROWSER_LAUNCH_ARGS, COMPUTER_USE_MODEL, INPUT_ACTIONS, KEYBOARD_HINT, SCREEN_HEIGHT, SCREEN_WIDTH, START_URL, SUMMARY_CONFIG,
+    SUMMARY_MODEL, acknowledge_safety, build_function_responses, candidate_from_calls, clean_model_text, client,
+    computer_use_config, default_encoder, fallback_summary, plan_function_call, settle_points, summary_contents,
+    teaching_prompt, usage_attrs,
+)
+from conversation_history import ConversationHistory, HistoryPolicy
+from screencast import mark_input
+from screenshot_encoding import ScreenshotEncoder, fingerprint_distance
+from trajectory_store import TrajectoryRecorder, TrajectoryStore, task_key
+from ui_settle import SettleDetector, default_settle
+from speech_pipeline import AsyncSpeechPipeline
+from narration import summary_cache
+from cancellation import CancelToken, DemoCancelled
+from browser_profile import BrowserProfile, default_profile
+from request_router import RequestRouter, default_router
+from tracing import ACTION, MODEL_REQUEST, REPLAY, SCREENSHOT, SETTLE, SPEECH_SUMMARY, THINKING, UI_SNAPSHOT, activate, current_trace, deactivate, record_since, span, tracer
+from streaming import CALL, TEXT, THOUGHT, ModelTurn, StreamedResponse
+from cassette import default_cassette
+from highlight_overlay import default_overlay
+from ui_snapshot import SNAPSHOT_INSTRUCTIONS, UiObserver, default_observer
+
+
+async def summarize_for_speech_async(verbose_text: str) -> str:
+    """
+    summarize_for_speech() through the async Gemini client.
+
+    Args:
+        verbose_text: The verbose model output
+
+    Returns:
+        Brief instructional guidance (e.g., "Click on the File menu")
+    """
+    try:
+        if len(verbose_text.split()) <= 10:
+            return verbose_text
+
+        cached = summary_cache.get(verbose_text)
+        if cached:
+            return cached
+
+        response = await client.aio.models.generate_content(
+            model=SUMMARY_MODEL,
+            contents=summary_contents(verbose_text),
+            config=SUMMARY_CONFIG
+        )
+
+        summary = response.text.strip().strip('"\'')
+        if not summary:
+            return verbose_text
+        summary_cache.put(verbose_text, summary)
+        return summary
+
+    except Exception as e:
+        print(f"Summarization error: {e}")
+        return fallback_summary(verbose_text)
+
+
+async def show_click_highlight_async(page, x: int, y: int, color: str = "#FF4444", duration: int = 800):
+    """show_click_highlight() for async Playwright pages (returns at once when HIGHLIGHT_FIRE_AND_FORGET)"""
+    await default_overlay.show_async(page, x, y, color, duration)
+
+
+async def run_page_ops_async(page, ops: List[tuple], cancel_token: Optional[CancelToken] = None):
+    """Run a plan from plan_function_call on an async Playwright page (pauses end early on cancellation)"""
+    for op, *op_args in ops:
+        if op == "highlight":
+            await show_click_highlight_async(page, *op_args)
+        elif op == "pause":
+            if cancel_token:
+                await cancel_token.sleep_async(op_args[0])
+            else:
+                await asyncio.sleep(op_args[0])
+        elif op == "click":
+            x, y, click_count = op_args
+            await page.mouse.click(x, y, click_count=click_count)
+        elif op == "dblclick":
+            await page.mouse.dblclick(*op_args)
+        elif op == "move":
+            x, y, steps = op_args
+            await page.mouse.move(x, y, steps=steps)
+        elif op == "down":
+            await page.mouse.down()
+        elif op == "up":
+            await page.mouse.up()
+        elif op == "wheel":
+            await page.mouse.wheel(*op_args)
+        elif op == "press":
+            await page.keyboard.press(op_args[0])
+        elif op == "type":
+            await page.keyboard.type(op_args[0])
+        elif op == "goto":
+            await page.goto(op_args[0])
+        elif op == "go_back":
+            await page.go_back()
+        else:
+            raise ValueError(f"Unknown page operation '{op}'")
+    mark_input(page)
+
+
+async def settle_page_async(page, settle: SettleDetector, action: str):
+    """settle_page() for async Playwright pages"""
+    with span(SETTLE, action=action):
+        settled_in = await settle.wait_async(page)
+    print(f"  UI settled in {settled_in:.2f}s")
+
+
+async def execute_function_call_async(function_call, page, screen_width, screen_height, settle: Optional[SettleDetector] = None, cancel_token: Optional[CancelToken] = None, wait: bool = True):
+    """execute_function_call() for async Playwright pages."""
+    settle = settle or default_settle
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+    fname = function_call.name
+    args = function_call.args
+    print(f"  -> Executing: {fname}")
+
+    action_result = acknowledge_safety(args)
+
+    try:
+        with span(ACTION, action=fname):
+            await run_page_ops_async(page, plan_function_call(fname, args, screen_width, screen_height), cancel_token)
+
+        # Wait for potential navigations/renders to settle
+        if wait:
+            await settle_page_async(page, settle, fname)
+
+    except DemoCancelled:
+        raise
+    except Exception as e:
+        print(f"Error executing {fname}: {e}")
+        action_result["error"] = str(e)
+
+    return fname, action_result
+
+
+async def execute_function_calls_async(candidate, page, screen_width, screen_height, settle: Optional[SettleDetector] = None, cancel_token: Optional[CancelToken] = None):
+    """execute_function_calls() for async Playwright pages."""
+    function_calls = [part.function_call for part in candidate.content.parts if part.function_call]
+    results = []
+    for function_call, wait in zip(function_calls, settle_points(function_calls)):
+        results.append(await execute_function_call_async(function_call, page, screen_width, screen_height, settle, cancel_token, wait))
+    return results
+
+
+async def get_function_responses_async(page, results, encoder: Optional[ScreenshotEncoder] = None, observer: Optional[UiObserver] = None):
+    """get_function_responses() for async Playwright pages."""
+    encoder = encoder or default_encoder
+    observation = None
+    if observer and observer.enabled:
+        with span(UI_SNAPSHOT) as attrs:
+            observation = await observer.observe_async(page)
+            attrs.update(changed=round(observation.changed, 3), screenshot=observation.screenshot)
+    screenshot_bytes = None
+    if observation is None or observation.screenshot:
+        with span(SCREENSHOT, encoding=encoder.describe()) as attrs:
+            screenshot_bytes = await encoder.capture_async(page)
+            attrs["bytes"] = len(screenshot_bytes)
+    else:
+        print(f"📝 UI changed {observation.changed:.0%}, sending the snapshot without a screenshot")
+    return build_function_responses(results, page.url, screenshot_bytes, encoder.mime_type, observation.text if observation else None)
+
+
+class AsyncBrowserAutomation:
+    """
+    BrowserAutomation on async Playwright.
+
+    Everything (actions, screenshots, Gemini calls, speech) runs as
+    coroutines on the event loop that owns the page, so there is no browser
+    thread to hop to and several pages can be driven at once on one loop.
+    When execute_task is awaited from another loop (a pooled page living on
+    a pool host), the whole task is scheduled there in one go.
+    """
+
+    def __init__(self, gemini_client: Optional[genai.Client] = None, history_policy: Optional[HistoryPolicy] = None, screenshot_encoder: Optional[ScreenshotEncoder] = None, trajectory_store: Optional[TrajectoryStore] = None, settle_detector: Optional[SettleDetector] = None, profile: Optional[BrowserProfile] = None, router: Optional[RequestRouter] = None, ui_observer: Optional[UiObserver] = None):
+        # Loop that owns this instance's Playwright objects
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # False when the page is leased from a BrowserPool, which then owns the browser's lifecycle
+        self.owns_browser = True
+        self.client = gemini_client or client
+        self.history_policy = history_policy or HistoryPolicy()
+        self.screenshot_encoder = screenshot_encoder or default_encoder
+        self.trajectory_store = trajectory_store or TrajectoryStore()
+        self.settle_detector = settle_detector or default_settle
+        self.profile = profile or default_profile
+        self.router = router or default_router
+        self.ui_observer = ui_observer or default_observer
+        self.stream_responses = config.STREAM_RESPONSES
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.is_initialized = False
+        self.screen_width = SCREEN_WIDTH
+        self.screen_height = SCREEN_HEIGHT
+
+    async def attach(self, browser: Browser, context: BrowserContext, page: Page):
+        """
+        Drive an existing page (leased from a BrowserPool) instead of launching a browser.
+        Must run on the loop that owns the page.
+        """
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.owns_browser = False
+        self._loop = asyncio.get_running_loop()
+        await self.settle_detector.install_async(page)
+        await default_overlay.install_async(page)
+        self.is_initialized = True
+
+    async def initialize(self) -> bool:
+        """Launch the browser on the current event loop"""
+        if self.is_initialized and self.is_alive():
+            return True
+        if not self.owns_browser:
+            # Pooled pages are recycled by the pool, never relaunched here
+            return self.is_initialized
+
+        try:
+            print("Initializing browser (async)...")
+            self.playwright = await async_playwright().start()
+            self.profile.ensure_healthy()
+            if self.profile.persistent:
+                try:
+                    self.context = await self._launch_persistent()
+                except Exception as e:
+                    print(f"⚠️ Could not open browser profile ({e}), resetting it")
+                    self.profile.reset()
+                    self.context = await self._launch_persistent()
+                self.browser = self.context.browser
+                self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+            else:
+                self.browser = await self.playwright.chromium.launch(
+                    headless=config.BROWSER_HEADLESS,
+                    args=self.profile.launch_args(BROWSER_LAUNCH_ARGS)
+                )
+                self.context = await self.browser.new_context(
+                    **self.profile.context_options(self.screen_width, self.screen_height)
+                )
+                self.page = await self.context.new_page()
+            await self.router.install_async(self.context)
+            self._loop = asyncio.get_running_loop()
+            await self.settle_detector.install_async(self.page)
+            await default_overlay.install_async(self.page)
+            # Navigate to Google Docs by default
+            await self.page.goto(START_URL)
+            self.is_initialized = True
+            print("✅ Browser initialized successfully")
+            return True
+        except Exception as e:
+            print(f"❌ Browser initialization failed: {e}")
+            return False
+
+    async def close(self):
+        """Close the browser"""
+        if not self.owns_browser:
+            # Pooled pages go back to their pool (see BrowserPool.release)
+            self.is_initialized = False
+            return
+        try:
+            if self.browser or self.context:
+                await self._on_own_loop(self._close_browser())
+            self.is_initialized = False
+            print("🔒 Browser closed")
+        except Exception as e:
+            print(f"❌ Error closing browser: {e}")
+
+    def is_alive(self) -> bool:
+        """Whether the browser is still running (a persistent context has no Browser object)"""
+        if self.browser:
+            return self.browser.is_connected()
+        return bool(self.page and not self.page.is_closed())
+
+    async def _launch_persistent(self) -> BrowserContext:
+        """Chromium on the profile's user-data directory"""
+        return await self.playwright.chromium.launch_persistent_context(
+            self.profile.user_data_dir,
+            headless=config.BROWSER_HEADLESS,
+            args=self.profile.launch_args(BROWSER_LAUNCH_ARGS),
+            viewport={"width": self.screen_width, "height": self.screen_height}
+        )
+
+    async def _close_browser(self):
+        if self.context:
+            try:
+                self.profile.save_storage_state(await self.context.storage_state())
+            except Exception as e:
+                print(f"Could not save browser storage state: {e}")
+        if self.browser:
+            await self.browser.close()
+        elif self.context:
+            await self.context.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    async def run_on_browser(self, coro):
+        """Await a coroutine that uses the page on the loop that owns it"""
+        return await self._on_own_loop(coro)
+
+    async def _on_own_loop(self, coro):
+        """Await a coroutine on the loop that owns the page, from whichever loop we are on"""
+        if self._loop is None or self._loop is asyncio.get_running_loop():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def execute_task(self, task_prompt: str, turn_limit: int = 15, speech_callback: Optional[Callable] = None, lesson_id: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
+        """
+        Execute a browser automation task using Gemini Computer Use.
+
+        Args:
+            task_prompt: The task to perform
+            turn_limit: Maximum number of turns to prevent infinite loops
+            speech_callback: Optional async callback function to speak text aloud
+            lesson_id: Known lesson the task matched, so differently phrased questions share one recording
+            cancel_token: Stops the demonstration between model turns and actions when cancelled
+
+        Returns:
+            Dict with success status and result message
+        """
+        try:
+            if not await self.initialize():
+                return {"success": False, "error": "The browser is not available"}
+
+            print(f"\n{'='*50}")
+            print(f"Goal: {task_prompt}")
+            print(f"{'='*50}\n")
+
+            # Speech is delivered on the caller's loop, wherever the page lives
+            caller_loop = asyncio.get_running_loop()
+            return await self._on_own_loop(self._run_task(task_prompt, turn_limit, speech_callback, caller_loop, lesson_id, cancel_token))
+
+        except Exception as e:
+            print(f"Task execution failed: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def _run_task(self, task_prompt: str, turn_limit: int, speech_callback: Optional[Callable] = None, event_loop: Optional[asyncio.AbstractEventLoop] = None, lesson_id: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
+        """Replay a recorded demonstration if one matches, otherwise run the live agent loop"""
+        key = f"lesson:{lesson_id}" if lesson_id else task_key(task_prompt)
+        recorder = TrajectoryRecorder(task_prompt, key) if config.TRAJECTORY_RECORDING else None
+        trace = tracer.start_demo(task_prompt, backend="async", streamed=self.stream_responses)
+        trace_token = activate(trace)
+        summarizer = trace.timed_async(SPEECH_SUMMARY, summarize_for_speech_async) if trace else summarize_for_speech_async
+        speech = AsyncSpeechPipeline(speech_callback, event_loop, summarizer)
+        result = {}
+
+        try:
+            if config.TRAJECTORY_REPLAY:
+                trajectory = self.trajectory_store.load(key)
+                if trajectory:
+                    with span(REPLAY):
+                        result = await self._replay_trajectory(trajectory, speech, recorder, cancel_token)
+                    if result:
+                        return result
+
+            result = await self._run_agent_loop(task_prompt, turn_limit, speech, recorder, cancel_token)
+            return result
+        except DemoCancelled as e:
+            print(f"⏹️ Demonstration stopped: {e}")
+            speech.cancel()
+            await self._restore_page()
+            result = {"success": False, "cancelled": True, "error": f"Demonstration stopped ({e})"}
+            return result
+        finally:
+            # Let the last steps be spoken before reporting the demonstration as done
+            await speech.close(timeout=config.SPEECH_FLUSH_TIMEOUT)
+            stats = summary_cache.stats()
+            print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+            if default_cassette.mode != "off":
+                tape = default_cassette.stats()
+                print(f"Gemini cassette: {tape['recorded']} recorded, {tape['replayed']} replayed ({tape['model_seconds']:.1f}s of model time), {tape['misses']} missed")
+            if trace:
+                trace.finish(success=bool(result and result.get("success")), cancelled=bool(result and result.get("cancelled")), replayed=bool(result and result.get("replayed")))
+            deactivate(trace_token)
+
+    async def _restore_page(self):
+        """After a stopped demonstration: release a held mouse button and close any open menu or dialog"""
+        try:
+            await self.page.mouse.up()
+            await self.page.keyboard.press("Escape")
+        except Exception as e:
+            print(f"Could not tidy up the page: {e}")
+
+    async def _generate(self, contents, model_config, cancel_token: Optional[CancelToken] = None):
+        """Ask the model for the next step; the request is cancelled along with the demonstration"""
+        request = self.client.aio.models.generate_content(model=COMPUTER_USE_MODEL, contents=contents, config=model_config)
+        if cancel_token is None:
+            return await request
+        return await cancel_token.run_async(request)
+
+    async def _stream_turn(self, contents, model_config, speech: AsyncSpeechPipeline, cancel_token: Optional[CancelToken] = None) -> ModelTurn:
+        """
+        _stream_turn_sync() on the event loop: the response is read by a separate
+        task so it keeps arriving while the first action runs.
+        """
+        turn = ModelTurn()
+        response = StreamedResponse()
+        chunks = asyncio.Queue()
+        started = time.monotonic()
+        unspoken = None  # Explanation waiting for the action it describes
+        thinking = True  # Until the first part that isn't a thought
+        unsettled = None  # Input action whose settle waits to see whether another input action follows
+
+        async def read():
+            try:
+                stream = await self.client.aio.models.generate_content_stream(model=COMPUTER_USE_MODEL, contents=contents, config=model_config)
+                async for chunk in stream:
+                    chunks.put_nowait(chunk)
+                chunks.put_nowait(None)
+            except Exception as e:
+                chunks.put_nowait(e)
+
+        reader = asyncio.ensure_future(read())
+        try:
+            while True:
+                chunk = await (cancel_token.run_async(chunks.get()) if cancel_token else chunks.get())
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                for kind, value in response.feed(chunk) if chunk is not None else response.finish():
+                    if thinking and kind != THOUGHT:
+                        record_since(THINKING, started)
+                        thinking = False
+                    if kind == THOUGHT:
+                        print(f"Model's reasoning: {value}")
+                    elif kind == TEXT:
+                        if unspoken:
+                            turn.narrate(speech, unspoken, [])
+                        unspoken = clean_model_text(value)
+                        print(f"Model says: {unspoken}")
+                    elif kind == CALL:
+                        turn.function_calls.append(value)
+                        if unspoken:
+                            turn.narrate(speech, unspoken, [value])
+                            unspoken = None
+                        if turn.first_action_after is None:
+                            turn.first_action_after = time.monotonic() - started
+                            print(f"⚡ First action {turn.first_action_after:.2f}s after the request")
+                        if unsettled and value.name not in INPUT_ACTIONS:
+                            await settle_page_async(self.page, self.settle_detector, unsettled)
+                        batched = config.UI_SETTLE_BATCH_INPUT and value.name in INPUT_ACTIONS
+                        turn.results.append(await execute_function_call_async(
+                            value, self.page, self.screen_width, self.screen_height, self.settle_detector, cancel_token, wait=not batched
+                        ))
+                        unsettled = value.name if batched else None
+                if chunk is None:
+                    break
+        finally:
+            reader.cancel()
+
+        if unsettled:
+            await settle_page_async(self.page, self.settle_detector, unsettled)
+
+        if unspoken:
+            turn.narrate(speech, unspoken, [])
+        turn.parts = response.parts
+        return turn
+
+    async def _replay_trajectory(self, trajectory: Dict[str, Any], speech: AsyncSpeechPipeline, recorder: Optional[TrajectoryRecorder] = None, cancel_token: Optional[CancelToken] = None) -> Optional[Dict[str, Any]]:
+        """
+        Replay a recorded demonstration locally, without calling the model.
+        Returns None as soon as a step diverges so the live loop can take over.
+        """
+        steps = trajectory["steps"]
+        threshold = config.TRAJECTORY_MATCH_THRESHOLD
+        print(f"▶️ Replaying recorded demonstration ({len(steps)} steps)")
+        try:
+            for index, step in enumerate(steps):
+                fingerprint = await self.screenshot_encoder.fingerprint_async(self.page)
+                distance = fingerprint_distance(fingerprint, step["fingerprint"])
+                if distance > threshold:
+                    print(f"↩️ Replay diverged at step {index + 1} (difference {distance:.3f}), handing over to the model")
+                    return None
+
+                for text in step["speech"]:
+                    speech.speak(text)
+
+                results = await execute_function_calls_async(
+                    candidate_from_calls(step["calls"]),
+                    self.page,
+                    self.screen_width,
+                    self.screen_height,
+                    self.settle_detector,
+                    cancel_token
+                )
+                if any("error" in result for _, result in results):
+                    print(f"↩️ Replayed action failed at step {index + 1}, handing over to the model")
+                    if recorder:
+                        recorder.mark_failed()
+                    return None
+                if recorder:
+                    recorder.add_step(step["url"], fingerprint, step["speech"], step["calls"])
+
+            distance = fingerprint_distance(await self.screenshot_encoder.fingerprint_async(self.page), trajectory["final_fingerprint"])
+            if distance > threshold:
+                print(f"↩️ Replay ended on an unexpected screen (difference {distance:.3f}), handing over to the model")
+                return None
+        except DemoCancelled:
+            raise
+        except Exception as e:
+            print(f"❌ Replay error: {e}")
+            if recorder:
+                recorder.mark_failed()
+            return None
+
+        print("✅ Replay finished")
+        return {
+            "success": True,
+            "message": trajectory["final_message"] or "Task completed successfully",
+            "url": self.page.url,
+            "replayed": True
+        }
+
+    async def _run_agent_loop(self, task_prompt: str, turn_limit: int, speech: AsyncSpeechPipeline, recorder: Optional[TrajectoryRecorder] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
+        """Agent loop on the event loop: the model call, actions and screenshots are all awaited"""
+        try:
+            model_config = computer_use_config()
+
+            with span(SCREENSHOT, encoding=self.screenshot_encoder.describe()) as attrs:
+                initial_screenshot = await self.screenshot_encoder.capture_async(self.page)
+                attrs["bytes"] = len(initial_screenshot)
+            current_url = self.page.url
+            print(f"Initial screenshot taken at: {current_url} ({self.screenshot_encoder.describe()}, {len(initial_screenshot) // 1024} KB)")
+            observation = await self.screenshot_encoder.fingerprint_async(self.page) if recorder else []
+
+            prompt = teaching_prompt(task_prompt, recorder)
+            initial_parts = [Part.from_bytes(data=initial_screenshot, mime_type=self.screenshot_encoder.mime_type)]
+            if self.ui_observer.enabled:
+                prompt += SNAPSHOT_INSTRUCTIONS
+                with span(UI_SNAPSHOT):
+                    initial_parts.append(Part(text=(await self.ui_observer.observe_async(self.page, force_screenshot=True)).text or ""))
+
+            history = ConversationHistory(self.history_policy)
+            history.add_user(
+                [Part(text=prompt)] + initial_parts,
+                url=current_url,
+                step_text="Initial view before the demonstration",
+            )
+
+            final_response = ""
+            failed_click_count = 0
+            last_url = current_url
+
+            for i in range(turn_limit):
+                print(f"\n{'='*50}")
+                print(f"--- Turn {i+1} ---")
+                trace = current_trace()
+                if trace:
+                    trace.begin_turn(i + 1)
+
+                history.prune()
+                # Fold the oldest steps into a summary once the prompt outgrows its token budget
+                folded = history.compact()
+                if folded:
+                    print(f"🗜️ Folded {folded} older step(s) into the summary ({history.folded_steps} so far)")
+                payload_bytes = history.payload_bytes()
+                prompt_tokens = history.estimated_tokens()
+                print(f"Sending {payload_bytes // 1024} KB, ~{prompt_tokens} tokens ({history.screenshot_count()} screenshot(s))")
+                print("Thinking...")
+
+                with span(MODEL_REQUEST, payload_bytes=payload_bytes, estimated_tokens=prompt_tokens, screenshots=history.screenshot_count(), streamed=self.stream_responses) as request_attrs:
+                    if self.stream_responses:
+                        turn = await self._stream_turn(history.contents, model_config, speech, cancel_token)
+                        request_attrs["first_action_ms"] = round(turn.first_action_after * 1000, 1) if turn.first_action_after is not None else None
+                    else:
+                        response = await self._generate(history.contents, model_config, cancel_token)
+                        request_attrs.update(usage_attrs(response))
+                if request_attrs.get("prompt_tokens"):
+                    print(f"Prompt was {request_attrs['prompt_tokens']} tokens")
+                if not self.stream_responses:
+                    candidate = response.candidates[0]
+                    turn = ModelTurn(candidate.content)
+
+                    for part in turn.parts:
+                        if not getattr(part, 'text', None):
+                            continue
+                        if getattr(part, 'thought', False):
+                            print(f"Model's reasoning: {part.text}")
+                            continue
+                        clean_text = clean_model_text(part.text)
+                        print(f"Model says: {clean_text}")
+                        turn.narrate(speech, clean_text, turn.function_calls)
+
+                    if turn.function_calls:
+                        print("Executing actions...")
+                        turn.results = await execute_function_calls_async(
+                            candidate,
+                            self.page,
+                            self.screen_width,
+                            self.screen_height,
+                            self.settle_detector,
+                            cancel_token
+                        )
+                final_response = turn.last_text or final_response
+
+                if turn.content:
+                    history.add_model(turn.content)
+
+                if not turn.function_calls:
+                    text_response = turn.text
+                    print("\n" + "="*50)
+                    print("✅ Agent finished with response:")
+                    print("="*50)
+                    print(text_response)
+                    if recorder and recorder.steps and not recorder.failed:
+                        try:
+                            # The recording stores what was actually spoken
+                            if await speech.flush(timeout=config.SPEECH_FLUSH_TIMEOUT):
+                                self.trajectory_store.save(recorder.to_dict(observation, text_response))
+                                print(f"💾 Recorded demonstration ({len(recorder.steps)} steps)")
+                            else:
+                                print("Trajectory not saved: narration didn't finish in time")
+                        except Exception as e:
+                            print(f"Trajectory save error: {e}")
+                    return {
+                        "success": True,
+                        "message": text_response or "Task completed successfully",
+                        "url": self.page.url
+                    }
+
+                was_click = any(call.name == "click_at" for call in turn.function_calls)
+                results = turn.results
+                step_text = turn.step_text
+                if recorder:
+                    recorder.add_step(last_url, observation, turn.spoken, turn.function_calls)
+                    if any("error" in result for _, result in results):
+                        recorder.mark_failed()
+
+                print("Capturing state...")
+                function_responses = await get_function_responses_async(self.page, results, self.screenshot_encoder, self.ui_observer)
+                if recorder:
+                    observation = await self.screenshot_encoder.fingerprint_async(self.page)
+
+                new_url = self.page.url
+                if was_click and new_url == last_url:
+                    failed_click_count += 1
+                    print(f"⚠️ Click didn't change page (attempt {failed_click_count})")
+                else:
+                    failed_click_count = 0
+                last_url = new_url
+
+                if failed_click_count >= 2:
+                    function_responses.append(Part(text=KEYBOARD_HINT))
+                    print("💡 Added keyboard navigation hint")
+
+                history.add_user(
+                    function_responses,
+                    url=new_url,
+                    actions=[name for name, _ in results],
+                    step_text=step_text,
+                )
+
+            print(f"\n⚠️ Reached turn limit ({turn_limit}). Stopping.")
+            return {
+                "success": True,
+                "message": final_response or f"Task in progress (reached {turn_limit} turns)",
+                "url": self.page.url
+            }
+
+        except DemoCancelled:
+            raise
+        except Exception as e:
+            print(f"❌ Agent loop error: {e}")
+            import traceback
+            traceback.print_exc()
+            return {"success": False, "error": str(e)}
+
+    async def get_page_info(self) -> Dict[str, Any]:
+        """Get current page URL and title"""
+        try:
+            if not self.is_initialized or not self.page:
+                return {"success": False, "url": "", "title": ""}
+            title = await self._on_own_loop(self.page.title())
+            return {"success": True, "url": self.page.url, "title": title}
+        except Exception as e:
+            return {"success": False, "url": "", "title": "", "error": str(e)}
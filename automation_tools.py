@@ -2,28 +2,55 @@
 Google Docs Teaching Assistant - Browser Automation Tools
 Uses Gemini Computer Use to demonstrate how to use Google Docs, Sheets, and Slides
 """
-import asyncio
-from typing import Annotated
+from typing import Annotated, Optional
 from pydantic import Field
 from livekit.agents.llm import function_tool
-from livekit.agents import RunContext
-from browser_controller import BrowserAutomation
+from livekit.agents import RunContext, get_job_context
+from browser_pool import Automation, get_pool
+from demo_queue import BUSY, CANCELLED, DONE, REPEAT, demo_queue
+from lesson_index import match_lesson
+from trajectory_store import task_key
 
 
-# Global browser instance
-_browser: BrowserAutomation = None
+def current_session_id() -> str:
+    """ID of the session (room) the current job is serving"""
+    try:
+        return get_job_context().room.name
+    except RuntimeError:
+        return "default"
 
-# Lock to prevent concurrent browser actions
-_action_lock = asyncio.Lock()
-_action_in_progress = False
 
+async def get_browser(session_id: Optional[str] = None) -> Automation:
+    """Get the browser page leased to a session"""
+    return await get_pool().lease(session_id or current_session_id())
 
-async def get_browser() -> BrowserAutomation:
-    """Get browser instance"""
-    global _browser
-    if _browser is None:
-        _browser = await BrowserAutomation.get_instance()
-    return _browser
+
+async def release_browser(session_id: Optional[str] = None):
+    """Give a session's page back to the pool"""
+    session_id = session_id or current_session_id()
+    # Stop its demonstrations first: the page is reset once it is back in the pool
+    await demo_queue.forget(session_id)
+    await get_pool().release(session_id)
+
+
+def stop_demonstration(session, session_id: Optional[str] = None, reason: str = "learner interrupted") -> bool:
+    """
+    Stop a session's running and queued demonstrations and hand the conversation back to the learner.
+
+    Args:
+        session: The session's AgentSession
+        session_id: Session (room) ID
+        reason: Why, for logs
+
+    Returns:
+        True if anything was stopped
+    """
+    if not demo_queue.cancel(session_id or current_session_id(), reason):
+        return False
+    # Cut the narration that is already playing and let the realtime model hear the learner again
+    session.interrupt()
+    session.input.set_audio_enabled(True)
+    return True
 
 
 @function_tool()
@@ -43,55 +70,81 @@ async def browser_action(
         - "How do I share this document?"
         - "How do I insert an image?"
     """
-    global _action_in_progress
+    session_id = current_session_id()
     
     # Validate task - don't execute empty or meaningless tasks
     if not task or task.strip() in [".", "", " "]:
         print(f"Skipping invalid task: '{task}'")
         return "invalid task"
     
-    # Check if another action is already in progress
-    if _action_in_progress:
-        print(f"Task already in progress, skipping: {task}")
-        return "already running"
+    lesson = match_lesson(task)
+    if lesson:
+        print(f"Matched lesson: {lesson.lesson_id} ({lesson.confidence:.2f})")
+    # Requests for the same lesson (or the same words) are the same demonstration
+    key = f"lesson:{lesson.lesson_id}" if lesson else task_key(task)
     
-    # Acquire lock to prevent concurrent execution
-    async with _action_lock:
-        _action_in_progress = True
+    async def run_demo(cancel_token):
+        # Disable audio input so the realtime model doesn't react to TTS voice
+        context.session.input.set_audio_enabled(False)
+        
+        print(f"Teaching task: {task}")
         try:
-            # Disable audio input so the realtime model doesn't react to TTS voice
-            context.session.input.set_audio_enabled(False)
-            
-            print(f"Teaching task: {task}")
-            browser = await get_browser()
-            
-            # Create an async speech callback that wraps session.say()
-            async def speech_callback(text: str):
-                """Speak teaching explanations using the agent session"""
-                context.session.say(text, allow_interruptions=True)
-            
-            # Execute the task with speech callback for step-by-step teaching
-            result = await browser.execute_task(task, speech_callback=speech_callback)
-            
-            if result["success"]:
-                return "Demonstration completed successfully. The steps have already been spoken to the user. DO NOT say anything else — just wait for the user's next question."
-            else:
-                error_msg = f"I ran into a small issue while demonstrating that. {result.get('error', 'Unknown error')}. Please try asking again or ask me something else!"
-                context.session.say(error_msg, allow_interruptions=True)
-                return "An error occurred and the user has already been informed via speech. DO NOT say anything else — just wait for the user's next question."
-        finally:
-            # Re-enable audio input so the user can talk again
+            browser = await get_browser(session_id)
+        except TimeoutError as e:
+            print(f"No browser page available: {e}")
+            context.session.say("All of my demonstration browsers are busy right now. Please ask me again in a moment!", allow_interruptions=True)
+            return {"success": False, "error": str(e), "no_browser": True}
+        
+        # Create an async speech callback that wraps session.say()
+        async def speech_callback(text: str):
+            """Speak teaching explanations using the agent session"""
+            context.session.say(text, allow_interruptions=True)
+        
+        # Execute the task with speech callback for step-by-step teaching
+        result = await browser.execute_task(
+            task,
+            speech_callback=speech_callback,
+            lesson_id=lesson.lesson_id if lesson else None,
+            cancel_token=cancel_token
+        )
+        if not result["success"] and not result.get("cancelled"):
+            error_msg = f"I ran into a small issue while demonstrating that. {result.get('error', 'Unknown error')}. Please try asking again or ask me something else!"
+            context.session.say(error_msg, allow_interruptions=True)
+        return result
+    
+    try:
+        # One demonstration at a time per session; other sessions are unaffected
+        outcome = await demo_queue.submit(session_id, task, key, run_demo)
+    finally:
+        # Re-enable audio input so the user can talk again, once nothing else is lined up
+        if demo_queue.depth(session_id) == 0:
             context.session.input.set_audio_enabled(True)
-            _action_in_progress = False
+    
+    if outcome.status == BUSY:
+        context.session.say("I still have a couple of demonstrations lined up. Let me finish those, then ask me again!", allow_interruptions=True)
+        return "Too many demonstrations are already queued and the user has already been informed via speech. DO NOT say anything else — just wait for the user's next question."
+    if outcome.status == CANCELLED:
+        return "The learner interrupted, so the demonstration was stopped. Listen to what they say next and respond to that."
+    if outcome.status == REPEAT:
+        return "This exact demonstration was just completed and its steps were already spoken to the user. DO NOT call browser_action again for it and DO NOT say anything else — just wait for the user's next question."
+    
+    result = outcome.result
+    if result["success"]:
+        return "Demonstration completed successfully. The steps have already been spoken to the user. DO NOT say anything else — just wait for the user's next question."
+    if outcome.status == DONE:
+        # Failures may be retried straight away
+        demo_queue.allow_repeat(session_id, key)
+    if result.get("no_browser"):
+        return "No browser was available and the user has already been informed via speech. DO NOT say anything else — just wait for the user's next question."
+    return "An error occurred and the user has already been informed via speech. DO NOT say anything else — just wait for the user's next question."
 
 
 @function_tool()
 async def close_browser() -> str:
     """Close the browser when the teaching session is done."""
-    global _browser
-    if _browser:
-        await _browser.close()
-        _browser = None
+    session_id = current_session_id()
+    if session_id in get_pool().sessions():
+        await release_browser(session_id)
         return "I've closed the browser. Just ask me anything about Google Docs when you want to learn more!"
     return "The browser is already closed. Ask me a question to start a new demonstration!"
 
@@ -0,0 +1,124 @@
+"""
+Barge-in Detection for running demonstrations
+Listens to the learner's microphone with Silero VAD while the realtime model's audio input is off
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, Optional
+
+from livekit import rtc
+from livekit.agents.vad import VADEventType
+
+import config
+
+try:
+    from livekit.plugins import silero
+except ImportError:  # livekit-plugins-silero is optional; without it there is no barge-in
+    silero = None
+
+# Silero model shared by every session in the process (loading it takes a moment)
+_vad = None
+_vad_lock = threading.Lock()
+
+
+def load_vad():
+    """Load the Silero VAD model once per process, or None if the plugin is not installed"""
+    global _vad
+    if silero is None:
+        return None
+    with _vad_lock:
+        if _vad is None:
+            _vad = silero.VAD.load(
+                min_speech_duration=config.BARGE_IN_MIN_SPEECH,
+                activation_threshold=config.BARGE_IN_ACTIVATION,
+            )
+        return _vad
+
+
+class BargeInMonitor:
+    """
+    Detects the learner starting to talk over a demonstration.
+
+    browser_action mutes the realtime model's audio input while it
+    demonstrates (so the model doesn't answer its own narration), which
+    also means nothing hears the learner say "stop". This monitor runs its
+    own VAD on every remote audio track and calls on_barge_in when speech
+    longer than BARGE_IN_MIN_SPEECH starts while armed() is true, i.e.
+    while a demonstration is running. Narration keeps playing until the
+    callback decides otherwise.
+    """
+
+    def __init__(self, on_barge_in: Callable[[], None], armed: Callable[[], bool]):
+        """
+        Args:
+            on_barge_in: Called (on the session's loop) when the learner starts speaking mid-demonstration
+            armed: Whether barge-in should currently fire
+        """
+        self._on_barge_in = on_barge_in
+        self._armed = armed
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._room: Optional[rtc.Room] = None
+
+    def start(self, room: rtc.Room) -> bool:
+        """
+        Start listening to the room's remote audio tracks (current and future).
+
+        Returns:
+            False if barge-in is disabled or Silero is not installed
+        """
+        if not config.BARGE_IN:
+            return False
+        if load_vad() is None:
+            print("⚠️ livekit-plugins-silero is not installed; barge-in is disabled")
+            return False
+        self._room = room
+        room.on("track_subscribed", self._on_track_subscribed)
+        room.on("track_unsubscribed", self._on_track_unsubscribed)
+        for participant in room.remote_participants.values():
+            for publication in participant.track_publications.values():
+                if publication.track and publication.kind == rtc.TrackKind.KIND_AUDIO:
+                    self._listen(publication.track)
+        return True
+
+    async def aclose(self):
+        """Stop listening"""
+        if self._room:
+            self._room.off("track_subscribed", self._on_track_subscribed)
+            self._room.off("track_unsubscribed", self._on_track_unsubscribed)
+        tasks, self._tasks = list(self._tasks.values()), {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _on_track_subscribed(self, track: rtc.Track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            self._listen(track)
+
+    def _on_track_unsubscribed(self, track: rtc.Track, publication, participant):
+        task = self._tasks.pop(track.sid, None)
+        if task:
+            task.cancel()
+
+    def _listen(self, track: rtc.Track):
+        if track.sid not in self._tasks:
+            self._tasks[track.sid] = asyncio.ensure_future(self._run(track))
+
+    async def _run(self, track: rtc.Track):
+        """Feed one audio track through the VAD and watch for the start of speech"""
+        audio = rtc.AudioStream(track, sample_rate=16000, num_channels=1)
+        vad_stream = load_vad().stream()
+
+        async def forward():
+            async for event in audio:
+                vad_stream.push_frame(event.frame)
+
+        forwarder = asyncio.ensure_future(forward())
+        try:
+            async for event in vad_stream:
+                if event.type == VADEventType.START_OF_SPEECH and self._armed():
+                    print(f"🗣️ Learner started speaking during a demonstration ({event.speech_duration:.2f}s)")
+                    self._on_barge_in()
+        finally:
+            forwarder.cancel()
+            await vad_stream.aclose()
+            await audio.aclose()
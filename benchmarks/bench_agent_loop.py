@@ -0,0 +1,182 @@
+"""
+Benchmark: the agent loop end to end, offline
+Runs real demonstrations (the loop, execute_function_calls and get_function_responses)
+against a local mock of the Docs editor, with a scripted stand-in for the Gemini client,
+and reports turns/sec, per-action and per-turn overhead and memory. Needs no API key,
+network or display: Chromium runs headless
+
+Usage:
+    python benchmarks/bench_agent_loop.py [--runs N] [--latency MS] [--backend sync|async|both] [--stream]
+
+Loop overhead is the demonstration's wall time minus the scripted model latency and the
+deliberate highlight pauses, i.e. the time this code and the browser add per turn.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")  # browser_controller creates a client at import
+# Measure the live loop only: no replays, recordings or trace file
+os.environ["TRAJECTORY_REPLAY"] = "false"
+os.environ["TRAJECTORY_RECORDING"] = "false"
+os.environ["TRACE_ENABLED"] = "true"
+os.environ["TRACE_PATH"] = ""
+
+import psutil
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+from async_browser_controller import AsyncBrowserAutomation
+from browser_controller import SCREEN_HEIGHT, SCREEN_WIDTH, BrowserAutomation, plan_function_call
+from fake_docs import MOCK_DOCS_HTML, ScriptedComputerUseModel, summary_of
+from tracing import ACTION, MODEL_REQUEST, SCREENSHOT, SETTLE, TURN, tracer
+
+TASK = "How do I make text bold?"
+
+
+def rss_mb() -> dict:
+    """Resident memory of this process and of its children (Chromium), in MB"""
+    process = psutil.Process()
+    children = 0
+    for child in process.children(recursive=True):
+        try:
+            children += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return {"python": process.memory_info().rss / 2**20, "browser": children / 2**20}
+
+
+async def run_demos(automation, model: ScriptedComputerUseModel, reload, runs: int):
+    """
+    Run one demonstration under tracemalloc for memory (it also warms up, and is too slow to time),
+    then time `runs` more.
+
+    Args:
+        automation: BrowserAutomation or AsyncBrowserAutomation attached to the mock page
+        reload: Coroutine function that puts the mock page back to its initial state
+
+    Returns:
+        (wall time of each timed demonstration, memory dict in MB)
+    """
+    times = []
+    memory = {}
+    for index in range(runs + 1):
+        await reload()
+        model.reset()
+        if index == 0:
+            gc.collect()
+            tracemalloc.start()
+        start = time.monotonic()
+        result = await automation.execute_task(TASK, turn_limit=model.turns + 1)
+        elapsed = time.monotonic() - start
+        if not result.get("success") or model.calls != model.turns:
+            raise SystemExit(f"❌ Demonstration failed: {result}")
+        if index == 0:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory = {"heap_peak": peak / 2**20, **rss_mb()}
+            tracer.reset()  # Only the timed demonstrations count towards the span percentiles
+        else:
+            times.append(elapsed)
+    return times, memory
+
+
+def bench_sync(model: ScriptedComputerUseModel, runs: int, stream: bool):
+    """Demonstrations on the sync backend: the page lives on a dedicated browser thread"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bench-browser")
+    automation = BrowserAutomation(gemini_client=model, executor=executor)
+    automation.stream_responses = stream
+
+    def open_page():
+        playwright = sync_playwright().start()
+        browser = playwright.chromium.launch(headless=True)
+        context = browser.new_context(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+        page = context.new_page()
+        page.set_content(MOCK_DOCS_HTML)
+        automation.attach(browser, context, page)
+        return playwright, browser
+
+    async def demos():
+        loop = asyncio.get_running_loop()
+        playwright, browser = await loop.run_in_executor(executor, open_page)
+
+        async def reload():
+            await loop.run_in_executor(executor, automation.page.set_content, MOCK_DOCS_HTML)
+
+        try:
+            return await run_demos(automation, model, reload, runs)
+        finally:
+            await loop.run_in_executor(executor, browser.close)
+            await loop.run_in_executor(executor, playwright.stop)
+
+    try:
+        return asyncio.run(demos())
+    finally:
+        executor.shutdown(wait=True)
+
+
+def bench_async(model: ScriptedComputerUseModel, runs: int, stream: bool):
+    """Demonstrations on the async backend: the page lives on the benchmark's event loop"""
+    automation = AsyncBrowserAutomation(gemini_client=model)
+    automation.stream_responses = stream
+
+    async def demos():
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(headless=True)
+            context = await browser.new_context(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+            page = await context.new_page()
+            await automation.attach(browser, context, page)
+
+            async def reload():
+                await page.set_content(MOCK_DOCS_HTML)
+
+            try:
+                return await run_demos(automation, model, reload, runs)
+            finally:
+                await browser.close()
+
+    return asyncio.run(demos())
+
+
+def report(backend: str, model: ScriptedComputerUseModel, times, pauses: float, memory):
+    actions = sum(len(calls) for _, calls in model.script)
+    demo = summary_of(times)
+    overhead = [(t - model.turns * model.latency - pauses) / model.turns for t in times]
+    spans = tracer.percentiles()
+    print(f"\n{backend} backend: {len(times)} demonstration(s), {model.turns} turns and {actions} actions each")
+    print(f"  demonstration    mean {demo['mean']:.2f}s  p50 {demo['p50']:.2f}s  p95 {demo['p95']:.2f}s")
+    print(f"  throughput       {model.turns * len(times) / sum(times):.2f} turns/sec")
+    print(f"  loop overhead    {summary_of(overhead)['mean'] * 1000:.0f} ms/turn "
+          f"(excluding {model.latency * 1000:.0f} ms model latency and {pauses / model.turns * 1000:.0f} ms of highlight pauses per turn)")
+    print(f"  {'span':<14} {'count':>6} {'mean ms':>8} {'p50':>7} {'p95':>7} {'max':>7}")
+    for name in (TURN, MODEL_REQUEST, ACTION, SETTLE, SCREENSHOT):
+        if name in spans:
+            s = spans[name]
+            print(f"  {name:<14} {s['count']:>6} {s['mean_ms']:>8.1f} {s['p50_ms']:>7.1f} {s['p95_ms']:>7.1f} {s['max_ms']:>7.1f}")
+    print(f"  memory           Python heap peak {memory['heap_peak']:.1f} MB during a demonstration; "
+          f"RSS python {memory['python']:.0f} MB, browser {memory['browser']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="demonstrations per backend")
+    parser.add_argument("--latency", type=int, default=0, help="scripted model latency per turn, ms")
+    parser.add_argument("--backend", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--stream", action="store_true", help="stream the scripted responses (STREAM_RESPONSES)")
+    args = parser.parse_args()
+
+    model = ScriptedComputerUseModel(latency=args.latency / 1000)
+    pauses = model.pause_seconds(plan_function_call)
+    backends = ["sync", "async"] if args.backend == "both" else [args.backend]
+    for backend in backends:
+        times, memory = (bench_sync if backend == "sync" else bench_async)(model, args.runs, args.stream)
+        report(backend, model, times, pauses, memory)
+
+if __name__ == "__main__":
+    main()
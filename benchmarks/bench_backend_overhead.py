@@ -0,0 +1,157 @@
+"""
+Benchmark: sync vs async Playwright backend
+Reports per-action overhead (action + settle + screenshot) for each backend, driving
+one page and several pages at once, the way the agent loop does
+
+Usage:
+    python benchmarks/bench_backend_overhead.py [--actions N] [--pages N]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")  # browser_controller creates a client at import
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+from async_browser_controller import execute_function_calls_async, get_function_responses_async
+from browser_controller import SCREEN_HEIGHT, SCREEN_WIDTH, candidate_from_calls, execute_function_calls, get_function_responses
+from screenshot_encoding import ScreenshotEncoder
+from ui_settle import SettleDetector
+
+# A small editable document so keyboard actions have something to act on
+PAGE_HTML = """
+<html><body style="font: 16px sans-serif; margin: 40px">
+<div contenteditable="true" style="min-height: 600px">The quick brown fox jumps over the lazy dog.</div>
+<script>document.querySelector('div').focus()</script>
+</body></html>
+"""
+
+# Actions without highlight pauses, so the numbers are backend overhead rather than deliberate waits
+ACTIONS = [
+    {"name": "press_key", "args": {"key": "End"}},
+    {"name": "key_combination", "args": {"keys": "shift+Home"}},
+    {"name": "press_key", "args": {"key": "ArrowRight"}},
+    {"name": "select_all", "args": {}},
+]
+
+ENCODER = ScreenshotEncoder(tier="balanced")
+
+
+def settle_detector() -> SettleDetector:
+    # Short quiet window: we want the cost of the check, not of waiting
+    return SettleDetector(mode="dom", quiet_ms=0, timeout_ms=1000)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+def report(label: str, times, wall: float, pages: int):
+    total = len(times)
+    print(
+        f"{label:<14} {pages:>5} {statistics.mean(times):>9.1f} {statistics.median(times):>8.1f} "
+        f"{percentile(times, 0.95):>8.1f} {total / wall:>11.1f}",
+        file=sys.__stdout__, flush=True
+    )
+
+
+async def bench_sync(actions: int, pages: int):
+    """Sync backend: each page's actions run on the browser thread, one thread hop per action"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser_thread")
+    loop = asyncio.get_running_loop()
+    settle = settle_detector()
+
+    def launch():
+        playwright = sync_playwright().start()
+        browser = playwright.chromium.launch(headless=True)
+        opened = []
+        for _ in range(pages):
+            page = browser.new_page(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+            page.set_content(PAGE_HTML)
+            settle.install(page)
+            opened.append(page)
+        return playwright, browser, opened
+
+    def step(page, call):
+        results = execute_function_calls(candidate_from_calls([call]), page, SCREEN_WIDTH, SCREEN_HEIGHT, settle)
+        get_function_responses(page, results, ENCODER)
+
+    playwright, browser, opened = await loop.run_in_executor(executor, launch)
+    times = []
+
+    async def drive(page):
+        for i in range(actions):
+            start = time.perf_counter()
+            await loop.run_in_executor(executor, step, page, ACTIONS[i % len(ACTIONS)])
+            times.append((time.perf_counter() - start) * 1000)
+
+    await drive(opened[0])  # warm up
+    times.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(page) for page in opened))
+    wall = time.perf_counter() - start
+
+    await loop.run_in_executor(executor, lambda: (browser.close(), playwright.stop()))
+    executor.shutdown()
+    return times, wall
+
+
+async def bench_async(actions: int, pages: int):
+    """Async backend: every page is driven directly on this event loop"""
+    settle = settle_detector()
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        opened = []
+        for _ in range(pages):
+            page = await browser.new_page(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+            await page.set_content(PAGE_HTML)
+            await settle.install_async(page)
+            opened.append(page)
+        times = []
+
+        async def drive(page):
+            for i in range(actions):
+                start = time.perf_counter()
+                results = await execute_function_calls_async(
+                    candidate_from_calls([ACTIONS[i % len(ACTIONS)]]), page, SCREEN_WIDTH, SCREEN_HEIGHT, settle
+                )
+                await get_function_responses_async(page, results, ENCODER)
+                times.append((time.perf_counter() - start) * 1000)
+
+        await drive(opened[0])  # warm up
+        times.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(drive(page) for page in opened))
+        wall = time.perf_counter() - start
+        await browser.close()
+    return times, wall
+
+
+async def run(actions: int, pages: int):
+    print(f"Per action: execute + settle + {ENCODER.describe()} screenshot\n", file=sys.__stdout__)
+    print(f"{'backend':<14} {'pages':>5} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'actions/s':>11}", file=sys.__stdout__)
+    for count in sorted({1, pages}):
+        report("sync", *(await bench_sync(actions, count)), count)
+        report("async", *(await bench_async(actions, count)), count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, default=40, help="Actions per page")
+    parser.add_argument("--pages", type=int, default=4, help="Pages driven at once in the concurrent run")
+    args = parser.parse_args()
+    # The action helpers print a line per action; only the table goes to the terminal
+    sys.stdout = open(os.devnull, "w")
+    try:
+        asyncio.run(run(args.actions, args.pages))
+    finally:
+        sys.stdout.close()
+        sys.stdout = sys.__stdout__
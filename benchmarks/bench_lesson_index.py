@@ -0,0 +1,85 @@
+"""
+Benchmark: lesson index lookup latency
+Builds the index with the built-in lessons plus thousands of synthetic ones
+and reports per-question match latency and accuracy on known paraphrases
+
+Usage:
+    python benchmarks/bench_lesson_index.py [--lessons N] [--queries N]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_index import DEFAULT_LESSONS, LessonIndex
+
+# Paraphrases that must resolve to the given built-in lesson
+PARAPHRASES = [
+    ("how do I bold text", "bold-text"),
+    ("How do I make text bold?", "bold-text"),
+    ("can you show me how to put a tabel in my doc", "insert-table"),
+    ("add a picture please", "insert-image"),
+    ("start a new spreadsheet", "create-spreadsheet"),
+    ("how do i share this file with my friend", "share-document"),
+    ("double space my essay", "line-spacing"),
+    ("make a bulleted list", "bullet-list"),
+    ("save it as a pdf", "download-pdf"),
+    ("how do i italicise words", "italic-text"),
+]
+
+VERBS = ["insert", "remove", "change", "format", "resize", "move", "hide", "show", "lock", "group"]
+OBJECTS = ["chart", "footnote", "equation", "drawing", "bookmark", "column", "row", "border", "filter", "pivot",
+           "caption", "watermark", "toc", "citation", "template", "theme", "layout", "transition", "animation", "cell"]
+QUALIFIERS = ["in sheets", "in slides", "in docs", "on mobile", "quickly", "with shortcuts", "for printing", "from the menu"]
+
+
+def synthetic_lessons(count: int):
+    rng = random.Random(7)
+    lessons = {}
+    for i in range(count):
+        verb, obj, qualifier = rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(QUALIFIERS)
+        lessons[f"synthetic-{i}"] = [f"How do I {verb} a {obj} {qualifier} variant {i}?"]
+    return lessons
+
+
+def run(lesson_count: int, query_count: int):
+    lessons = dict(DEFAULT_LESSONS)
+    lessons.update(synthetic_lessons(lesson_count))
+    index = LessonIndex(lessons)
+
+    start = time.perf_counter()
+    index.build()
+    print(f"Indexed {len(index)} phrasings in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    correct = sum(1 for question, lesson_id in PARAPHRASES if (index.match(question) or (None,))[0] == lesson_id)
+    print(f"Paraphrase accuracy: {correct}/{len(PARAPHRASES)}")
+
+    rng = random.Random(11)
+    questions = [q for q, _ in PARAPHRASES] + [
+        f"how do i {rng.choice(VERBS)} the {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}" for _ in range(50)
+    ]
+    timings = []
+    for i in range(query_count):
+        question = questions[i % len(questions)]
+        start = time.perf_counter()
+        index.match(question)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+
+    timings.sort()
+    print(f"Queries: {query_count}")
+    print(f"  mean {statistics.mean(timings):8.1f} us")
+    print(f"  p50  {timings[len(timings) // 2]:8.1f} us")
+    print(f"  p99  {timings[int(len(timings) * 0.99) - 1]:8.1f} us")
+    print(f"  max  {timings[-1]:8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lessons", type=int, default=5000, help="Synthetic lessons added to the built-in ones")
+    parser.add_argument("--queries", type=int, default=20000, help="Questions to time")
+    args = parser.parse_args()
+    run(args.lessons, args.queries)
@@ -0,0 +1,149 @@
+"""
+Benchmark: request routing and the local asset cache
+Serves a stand-in for Docs from a local HTTP server (a page with slow, cacheable scripts,
+styles and fonts plus telemetry beacons) and reports load time and bytes with no routing,
+with routing and a cold cache, and with a warm cache. Exits non-zero if beacons get through
+or the warm cache misses, so it doubles as a check of the routing layer
+
+Usage:
+    python benchmarks/bench_request_routing.py [--assets N] [--latency MS] [--loads N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.sync_api import sync_playwright
+
+from request_router import DEFAULT_BLOCK_RULES, AssetCache, RequestRouter, RoutingRules
+
+ASSET_BYTES = 200 * 1024  # Docs' bundles are a few hundred KB each
+
+
+class FakeDocsHandler(BaseHTTPRequestHandler):
+    """A document page whose assets are slow to arrive, like Docs over a real network"""
+
+    assets = 8
+    latency = 0.1
+    beacons = 0  # Telemetry requests that reached the server
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/document":
+            head = "".join(
+                f'<script src="/static/js/bundle{i}.js"></script><link rel="stylesheet" href="/static/css/style{i}.css">'
+                for i in range(self.assets)
+            )
+            body = f"""<html><head>{head}</head><body style="font-family: DocsFont">
+            <div contenteditable="true">The quick brown fox jumps over the lazy dog.</div>
+            <img src="/static/img/logo.png">
+            <script>
+                navigator.sendBeacon('/gen_204?ev=load');
+                fetch('/log?format=json&hasfast=true', {{method: 'POST', body: '[]'}});
+                new Image().src = '/csi?v=3&action=load';
+            </script></body></html>"""
+            self._send(200, "text/html", body.encode(), "no-cache")
+        elif path.startswith("/static/"):
+            time.sleep(self.latency)
+            kind = {"js": "application/javascript", "css": "text/css", "img": "image/png"}[path.split("/")[2]]
+            filler = b"/*" + b"x" * ASSET_BYTES + b"*/" if kind != "image/png" else b"\x89PNG" + b"\0" * 1024
+            self._send(200, kind, filler, "public, max-age=31536000, immutable")
+        elif path in ("/gen_204", "/log", "/csi"):
+            FakeDocsHandler.beacons += 1
+            self._send(204, "text/plain", b"", "no-store")
+        else:
+            self._send(404, "text/plain", b"not found", "no-store")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length") or 0))
+        self.do_GET()
+
+    def _send(self, status, content_type, body, cache_control):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def load(browser, url: str, router=None):
+    """Load the page in a fresh context; returns (seconds, bytes received over the network)"""
+    context = browser.new_context()
+    received = []
+    context.on("response", lambda response: received.append(int(response.headers.get("content-length") or 0)))
+    if router:
+        router.install(context)
+    page = context.new_page()
+    start = time.monotonic()
+    page.goto(url, wait_until="load")
+    page.wait_for_timeout(100)  # Let the beacons go out
+    elapsed = time.monotonic() - start
+    context.close()
+    return elapsed, sum(received)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=8, help="script/stylesheet pairs on the page")
+    parser.add_argument("--latency", type=int, default=100, help="server delay per asset, ms")
+    parser.add_argument("--loads", type=int, default=5)
+    args = parser.parse_args()
+
+    FakeDocsHandler.assets = args.assets
+    FakeDocsHandler.latency = args.latency / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDocsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/document"
+
+    failures = []
+    with tempfile.TemporaryDirectory() as cache_dir, sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        router = RequestRouter(RoutingRules(block=DEFAULT_BLOCK_RULES, allow=[], block_types=[]), AssetCache(cache_dir), enabled=True)
+
+        print(f"{'mode':<14} {'load (s)':>9} {'p95':>7} {'KB over network':>16}")
+        FakeDocsHandler.beacons = 0
+        times, sizes = zip(*(load(browser, url) for _ in range(args.loads)))
+        print(f"{'no routing':<14} {statistics.mean(times):>9.2f} {max(times):>7.2f} {statistics.mean(sizes) / 1024:>16.0f}")
+        unrouted_beacons = FakeDocsHandler.beacons
+
+        FakeDocsHandler.beacons = 0
+        cold_time, cold_size = load(browser, url, router)
+        print(f"{'routed, cold':<14} {cold_time:>9.2f} {cold_time:>7.2f} {cold_size / 1024:>16.0f}")
+
+        router.reset_stats()
+        times, sizes = zip(*(load(browser, url, router) for _ in range(args.loads)))
+        print(f"{'routed, warm':<14} {statistics.mean(times):>9.2f} {max(times):>7.2f} {statistics.mean(sizes) / 1024:>16.0f}")
+        browser.close()
+
+        totals = router.totals()
+        print(f"\nWarm loads: {totals['cache_hits']} cache hits, {totals['blocked']} blocked, "
+              f"{totals['cached_bytes'] // 1024} KB served locally")
+        for host, stats in router.stats().items():
+            print(f"  {host}: {stats}")
+
+        if unrouted_beacons == 0:
+            failures.append("the stand-in page sent no beacons without routing")
+        if FakeDocsHandler.beacons:
+            failures.append(f"{FakeDocsHandler.beacons} beacon(s) reached the server through the router")
+        expected_hits = (2 * args.assets + 1) * args.loads
+        if totals["cache_hits"] < expected_hits:
+            failures.append(f"{totals['cache_hits']} cache hits on warm loads, expected {expected_hits}")
+
+    server.shutdown()
+    for failure in failures:
+        print(f"❌ {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
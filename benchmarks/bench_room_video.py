@@ -0,0 +1,110 @@
+"""
+Benchmark: the browser video track against a local LiveKit server
+Publishes a headless page (the local Docs mock, typed into and formatted) to a room, subscribes
+to it from a second participant and reports frames published, dropped and skipped while idle,
+decode CPU per frame, this process's CPU share and the frame rate the subscriber received
+
+Usage:
+    livekit-server --dev    # in another terminal
+    python benchmarks/bench_room_video.py [--url ws://localhost:7880] [--seconds 20] [--idle 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")  # browser_controller creates a client at import
+os.environ["BROWSER_VIDEO"] = "true"
+
+from livekit import api, rtc
+from playwright.async_api import async_playwright
+
+from async_browser_controller import AsyncBrowserAutomation
+from fake_docs import BOLD_BUTTON, FIRST_LINE, MOCK_DOCS_HTML, SCREEN_HEIGHT, SCREEN_WIDTH
+from room_video import TRACK_NAME, BrowserVideoPublisher
+
+ROOM = "bench-room-video"
+
+
+def token(key: str, secret: str, identity: str) -> str:
+    grants = api.VideoGrants(room_join=True, room=ROOM)
+    return api.AccessToken(key, secret).with_identity(identity).with_grants(grants).to_jwt()
+
+
+async def watch(url: str, key: str, secret: str, received: list):
+    """A learner: subscribe to the browser track and timestamp every frame"""
+    room = rtc.Room()
+    streams = []
+
+    @room.on("track_subscribed")
+    def on_track(track, publication, participant):
+        if publication.name == TRACK_NAME:
+            async def count():
+                async for _ in rtc.VideoStream(track):
+                    received.append(time.monotonic())
+            streams.append(asyncio.create_task(count()))
+
+    await room.connect(url, token(key, secret, "learner"))
+    return room, streams
+
+
+async def demonstrate(page, seconds: float, idle: float):
+    """Type and toggle bold for `seconds`, then leave the page still for `idle`"""
+    await page.mouse.click(*FIRST_LINE)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        await page.keyboard.type("The quick brown fox ", delay=30)
+        await page.mouse.click(*BOLD_BUTTON)
+    await asyncio.sleep(idle)
+
+
+async def run(url: str, key: str, secret: str, seconds: float, idle: float):
+    received = []
+    learner, streams = await watch(url, key, secret, received)
+    room = rtc.Room()
+    await room.connect(url, token(key, secret, "docbot"))
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        context = await browser.new_context(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+        page = await context.new_page()
+        await page.set_content(MOCK_DOCS_HTML)
+        automation = AsyncBrowserAutomation()
+        await automation.attach(browser, context, page)
+
+        video = BrowserVideoPublisher()
+        if not await video.start(room, automation):
+            raise SystemExit("❌ Browser video could not start (is Pillow installed?)")
+        started = time.monotonic()
+        await demonstrate(page, seconds, idle)
+        stats = video.stats()
+        await video.aclose()
+        await browser.close()
+
+    elapsed = time.monotonic() - started
+    active = [t for t in received if t - started <= seconds]
+    print(f"\nPublished {stats['published']} frames over {elapsed:.1f}s "
+          f"({stats['dropped']} dropped, {stats['idle']} identical skipped, {stats['keepalive']} keepalive repeats)")
+    print(f"Decode CPU:      {stats['decode_ms_per_frame']:.1f} ms/frame")
+    print(f"Process CPU:     {stats['process_cpu_share']:.0%} of a core (publisher, subscriber and Playwright together)")
+    print(f"Final settings:  {stats['fps']:.0f} fps at {stats['width']}px")
+    print(f"Learner got:     {len(active) / seconds:.1f} fps while demonstrating, "
+          f"{len(received) - len(active)} frames in {idle:.0f}s idle")
+
+    for stream in streams:
+        stream.cancel()
+    await learner.disconnect()
+    await room.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:7880", help="LiveKit server")
+    parser.add_argument("--api-key", default="devkey", help="API key (livekit-server --dev default)")
+    parser.add_argument("--api-secret", default="secret", help="API secret (livekit-server --dev default)")
+    parser.add_argument("--seconds", type=float, default=20, help="Seconds of typing and formatting")
+    parser.add_argument("--idle", type=float, default=5, help="Seconds of a still page afterwards")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.api_key, args.api_secret, args.seconds, args.idle))
@@ -0,0 +1,132 @@
+"""
+Benchmark: screencast ring buffer vs page.screenshot
+Reports the capture latency of the observation taken after each action (settled as in the agent
+loop) on a local mock of the Docs editor, for both Playwright backends. Offline and headless
+
+Usage:
+    python benchmarks/bench_screencast.py [--actions N] [--format png|jpeg] [--backend sync|async|both]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+from fake_docs import BOLD_BUTTON, FIRST_LINE, MENU_Y, MENUS, MOCK_DOCS_HTML, SCREEN_HEIGHT, SCREEN_WIDTH
+from screencast import ScreencastEncoder, mark_input
+from screenshot_encoding import ScreenshotEncoder
+from ui_settle import SettleDetector
+
+# Actions cycled through: (kind, argument); each changes something on screen
+ACTIONS = [
+    ("click", FIRST_LINE),
+    ("type", "x"),
+    ("click", BOLD_BUTTON),
+    ("click", (MENUS["Format"] + 20, MENU_Y)),
+    ("press", "Escape"),
+]
+
+
+def encoders(format: str):
+    return [
+        ScreenshotEncoder(format=format, scale=1.0, tier=""),
+        ScreencastEncoder(format=format, scale=1.0, tier=""),
+    ]
+
+
+def act(page, action):
+    kind, argument = action
+    if kind == "click":
+        page.mouse.click(*argument)
+    elif kind == "type":
+        page.keyboard.type(argument)
+    else:
+        page.keyboard.press(argument)
+    mark_input(page)
+
+
+async def act_async(page, action):
+    kind, argument = action
+    if kind == "click":
+        await page.mouse.click(*argument)
+    elif kind == "type":
+        await page.keyboard.type(argument)
+    else:
+        await page.keyboard.press(argument)
+    mark_input(page)
+
+
+def report(backend: str, encoder, times, sizes):
+    p95 = sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+    served = ""
+    if isinstance(encoder, ScreencastEncoder):
+        stats = encoder.stats()
+        served = f"{stats['buffered']} buffered / {stats['fallbacks']} fallbacks"
+    print(
+        f"{backend:<6} {encoder.describe():<22} {statistics.mean(times):>8.1f} {statistics.median(times):>8.1f} "
+        f"{p95:>8.1f} {statistics.mean(sizes) / 1024:>8.1f}  {served}"
+    )
+
+
+def bench_sync(actions: int, format: str):
+    settle = SettleDetector()
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        for encoder in encoders(format):
+            page = browser.new_page(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+            page.set_content(MOCK_DOCS_HTML)
+            settle.install(page)
+            encoder.capture(page)  # warm up (and start the screencast)
+            times, sizes = [], []
+            for index in range(actions):
+                act(page, ACTIONS[index % len(ACTIONS)])
+                settle.wait(page)
+                start = time.perf_counter()
+                data = encoder.capture(page)
+                times.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(data))
+            report("sync", encoder, times, sizes)
+            page.close()
+        browser.close()
+
+
+async def bench_async(actions: int, format: str):
+    settle = SettleDetector()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        for encoder in encoders(format):
+            page = await browser.new_page(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+            await page.set_content(MOCK_DOCS_HTML)
+            await settle.install_async(page)
+            await encoder.capture_async(page)
+            times, sizes = [], []
+            for index in range(actions):
+                await act_async(page, ACTIONS[index % len(ACTIONS)])
+                await settle.wait_async(page)
+                start = time.perf_counter()
+                data = await encoder.capture_async(page)
+                times.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(data))
+            report("async", encoder, times, sizes)
+            await page.close()
+        await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, default=40, help="Actions (and captures) per setting")
+    parser.add_argument("--format", choices=["png", "jpeg"], default="png", help="Frame format")
+    parser.add_argument("--backend", choices=["sync", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    print(f"{'':<6} {'capture':<22} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'KB':>8}")
+    if args.backend in ("sync", "both"):
+        bench_sync(args.actions, args.format)
+    if args.backend in ("async", "both"):
+        asyncio.run(bench_async(args.actions, args.format))
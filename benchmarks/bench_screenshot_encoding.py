@@ -0,0 +1,62 @@
+"""
+Benchmark: screenshot encoding settings
+Reports bytes and capture+encode time per frame for each encoder setting
+
+Usage:
+    python benchmarks/bench_screenshot_encoding.py [--url URL] [--frames N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.sync_api import sync_playwright
+
+from screenshot_encoding import QUALITY_TIERS, ScreenshotEncoder
+
+SCREEN_WIDTH = 1440
+SCREEN_HEIGHT = 900
+
+SETTINGS = [
+    ScreenshotEncoder(tier=name) for name in QUALITY_TIERS
+] + [
+    ScreenshotEncoder(format="png", scale=0.5, tier=""),
+    ScreenshotEncoder(format="jpeg", quality=80, scale=0.75, tier=""),
+    ScreenshotEncoder(format="webp", quality=60, scale=0.5, tier=""),
+]
+
+
+def run(url: str, frames: int):
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+        page.goto(url)
+        page.wait_for_load_state()
+
+        print(f"{'setting':<20} {'frame':>10} {'KB/frame':>10} {'ms/frame':>10} {'p95 ms':>8}")
+        for encoder in SETTINGS:
+            encoder.capture(page)  # warm up (CDP session, encoder)
+            sizes, times = [], []
+            for _ in range(frames):
+                start = time.perf_counter()
+                data = encoder.capture(page)
+                times.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(data))
+            width, height = encoder.frame_size(SCREEN_WIDTH, SCREEN_HEIGHT)
+            p95 = sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+            print(
+                f"{encoder.describe():<20} {f'{width}x{height}':>10} "
+                f"{statistics.mean(sizes) / 1024:>10.1f} {statistics.mean(times):>10.1f} {p95:>8.1f}"
+            )
+        browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://docs.google.com", help="Page to capture")
+    parser.add_argument("--frames", type=int, default=20, help="Frames per setting")
+    args = parser.parse_args()
+    run(args.url, args.frames)
@@ -0,0 +1,116 @@
+"""
+Benchmark: time to first action, blocking vs streamed model responses
+Plays back a recorded computer-use response with its original chunk timing
+(no API key or network needed) and reports how long after the request the
+first action starts and the whole turn ends, for each mode
+
+Usage:
+    python benchmarks/bench_time_to_first_action.py [--turns N] [--recording FILE]
+
+A recording is a Gemini cassette file (see cassette.py); its first interaction is played.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")  # browser_controller creates a client at import
+
+from playwright.sync_api import sync_playwright
+
+from browser_controller import SCREEN_HEIGHT, SCREEN_WIDTH, BrowserAutomation, execute_function_calls
+from cassette import model_chunk
+from speech_pipeline import SpeechPipeline
+from streaming import RecordedModel
+from ui_settle import SettleDetector
+
+PAGE_HTML = """
+<html><body style="font: 16px sans-serif; margin: 40px">
+<div contenteditable="true" style="min-height: 600px">The quick brown fox jumps over the lazy dog.</div>
+<script>document.querySelector('div').focus()</script>
+</body></html>
+"""
+
+# A typical turn: a few seconds of thinking, a short explanation, then two actions
+RECORDING = (
+    [model_chunk([{"text": "The user wants the first line bold. ", "thought": True}], 0.6)]
+    + [model_chunk([{"text": "I need to select it first, then use the shortcut. ", "thought": True}], 0.3) for _ in range(4)]
+    + [
+        model_chunk([{"text": "First, select the line "}], 0.2),
+        model_chunk([{"text": "so we can format it."}], 0.1),
+        model_chunk([{"function_call": {"name": "key_combination", "args": {"keys": "shift+End"}}}], 0.2),
+        model_chunk([{"function_call": {"name": "key_combination", "args": {"keys": "control+b"}}}], 0.4),
+    ]
+)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+def report(label: str, first, total):
+    print(
+        f"{label:<10} {statistics.mean(first):>10.2f} {percentile(first, 0.95):>8.2f} "
+        f"{statistics.mean(total):>10.2f} {percentile(total, 0.95):>8.2f}"
+    )
+
+
+def blocking_turn(automation: BrowserAutomation):
+    started = time.monotonic()
+    response = automation._generate_sync([], None)
+    first = time.monotonic() - started
+    execute_function_calls(
+        response.candidates[0], automation.page, automation.screen_width, automation.screen_height, automation.settle_detector
+    )
+    return first, time.monotonic() - started
+
+
+def streamed_turn(automation: BrowserAutomation, speech: SpeechPipeline):
+    started = time.monotonic()
+    turn = automation._stream_turn_sync([], None, speech)
+    return turn.first_action_after, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--recording", help="Gemini cassette file with a recorded streamed response")
+    args = parser.parse_args()
+
+    recording = RECORDING
+    if args.recording:
+        with open(args.recording) as f:
+            recording = json.load(f)[0]["chunks"]
+
+    automation = BrowserAutomation(
+        gemini_client=RecordedModel(recording),
+        settle_detector=SettleDetector(mode="dom", quiet_ms=50, timeout_ms=1000)
+    )
+    speech = SpeechPipeline()  # No callback: nothing is spoken, but narration still runs
+
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        automation.page = browser.new_page(viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT})
+
+        results = {"blocking": ([], []), "streamed": ([], [])}
+        for _ in range(args.turns):
+            for mode, (first, total) in results.items():
+                automation.page.set_content(PAGE_HTML)
+                automation.settle_detector.install(automation.page)
+                timings = blocking_turn(automation) if mode == "blocking" else streamed_turn(automation, speech)
+                first.append(timings[0])
+                total.append(timings[1])
+        browser.close()
+
+    print(f"Recording: {len(recording)} chunks over {sum(chunk['delay'] for chunk in recording):.2f}s, {args.turns} turns per mode")
+    print(f"{'mode':<10} {'first (s)':>10} {'p95':>8} {'turn (s)':>10} {'p95':>8}")
+    for mode, (first, total) in results.items():
+        report(mode, first, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Offline stand-ins for the agent loop's benchmarks
+A local HTML mock of the Docs editor and a scripted replacement for genai.Client
+that walks through a demonstration on it
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from google.genai import types
+from google.genai.types import Content, Part
+
+SCREEN_WIDTH = 1440
+SCREEN_HEIGHT = 900
+
+# Pixel positions of the mock's controls; the script clicks them on the model's 0-1000 grid
+MENUS = {"File": 20, "Edit": 80, "View": 140, "Insert": 200, "Format": 270, "Tools": 350}
+MENU_Y = 16
+BOLD_BUTTON = (420, 56)
+ITALIC_BUTTON = (460, 56)
+FORMAT_BOLD_ITEM = (300, 60)
+FIRST_LINE = (700, 150)
+CANVAS_MIDDLE = (700, 480)
+
+
+def _menu_html() -> str:
+    items = []
+    for name, x in MENUS.items():
+        items.append(f'<div class="menu" id="menu-{name.lower()}" style="left: {x}px">{name}</div>')
+    return "\n".join(items)
+
+
+MOCK_DOCS_HTML = f"""
+<!DOCTYPE html>
+<html><head><title>Untitled document - Google Docs</title>
+<style>
+    body {{ margin: 0; font: 14px Arial, sans-serif; background: #f8f9fa; overflow: hidden; }}
+    #menubar {{ position: absolute; top: 0; left: 0; right: 0; height: 32px; background: #fff; }}
+    .menu {{ position: absolute; top: 6px; padding: 2px 6px; cursor: pointer; }}
+    .menu:hover, .menu.open {{ background: #e8eaed; }}
+    #toolbar {{ position: absolute; top: 36px; left: 8px; right: 8px; height: 40px; background: #edf2fa; border-radius: 20px; }}
+    .tool {{ position: absolute; top: 8px; width: 28px; height: 24px; border: 0; background: none; font-weight: bold; cursor: pointer; }}
+    .tool.active {{ background: #d3e3fd; }}
+    #format-menu {{ display: none; position: absolute; top: 32px; left: {MENUS["Format"]}px; width: 200px; background: #fff;
+                   box-shadow: 0 2px 6px rgba(0,0,0,.3); padding: 6px 0; z-index: 10; }}
+    #format-menu div {{ padding: 6px 16px; cursor: pointer; }}
+    #format-menu div:hover {{ background: #e8eaed; }}
+    #canvas {{ position: absolute; top: 96px; left: 220px; width: 1000px; height: 780px; background: #fff;
+              box-shadow: 0 1px 3px rgba(0,0,0,.2); padding: 40px 72px; box-sizing: border-box; outline: none; overflow-y: auto; }}
+    #canvas p {{ margin: 0 0 12px; line-height: 1.5; }}
+</style></head>
+<body>
+<div id="menubar">{_menu_html()}</div>
+<div id="format-menu">
+    <div id="format-bold">Bold</div>
+    <div id="format-italic">Italic</div>
+    <div>Paragraph styles</div>
+    <div>Line &amp; paragraph spacing</div>
+</div>
+<div id="toolbar">
+    <button class="tool" id="bold" style="left: {BOLD_BUTTON[0] - 8 - 14}px">B</button>
+    <button class="tool" id="italic" style="left: {ITALIC_BUTTON[0] - 8 - 14}px"><i>I</i></button>
+</div>
+<div id="canvas" contenteditable="true" spellcheck="false">
+    <p>Meeting notes: quarterly planning</p>
+    {"".join(f"<p>Paragraph {i + 1}. The quick brown fox jumps over the lazy dog while the team reviews the roadmap, "
+             f"assigns owners and agrees on the dates for the next milestone.</p>" for i in range(30))}
+</div>
+<script>
+    const formatMenu = document.getElementById('format-menu');
+    const keepSelection = (event) => event.preventDefault();
+    const refresh = () => {{
+        document.getElementById('bold').classList.toggle('active', document.queryCommandState('bold'));
+        document.getElementById('italic').classList.toggle('active', document.queryCommandState('italic'));
+    }};
+    for (const [id, command] of [['bold', 'bold'], ['italic', 'italic'], ['format-bold', 'bold'], ['format-italic', 'italic']]) {{
+        const element = document.getElementById(id);
+        element.addEventListener('mousedown', keepSelection);
+        element.addEventListener('click', () => {{ document.execCommand(command); formatMenu.style.display = 'none'; refresh(); }});
+    }}
+    document.getElementById('menu-format').addEventListener('mousedown', keepSelection);
+    document.getElementById('menu-format').addEventListener('click', () => {{
+        // Docs renders its menus a moment after the click
+        setTimeout(() => {{ formatMenu.style.display = formatMenu.style.display === 'block' ? 'none' : 'block'; }}, 50);
+    }});
+    document.addEventListener('selectionchange', refresh);
+</script>
+</body></html>
+"""
+
+
+def normalized(point) -> Dict[str, int]:
+    """Pixel position as the model's 0-1000 coordinates"""
+    x, y = point
+    return {"x": round(x / SCREEN_WIDTH * 1000), "y": round(y / SCREEN_HEIGHT * 1000)}
+
+
+# A bold-text lesson on the mock: (explanation, [(function name, args)]) per turn, then the closing message
+BOLD_LESSON = [
+    ("First, select the line you want to make bold by triple-clicking it.", [("triple_click", normalized(FIRST_LINE))]),
+    ("Now click the Bold button in the toolbar.", [("click_at", normalized(BOLD_BUTTON))]),
+    ("Let's undo that so I can show you the menu way.", [("key_combination", {"keys": "control+z"})]),
+    ("Open the Format menu at the top.", [("click_at", normalized((MENUS["Format"] + 20, MENU_Y)))]),
+    ("Choose Bold from the menu.", [("click_at", normalized(FORMAT_BOLD_ITEM))]),
+    ("You can also use the keyboard shortcut. Select the line again and press Control and B.",
+     [("triple_click", normalized(FIRST_LINE)), ("key_combination", {"keys": "control+b"})]),
+    ("Scroll down to see the rest of the document.", [("scroll_document", {"direction": "down"})]),
+    ("Click into the text to keep typing.", [("click_at", normalized(CANVAS_MIDDLE))]),
+]
+BOLD_LESSON_DONE = "And that's how you make text bold in Google Docs!"
+
+
+class ScriptedComputerUseModel:
+    """
+    Stand-in for genai.Client that plays a scripted demonstration.
+
+    Each generate_content call returns the next scripted turn (the step's
+    explanation followed by its function calls) after a fixed latency,
+    then the closing message once the script is done. The request contents
+    are not inspected, so the loop runs exactly as it would against the
+    real model but the model's share of the time is known: turns × latency.
+    """
+
+    def __init__(self, script: Optional[List] = None, done: str = BOLD_LESSON_DONE, latency: float = 0.0):
+        self.script = BOLD_LESSON if script is None else script
+        self.done = done
+        self.latency = latency
+        self.calls = 0
+        self.models = self
+        self.aio = _AsyncScriptedModel(self)
+
+    def reset(self):
+        self.calls = 0
+
+    @property
+    def turns(self) -> int:
+        """Model calls in one run of the script"""
+        return len(self.script) + 1
+
+    def pause_seconds(self, plan) -> float:
+        """Deliberate highlight pauses the scripted actions will make (plan: plan_function_call)"""
+        total = 0.0
+        for _, calls in self.script:
+            for name, args in calls:
+                total += sum(op[1] for op in plan(name, args, SCREEN_WIDTH, SCREEN_HEIGHT) if op[0] == "pause")
+        return total
+
+    def generate_content(self, model=None, contents=None, config=None):
+        time.sleep(self.latency)
+        return self._response(self._next())
+
+    def generate_content_stream(self, model=None, contents=None, config=None) -> Iterator[Any]:
+        """The turn one part per chunk, the first after the latency"""
+        time.sleep(self.latency)
+        for part in self._next():
+            yield self._response([part])
+
+    def _next(self) -> List[Part]:
+        if self.calls < len(self.script):
+            text, calls = self.script[self.calls]
+            parts = [Part(text=text)] + [
+                Part(function_call=types.FunctionCall(name=name, args=args)) for name, args in calls
+            ]
+        else:
+            parts = [Part(text=self.done)]
+        self.calls += 1
+        return parts
+
+    @staticmethod
+    def _response(parts: List[Part]):
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=Content(role="model", parts=parts))])
+
+
+class _AsyncScriptedModel:
+    """ScriptedComputerUseModel.aio"""
+
+    def __init__(self, scripted: ScriptedComputerUseModel):
+        self._scripted = scripted
+        self.models = self
+
+    async def generate_content(self, model=None, contents=None, config=None):
+        await asyncio.sleep(self._scripted.latency)
+        return self._scripted._response(self._scripted._next())
+
+    async def generate_content_stream(self, model=None, contents=None, config=None) -> AsyncIterator[Any]:
+        await asyncio.sleep(self._scripted.latency)
+        parts = self._scripted._next()
+
+        async def stream():
+            for part in parts:
+                yield self._scripted._response([part])
+        return stream()
+
+
+def summary_of(values: List[float]) -> Dict[str, Any]:
+    ordered = sorted(values)
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[max(0, int(len(ordered) * 0.95) - 1)],
+    }
@@ -3,9 +3,11 @@ Browser Controller with Gemini Computer Use
 AI-powered browser automation for Amazon shopping
 """
 import asyncio
+import queue
+import threading
 import time
 import re
-from typing import Optional, Dict, Any, Callable, Union, Coroutine
+from typing import Optional, Dict, Any, Callable, List
 from concurrent.futures import ThreadPoolExecutor
 from playwright.sync_api import sync_playwright, Browser, Page, BrowserContext
 
@@ -14,22 +16,57 @@ from google.genai import types
 from google.genai.types import Content, Part
 
 import config
+from conversation_history import HINT_PREFIX, ConversationHistory, HistoryPolicy
+from screencast import ScreencastEncoder, mark_input
+from screenshot_encoding import ScreenshotEncoder, fingerprint_distance
+from trajectory_store import TrajectoryRecorder, TrajectoryStore, task_key
+from ui_settle import SettleDetector, default_settle
+from speech_pipeline import SpeechPipeline
+from narration import summary_cache
+from cancellation import CancelToken, DemoCancelled
+from browser_profile import BrowserProfile, default_profile
+from request_router import RequestRouter, default_router
+from tracing import ACTION, MODEL_REQUEST, REPLAY, SCREENSHOT, SETTLE, SPEECH_SUMMARY, THINKING, UI_SNAPSHOT, activate, current_trace, deactivate, record_since, span, tracer
+from streaming import CALL, TEXT, THOUGHT, ModelTurn, StreamedResponse
+from cassette import default_cassette
+from highlight_overlay import default_overlay
+from ui_snapshot import SNAPSHOT_INSTRUCTIONS, UiObserver, default_observer
 
 # Constants for screen dimensions
 SCREEN_WIDTH = 1440
 SCREEN_HEIGHT = 900
 
-# Initialize Gemini client
-client = genai.Client()
+# Chromium flags for every automation browser
+BROWSER_LAUNCH_ARGS = [
+    '--start-maximized',
+    '--disable-blink-features=AutomationControlled'
+]
+
+# Page every browser starts on
+START_URL = "https://docs.google.com"
+
+# Initialize Gemini client (through the cassette when recording or replaying; a replay needs no API key)
+client = default_cassette.wrap(None if default_cassette.replaying else genai.Client())
+
+# Screenshot encoding used when no per-instance encoder is given
+default_encoder = ScreencastEncoder() if config.SCREENSHOT_BACKEND == "screencast" else ScreenshotEncoder()
 
 
 def denormalize_x(x: int, screen_width: int) -> int:
-    """Convert normalized x coordinate (0-1000) to actual pixel coordinate."""
+    """Convert normalized x coordinate (0-1000) to actual pixel coordinate.
+
+    Always pass the viewport width, not the width of the (possibly
+    downscaled) screenshot the model was shown.
+    """
     return int(x / 1000 * screen_width)
 
 
 def denormalize_y(y: int, screen_height: int) -> int:
-    """Convert normalized y coordinate (0-1000) to actual pixel coordinate."""
+    """Convert normalized y coordinate (0-1000) to actual pixel coordinate.
+
+    Always pass the viewport height, not the height of the (possibly
+    downscaled) screenshot the model was shown.
+    """
     return int(y / 1000 * screen_height)
 
 
@@ -44,82 +81,40 @@ def show_click_highlight(page, x: int, y: int, color: str = "#FF4444", duration:
         color: Color of the highlight (default red for clicks)
         duration: Duration of animation in milliseconds
     """
-    # JavaScript to inject a ripple/highlight effect
-    highlight_js = f"""
-    (function() {{
-        // Create the highlight element
-        const highlight = document.createElement('div');
-        highlight.id = 'automation-highlight-' + Date.now();
-        
-        // Style the main highlight circle (smaller 16px size)
-        highlight.style.cssText = `
-            position: fixed;
-            left: {x}px;
-            top: {y}px;
-            width: 16px;
-            height: 16px;
-            margin-left: -8px;
-            margin-top: -8px;
-            border-radius: 50%;
-            background: {color};
-            opacity: 0.8;
-            pointer-events: none;
-            z-index: 999999;
-            box-shadow: 0 0 10px {color}, 0 0 20px {color}80;
-            animation: highlight-pulse {duration}ms ease-out forwards;
-        `;
-        
-        // Create ripple effect (smaller ring)
-        const ripple = document.createElement('div');
-        ripple.style.cssText = `
-            position: fixed;
-            left: {x}px;
-            top: {y}px;
-            width: 16px;
-            height: 16px;
-            margin-left: -8px;
-            margin-top: -8px;
-            border-radius: 50%;
-            border: 2px solid {color};
-            pointer-events: none;
-            z-index: 999998;
-            animation: highlight-ripple {duration}ms ease-out forwards;
-        `;
-        
-        // Add CSS animation keyframes if not already added
-        if (!document.getElementById('highlight-animation-styles')) {{
-            const style = document.createElement('style');
-            style.id = 'highlight-animation-styles';
-            style.textContent = `
-                @keyframes highlight-pulse {{
-                    0% {{ transform: scale(1); opacity: 0.8; }}
-                    50% {{ transform: scale(1.3); opacity: 0.5; }}
-                    100% {{ transform: scale(1.8); opacity: 0; }}
-                }}
-                @keyframes highlight-ripple {{
-                    0% {{ transform: scale(1); opacity: 1; }}
-                    100% {{ transform: scale(3); opacity: 0; }}
-                }}
-            `;
-            document.head.appendChild(style);
-        }}
-        
-        // Add elements to page
-        document.body.appendChild(highlight);
-        document.body.appendChild(ripple);
-        
-        // Remove elements after animation
-        setTimeout(() => {{
-            highlight.remove();
-            ripple.remove();
-        }}, {duration});
-    }})();
-    """
-    
-    try:
-        page.evaluate(highlight_js)
-    except Exception as e:
-        print(f"Highlight injection error: {e}")
+    default_overlay.show(page, x, y, color, duration)
+
+
+# Model that turns verbose model text into spoken instructions
+SUMMARY_MODEL = 'gemini-2.0-flash'
+
+SUMMARY_CONFIG = types.GenerateContentConfig(
+    temperature=0.3,
+    max_output_tokens=40,
+)
+
+
+def summary_contents(verbose_text: str):
+    """Prompt asking Gemini Flash to turn model output into a brief instruction"""
+    return [
+        Content(role="user", parts=[
+            Part(text=f"""Convert this browser action into a brief instruction for teaching a user.
+Give clear, direct instructions like "Click on the File menu" or "Type your search in the box" or "Now press Enter to submit".
+Use action words: Click, Type, Press, Select, Scroll, Drag, Open, etc.
+Keep it to 5-12 words. Be friendly and helpful.
+Never explain reasoning. Just give the instruction.
+
+Action to convert:
+{verbose_text}
+
+Instruction:""")
+        ])
+    ]
+
+
+def fallback_summary(verbose_text: str) -> str:
+    """First 10 words, used when summarization fails"""
+    words = verbose_text.split()[:10]
+    return ' '.join(words) + ('...' if len(verbose_text.split()) > 10 else '')
 
 
 def summarize_for_speech(verbose_text: str) -> str:
@@ -137,224 +132,281 @@ def summarize_for_speech(verbose_text: str) -> str:
         if len(verbose_text.split()) <= 10:
             return verbose_text
         
+        cached = summary_cache.get(verbose_text)
+        if cached:
+            return cached
+        
         response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=[
-                Content(role="user", parts=[
-                    Part(text=f"""Convert this browser action into a brief instruction for teaching a user.
-Give clear, direct instructions like "Click on the File menu" or "Type your search in the box" or "Now press Enter to submit".
-Use action words: Click, Type, Press, Select, Scroll, Drag, Open, etc.
-Keep it to 5-12 words. Be friendly and helpful.
-Never explain reasoning. Just give the instruction.
-
-Action to convert:
-{verbose_text}
-
-Instruction:""")
-                ])
-            ],
-            config=types.GenerateContentConfig(
-                temperature=0.3,
-                max_output_tokens=40,
-            )
+            model=SUMMARY_MODEL,
+            contents=summary_contents(verbose_text),
+            config=SUMMARY_CONFIG
         )
         
         summary = response.text.strip()
         # Clean up any quotes or extra formatting
         summary = summary.strip('"\'')
-        return summary if summary else verbose_text
+        if not summary:
+            return verbose_text
+        summary_cache.put(verbose_text, summary)
+        return summary
         
     except Exception as e:
         print(f"Summarization error: {e}")
         # Fall back to first 10 words if summarization fails
-        words = verbose_text.split()[:10]
-        return ' '.join(words) + ('...' if len(verbose_text.split()) > 10 else '')
-
-
-def execute_function_calls(candidate, page, screen_width, screen_height):
-    """Execute function calls from the model response and return results."""
-    results = []
-    function_calls = []
-    for part in candidate.content.parts:
-        if part.function_call:
-            function_calls.append(part.function_call)
-
-    for function_call in function_calls:
-        action_result = {}
-        fname = function_call.name
-        args = function_call.args
-        print(f"  -> Executing: {fname}")
-
-        # Check for safety decision in args
-        if 'safety_decision' in args:
-            safety_info = args['safety_decision']
-            print(f"  ⚠️ Safety check: {safety_info.get('explanation', 'Confirmation required')}")
-            # Auto-acknowledge for automation (in production, you'd prompt the user)
-            action_result["safety_acknowledgement"] = "true"
-            print(f"  ✅ Safety acknowledged")
+        return fallback_summary(verbose_text)
 
-        try:
-            if fname == "open_web_browser":
-                pass  # Already open
-            elif fname == "click_at":
-                actual_x = denormalize_x(args["x"], screen_width)
-                actual_y = denormalize_y(args["y"], screen_height)
-                # Show red highlight for click
-                show_click_highlight(page, actual_x, actual_y, color="#FF4444")
-                time.sleep(0.3)  # Brief pause to show highlight before clicking
-                page.mouse.click(actual_x, actual_y)
-            elif fname == "type_text_at":
-                actual_x = denormalize_x(args["x"], screen_width)
-                actual_y = denormalize_y(args["y"], screen_height)
-                text = args["text"]
-                press_enter = args.get("press_enter", False)
-                # Show blue highlight for typing
-                show_click_highlight(page, actual_x, actual_y, color="#4488FF")
-                time.sleep(0.3)
-                page.mouse.click(actual_x, actual_y)
-                # Clear existing text (Ctrl+A for Windows, then Backspace)
-                page.keyboard.press("Control+A")
-                page.keyboard.press("Backspace")
-                page.keyboard.type(text)
-                if press_enter:
-                    page.keyboard.press("Enter")
-            elif fname == "scroll":
-                # Handle scroll action - show highlight at center of viewport
-                direction = args.get("direction", "down")
-                amount = args.get("amount", 300)
-                center_x = screen_width // 2
-                center_y = screen_height // 2
-                show_click_highlight(page, center_x, center_y, color="#44FF44")
-                time.sleep(0.2)
-                if direction == "down":
-                    page.mouse.wheel(0, amount)
-                elif direction == "up":
-                    page.mouse.wheel(0, -amount)
-            elif fname == "scroll_document":
-                # Handle scroll document action - show highlight at center
-                direction = args.get("direction", "down")
-                amount = args.get("amount", 500)
-                center_x = screen_width // 2
-                center_y = screen_height // 2
-                show_click_highlight(page, center_x, center_y, color="#44FF44")
-                time.sleep(0.2)
-                if direction == "down":
-                    page.mouse.wheel(0, amount)
-                elif direction == "up":
-                    page.mouse.wheel(0, -amount)
-            elif fname == "scroll_at":
-                # Handle scroll at specific position
-                x = args.get("x", 500)
-                y = args.get("y", 500)
-                direction = args.get("direction", "down")
-                amount = args.get("amount", 300)
-                actual_x = denormalize_x(x, screen_width)
-                actual_y = denormalize_y(y, screen_height)
-                # Show green highlight for scroll
-                show_click_highlight(page, actual_x, actual_y, color="#44FF44")
-                time.sleep(0.3)
-                page.mouse.move(actual_x, actual_y)
-                if direction == "down":
-                    page.mouse.wheel(0, amount)
-                elif direction == "up":
-                    page.mouse.wheel(0, -amount)
-            elif fname == "go_back":
-                # Handle browser back navigation
-                page.go_back()
-            elif fname == "navigate":
-                # Handle navigation to URL
-                url = args.get("url", "")
-                if url:
-                    page.goto(url)
-            elif fname == "drag_and_drop":
-                # Handle drag to select text - with proper timing for selection
-                start_x = args.get("start_x", 0)
-                start_y = args.get("start_y", 0)
-                end_x = args.get("end_x", 0)
-                end_y = args.get("end_y", 0)
-                actual_start_x = denormalize_x(start_x, screen_width)
-                actual_start_y = denormalize_y(start_y, screen_height)
-                actual_end_x = denormalize_x(end_x, screen_width)
-                actual_end_y = denormalize_y(end_y, screen_height)
-                # Show orange highlight at start and end of drag
-                show_click_highlight(page, actual_start_x, actual_start_y, color="#FF8844")
-                time.sleep(0.2)
-                show_click_highlight(page, actual_end_x, actual_end_y, color="#FF8844")
-                time.sleep(0.2)
-                # Move to start, press, drag slowly, release
-                page.mouse.move(actual_start_x, actual_start_y)
-                time.sleep(0.1)
-                page.mouse.down()
-                time.sleep(0.1)
-                # Move in steps for better selection
-                page.mouse.move(actual_end_x, actual_end_y, steps=10)
-                time.sleep(0.1)
-                page.mouse.up()
-            elif fname == "key_combination":
-                # Handle keyboard shortcuts like Ctrl+A, Ctrl+B, Ctrl+C
-                keys = args.get("keys", "")
-                if keys:
-                    # Normalize key names for Playwright (control -> Control, alt -> Alt, etc.)
-                    normalized = keys
-                    normalized = normalized.replace("control", "Control")
-                    normalized = normalized.replace("ctrl", "Control")
-                    normalized = normalized.replace("alt", "Alt")
-                    normalized = normalized.replace("shift", "Shift")
-                    normalized = normalized.replace("meta", "Meta")
-                    normalized = normalized.replace("cmd", "Meta")
-                    print(f"Pressing keys: {normalized}")
-                    page.keyboard.press(normalized)
-            elif fname == "press_key":
-                # Handle single key press
-                key = args.get("key", "")
-                if key:
-                    page.keyboard.press(key)
-            elif fname == "triple_click":
-                # Handle triple click (select paragraph/line)
-                x = args.get("x", 500)
-                y = args.get("y", 500)
-                actual_x = denormalize_x(x, screen_width)
-                actual_y = denormalize_y(y, screen_height)
-                # Show red highlight for triple click
-                show_click_highlight(page, actual_x, actual_y, color="#FF4444")
-                time.sleep(0.3)
-                page.mouse.click(actual_x, actual_y, click_count=3)
-            elif fname == "double_click":
-                # Handle double click (select word)
-                x = args.get("x", 500)
-                y = args.get("y", 500)
-                actual_x = denormalize_x(x, screen_width)
-                actual_y = denormalize_y(y, screen_height)
-                # Show red highlight for double click
-                show_click_highlight(page, actual_x, actual_y, color="#FF4444")
-                time.sleep(0.3)
-                page.mouse.dblclick(actual_x, actual_y)
-            elif fname == "select_all":
-                # Select all text in the document
-                page.keyboard.press("Control+a")
+
+def plan_function_call(fname: str, args: Dict[str, Any], screen_width: int, screen_height: int) -> List[tuple]:
+    """
+    Translate one model function call into primitive page operations.
+
+    Both browser backends run the same plan (run_page_ops here, the async
+    runner in async_browser_controller), so an action behaves identically
+    whichever backend drives the page.
+
+    Args:
+        fname: Function name chosen by the model (e.g. "click_at")
+        args: Its arguments, with coordinates on the model's 0-1000 grid
+        screen_width: Viewport width in pixels
+        screen_height: Viewport height in pixels
+
+    Returns:
+        List of (operation, *arguments) tuples, e.g. [("highlight", 720, 450, "#FF4444"), ("pause", 0.3), ("click", 720, 450, 1)]
+    """
+    if fname == "open_web_browser":
+        return []  # Already open
+    if fname == "click_at":
+        actual_x = denormalize_x(args["x"], screen_width)
+        actual_y = denormalize_y(args["y"], screen_height)
+        # Show red highlight for click, with a brief pause to show it before clicking
+        return [("highlight", actual_x, actual_y, "#FF4444"), ("pause", 0.3), ("click", actual_x, actual_y, 1)]
+    if fname == "type_text_at":
+        actual_x = denormalize_x(args["x"], screen_width)
+        actual_y = denormalize_y(args["y"], screen_height)
+        # Show blue highlight for typing
+        ops = [("highlight", actual_x, actual_y, "#4488FF"), ("pause", 0.3), ("click", actual_x, actual_y, 1)]
+        # Clear existing text (Ctrl+A for Windows, then Backspace)
+        ops += [("press", "Control+A"), ("press", "Backspace"), ("type", args["text"])]
+        if args.get("press_enter", False):
+            ops.append(("press", "Enter"))
+        return ops
+    if fname in ("scroll", "scroll_document", "scroll_at"):
+        direction = args.get("direction", "down")
+        amount = args.get("amount", 500 if fname == "scroll_document" else 300)
+        if fname == "scroll_at":
+            # Scroll at a specific position
+            actual_x = denormalize_x(args.get("x", 500), screen_width)
+            actual_y = denormalize_y(args.get("y", 500), screen_height)
+            ops = [("highlight", actual_x, actual_y, "#44FF44"), ("pause", 0.3), ("move", actual_x, actual_y, 1)]
+        else:
+            # Show green highlight at center of viewport
+            ops = [("highlight", screen_width // 2, screen_height // 2, "#44FF44"), ("pause", 0.2)]
+        if direction == "down":
+            ops.append(("wheel", 0, amount))
+        elif direction == "up":
+            ops.append(("wheel", 0, -amount))
+        return ops
+    if fname == "go_back":
+        return [("go_back",)]
+    if fname == "navigate":
+        url = args.get("url", "")
+        return [("goto", url)] if url else []
+    if fname == "drag_and_drop":
+        # Drag to select text - with proper timing for selection
+        start_x = denormalize_x(args.get("start_x", 0), screen_width)
+        start_y = denormalize_y(args.get("start_y", 0), screen_height)
+        end_x = denormalize_x(args.get("end_x", 0), screen_width)
+        end_y = denormalize_y(args.get("end_y", 0), screen_height)
+        return [
+            # Show orange highlight at start and end of drag
+            ("highlight", start_x, start_y, "#FF8844"), ("pause", 0.2),
+            ("highlight", end_x, end_y, "#FF8844"), ("pause", 0.2),
+            # Move to start, press, drag slowly (in steps for better selection), release
+            ("move", start_x, start_y, 1), ("pause", 0.1),
+            ("down",), ("pause", 0.1),
+            ("move", end_x, end_y, 10), ("pause", 0.1),
+            ("up",),
+        ]
+    if fname == "key_combination":
+        # Keyboard shortcuts like Ctrl+A, Ctrl+B, Ctrl+C
+        keys = args.get("keys", "")
+        if not keys:
+            return []
+        # Normalize key names for Playwright (control -> Control, alt -> Alt, etc.)
+        normalized = keys
+        normalized = normalized.replace("control", "Control")
+        normalized = normalized.replace("ctrl", "Control")
+        normalized = normalized.replace("alt", "Alt")
+        normalized = normalized.replace("shift", "Shift")
+        normalized = normalized.replace("meta", "Meta")
+        normalized = normalized.replace("cmd", "Meta")
+        print(f"Pressing keys: {normalized}")
+        return [("press", normalized)]
+    if fname == "press_key":
+        key = args.get("key", "")
+        return [("press", key)] if key else []
+    if fname in ("triple_click", "double_click"):
+        # Triple click selects a paragraph/line, double click a word
+        actual_x = denormalize_x(args.get("x", 500), screen_width)
+        actual_y = denormalize_y(args.get("y", 500), screen_height)
+        click = ("click", actual_x, actual_y, 3) if fname == "triple_click" else ("dblclick", actual_x, actual_y)
+        return [("highlight", actual_x, actual_y, "#FF4444"), ("pause", 0.3), click]
+    if fname == "select_all":
+        # Select all text in the document
+        return [("press", "Control+a")]
+    print(f"Warning: Unimplemented or custom function {fname}")
+    return []
+
+
+def run_page_ops(page, ops: List[tuple], cancel_token: Optional[CancelToken] = None):
+    """Run a plan from plan_function_call on a sync Playwright page (pauses end early on cancellation)"""
+    highlighted_at = None
+    for op, *op_args in ops:
+        if op == "highlight":
+            highlighted_at = time.monotonic()
+            show_click_highlight(page, *op_args)
+        elif op == "pause":
+            seconds = op_args[0]
+            if highlighted_at is not None and default_overlay.fire_and_forget:
+                # The pause shows the highlight before acting; it has been on screen since the call went out
+                seconds = max(0.0, seconds - (time.monotonic() - highlighted_at))
+            highlighted_at = None
+            if cancel_token:
+                cancel_token.sleep(seconds)
             else:
-                print(f"Warning: Unimplemented or custom function {fname}")
+                time.sleep(seconds)
+        elif op == "click":
+            x, y, click_count = op_args
+            page.mouse.click(x, y, click_count=click_count)
+        elif op == "dblclick":
+            page.mouse.dblclick(*op_args)
+        elif op == "move":
+            x, y, steps = op_args
+            page.mouse.move(x, y, steps=steps)
+        elif op == "down":
+            page.mouse.down()
+        elif op == "up":
+            page.mouse.up()
+        elif op == "wheel":
+            page.mouse.wheel(*op_args)
+        elif op == "press":
+            page.keyboard.press(op_args[0])
+        elif op == "type":
+            page.keyboard.type(op_args[0])
+        elif op == "goto":
+            page.goto(op_args[0])
+        elif op == "go_back":
+            page.go_back()
+        else:
+            raise ValueError(f"Unknown page operation '{op}'")
+    mark_input(page)
 
-            # Wait for potential navigations/renders
-            try:
-                page.wait_for_load_state(timeout=5000)
-            except Exception:
-                pass  # Ignore timeout if page hasn't navigated
-            time.sleep(1)
 
-        except Exception as e:
-            print(f"Error executing {fname}: {e}")
-            action_result["error"] = str(e)
+def acknowledge_safety(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Auto-acknowledge a safety decision attached to a function call (in production, you'd prompt the user)"""
+    if 'safety_decision' not in args:
+        return {}
+    safety_info = args['safety_decision']
+    print(f"  ⚠️ Safety check: {safety_info.get('explanation', 'Confirmation required')}")
+    print(f"  ✅ Safety acknowledged")
+    return {"safety_acknowledgement": "true"}
 
-        results.append((fname, action_result))
 
-    return results
+# Actions that only send input to the focused element: nothing to wait for between them
+INPUT_ACTIONS = {"key_combination", "press_key", "select_all", "type_text_at"}
 
 
-def get_function_responses(page, results):
-    """Capture screenshot and build function responses to send back to the model."""
-    screenshot_bytes = page.screenshot(type="png")
-    current_url = page.url
+def settle_points(function_calls) -> List[bool]:
+    """
+    Whether to wait for the UI after each function call of a turn.
+
+    With UI_SETTLE_BATCH_INPUT, a run of consecutive input actions (e.g.
+    select all, then Control+B) goes back to back and settles once, after
+    its last action; every other action still settles after itself.
+    """
+    names = [call.name for call in function_calls]
+    if not config.UI_SETTLE_BATCH_INPUT:
+        return [True] * len(names)
+    return [
+        not (name in INPUT_ACTIONS and index + 1 < len(names) and names[index + 1] in INPUT_ACTIONS)
+        for index, name in enumerate(names)
+    ]
+
+
+def settle_page(page, settle: SettleDetector, action: str):
+    """Wait for the UI to settle after an action (or a batch ending with it)"""
+    with span(SETTLE, action=action):
+        settled_in = settle.wait(page)
+    print(f"  UI settled in {settled_in:.2f}s")
+
+
+def execute_function_call(function_call, page, screen_width, screen_height, settle: Optional[SettleDetector] = None, cancel_token: Optional[CancelToken] = None, wait: bool = True):
+    """
+    Execute one function call from the model and wait for the UI to settle.
+
+    Args:
+        wait: Settle after the action; False when the next action of a batch follows straight on
+
+    Returns:
+        (name, result) for the function response
+
+    Raises:
+        DemoCancelled: if cancel_token is cancelled before or during the action
+    """
+    settle = settle or default_settle
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+    fname = function_call.name
+    args = function_call.args
+    print(f"  -> Executing: {fname}")
+
+    # Check for safety decision in args
+    action_result = acknowledge_safety(args)
+
+    try:
+        with span(ACTION, action=fname):
+            run_page_ops(page, plan_function_call(fname, args, screen_width, screen_height), cancel_token)
+
+        # Wait for potential navigations/renders to settle
+        if wait:
+            settle_page(page, settle, fname)
+
+    except DemoCancelled:
+        raise
+    except Exception as e:
+        print(f"Error executing {fname}: {e}")
+        action_result["error"] = str(e)
+
+    return fname, action_result
+
+
+def execute_function_calls(candidate, page, screen_width, screen_height, settle: Optional[SettleDetector] = None, cancel_token: Optional[CancelToken] = None):
+    """
+    Execute function calls from the model response and return results.
+
+    Consecutive input actions settle once, after the last of them (see
+    settle_points); each call still gets its own result.
+
+    Raises:
+        DemoCancelled: if cancel_token is cancelled before or during an action
+    """
+    function_calls = [part.function_call for part in candidate.content.parts if part.function_call]
+    return [
+        execute_function_call(function_call, page, screen_width, screen_height, settle, cancel_token, wait)
+        for function_call, wait in zip(function_calls, settle_points(function_calls))
+    ]
+
+
+def candidate_from_calls(calls):
+    """Build a model candidate carrying recorded function calls, for execute_function_calls."""
+    return types.Candidate(content=Content(role="model", parts=[
+        Part(function_call=types.FunctionCall(name=call["name"], args=call["args"]))
+        for call in calls
+    ]))
+
+
+def build_function_responses(results, current_url: str, screenshot_bytes: Optional[bytes], mime_type: str, snapshot_text: Optional[str] = None):
+    """Function responses for executed actions, followed by the screenshot of the resulting screen and/or a UI snapshot."""
     function_responses = []
     
     for name, result in results:
@@ -370,12 +422,121 @@ def get_function_responses(page, results):
         )
     
     # Add screenshot as a separate part
-    screenshot_part = Part.from_bytes(data=screenshot_bytes, mime_type="image/png")
-    function_responses.append(screenshot_part)
+    if screenshot_bytes:
+        screenshot_part = Part.from_bytes(data=screenshot_bytes, mime_type=mime_type)
+        function_responses.append(screenshot_part)
+    if snapshot_text:
+        function_responses.append(Part(text=snapshot_text))
     
     return function_responses
 
 
+def get_function_responses(page, results, encoder: Optional[ScreenshotEncoder] = None, observer: Optional[UiObserver] = None):
+    """Capture screenshot (and/or a UI snapshot, per the observer) and build function responses to send back to the model."""
+    encoder = encoder or default_encoder
+    observation = None
+    if observer and observer.enabled:
+        with span(UI_SNAPSHOT) as attrs:
+            observation = observer.observe(page)
+            attrs.update(changed=round(observation.changed, 3), screenshot=observation.screenshot)
+    screenshot_bytes = None
+    if observation is None or observation.screenshot:
+        with span(SCREENSHOT, encoding=encoder.describe()) as attrs:
+            screenshot_bytes = encoder.capture(page)
+            attrs["bytes"] = len(screenshot_bytes)
+    else:
+        print(f"📝 UI changed {observation.changed:.0%}, sending the snapshot without a screenshot")
+    return build_function_responses(results, page.url, screenshot_bytes, encoder.mime_type, observation.text if observation else None)
+
+
+# Model driving the browser
+COMPUTER_USE_MODEL = 'gemini-2.5-computer-use-preview-10-2025'
+
+# Sent along with the screenshot after repeated clicks that changed nothing
+KEYBOARD_HINT = f"""{HINT_PREFIX} Clicking doesn't seem to be working. Try these alternatives:
+1. Use keyboard: Press Tab to focus the element, then Enter to activate
+2. Try clicking the product IMAGE instead of text
+3. Or just report that you cannot open this item and stop
+"""
+
+
+def computer_use_config() -> types.GenerateContentConfig:
+    """Model config with the Computer Use tool"""
+    return types.GenerateContentConfig(
+        tools=[types.Tool(computer_use=types.ComputerUse(
+            environment=types.Environment.ENVIRONMENT_BROWSER
+        ))],
+        thinking_config=types.ThinkingConfig(include_thoughts=True),
+    )
+
+
+def usage_attrs(response) -> Dict[str, Any]:
+    """Token counts of a model response, for its trace span"""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_token_count,
+        "thought_tokens": usage.thoughts_token_count,
+        "output_tokens": usage.candidates_token_count,
+    }
+
+
+def teaching_prompt(task_prompt: str, recorder: Optional[TrajectoryRecorder] = None) -> str:
+    """
+    The task wrapped in teaching-mode instructions.
+
+    Args:
+        task_prompt: The learner's task
+        recorder: Recorder holding steps a partial replay already performed, if any
+    """
+    prompt = f"""{task_prompt}
+
+You are a TEACHING ASSISTANT demonstrating how to use Google Docs/Sheets/Slides.
+
+TEACHING RULES:
+1. Perform the action step-by-step while explaining what you're doing
+2. After each step, briefly describe what you did (e.g., "I clicked on File menu")
+3. Complete the demonstration fully - show the whole process
+4. If you encounter a login page, explain that the user needs to sign in first
+5. SHOW ONLY ONE EXAMPLE - do NOT demonstrate multiple alternatives or repeat the same action with different options
+
+EXAMPLE TEACHING FLOW for "How do I create a new document?":
+- Step 1: Click the + button or File > New (explain: "First, click the + New button")
+- Step 2: Select "Google Docs" (explain: "Now select Google Docs from the menu")
+- Step 3: Document opens (explain: "And there you have a new document ready to use!")
+- STOP after showing ONE complete example
+
+IMPORTANT:
+- Speak naturally as if teaching a friend
+- Explain each action as you do it
+- Keep explanations brief but helpful
+- STOP after demonstrating ONE complete example - do not show alternatives like "you could also try this font" or "another option is..."
+
+TEXT SELECTION TIPS (use these when you need to select text):
+- To select ALL text: Use key_combination with "Control+a"
+- To select a word: Double-click on the word
+- To select a line/paragraph: Triple-click on the line
+- To format selected text as BOLD: Use key_combination with "Control+b"
+- To format selected text as ITALIC: Use key_combination with "Control+i"
+- To UNDO: Use key_combination with "Control+z" """
+
+    # A partial replay already performed the first steps; let the model continue from here
+    if recorder and recorder.steps:
+        done = "\n".join(f"- {' '.join(step['speech']) or ', '.join(c['name'] for c in step['calls'])}" for step in recorder.steps)
+        prompt += f"""
+
+ALREADY DONE: The first {len(recorder.steps)} step(s) of this demonstration were already performed and explained:
+{done}
+Continue from the current screen without repeating them."""
+    return prompt
+
+
+def clean_model_text(text: str) -> str:
+    """Remove the "I have evaluated step X" prefix the model puts before its explanations"""
+    return re.sub(r'^I have evaluated step \d+[,.]?\s*(and\s*)?', '', text, flags=re.IGNORECASE)
+
+
 class BrowserAutomation:
     """Handles AI-powered browser automation using Gemini Computer Use"""
     
@@ -384,8 +545,30 @@ class BrowserAutomation:
     # Dedicated single-thread executor for all Playwright operations
     # This ensures all browser ops run on the same thread (required by Playwright's greenlets)
     _browser_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser_thread")
+    # Model requests of cancellable demonstrations run here so the browser thread can walk away from them.
+    # Shared by every page on the worker: two threads per page, so a request a cancelled demonstration
+    # left behind (it ends with its response or next chunk) never holds up another page's next request
+    _model_executor = ThreadPoolExecutor(max_workers=max(4, 2 * config.BROWSER_POOL_SIZE), thread_name_prefix="gemini_request")
     
-    def __init__(self):
+    def __init__(self, gemini_client: Optional[genai.Client] = None, history_policy: Optional[HistoryPolicy] = None, screenshot_encoder: Optional[ScreenshotEncoder] = None, trajectory_store: Optional[TrajectoryStore] = None, settle_detector: Optional[SettleDetector] = None, executor: Optional[ThreadPoolExecutor] = None, profile: Optional[BrowserProfile] = None, router: Optional[RequestRouter] = None, ui_observer: Optional[UiObserver] = None):
+        # Thread that owns this instance's Playwright objects (a pool host's thread for pooled pages)
+        self._executor = executor or self._browser_executor
+        # False when the page is leased from a BrowserPool, which then owns the browser's lifecycle
+        self.owns_browser = True
+        # Gemini client used by the agent loop (injectable so the loop can run against a stub)
+        self.client = gemini_client or client
+        self.history_policy = history_policy or HistoryPolicy()
+        self.screenshot_encoder = screenshot_encoder or default_encoder
+        self.trajectory_store = trajectory_store or TrajectoryStore()
+        self.settle_detector = settle_detector or default_settle
+        # Saved cookies, storage and caches reused across launches of the standalone browser
+        self.profile = profile or default_profile
+        # Blocks telemetry and serves static assets locally for the standalone browser's context
+        self.router = router or default_router
+        # Whether each turn is observed through a screenshot, a text snapshot of the UI, or both
+        self.ui_observer = ui_observer or default_observer
+        # Act on each part of the model's response as it streams in instead of waiting for all of it
+        self.stream_responses = config.STREAM_RESPONSES
         self.playwright = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
@@ -406,16 +589,32 @@ class BrowserAutomation:
             await cls._instance.initialize()
         return cls._instance
     
+    def attach(self, browser: Browser, context: BrowserContext, page: Page):
+        """
+        Drive an existing page (leased from a BrowserPool) instead of launching a browser.
+        Must run on the thread that owns the page.
+        """
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.owns_browser = False
+        self.settle_detector.install(page)
+        default_overlay.install(page)
+        self.is_initialized = True
+
     async def initialize(self) -> bool:
         """Initialize the browser"""
-        if self.is_initialized and self.browser and self.browser.is_connected():
+        if self.is_initialized and self.is_alive():
             return True
+        if not self.owns_browser:
+            # Pooled pages are recycled by the pool, never relaunched here
+            return self.is_initialized
         
         try:
             print("Initializing browser...")
             # Run playwright in dedicated browser thread (same thread for all ops)
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(self._browser_executor, self._init_browser_sync)
+            await loop.run_in_executor(self._executor, self._init_browser_sync)
             self.is_initialized = True
             print("✅ Browser initialized successfully")
             return True
@@ -423,43 +622,82 @@ class BrowserAutomation:
             print(f"❌ Browser initialization failed: {e}")
             return False
     
+    def is_alive(self) -> bool:
+        """Whether the browser is still running (a persistent context has no Browser object)"""
+        if self.browser:
+            return self.browser.is_connected()
+        return bool(self.page and not self.page.is_closed())
+
     def _init_browser_sync(self):
         """Synchronous browser initialization"""
         self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(
-            headless=config.BROWSER_HEADLESS,
-            args=[
-                '--start-maximized',
-                '--disable-blink-features=AutomationControlled'
-            ]
-        )
-        self.context = self.browser.new_context(
-            viewport={"width": self.screen_width, "height": self.screen_height}
-        )
-        self.page = self.context.new_page()
+        self.profile.ensure_healthy()
+        if self.profile.persistent:
+            try:
+                self.context = self._launch_persistent_sync()
+            except Exception as e:
+                # A profile Chromium can't open is reset once rather than failing every launch
+                print(f"⚠️ Could not open browser profile ({e}), resetting it")
+                self.profile.reset()
+                self.context = self._launch_persistent_sync()
+            self.browser = self.context.browser
+            self.page = self.context.pages[0] if self.context.pages else self.context.new_page()
+        else:
+            self.browser = self.playwright.chromium.launch(
+                headless=config.BROWSER_HEADLESS,
+                args=self.profile.launch_args(BROWSER_LAUNCH_ARGS)
+            )
+            self.context = self.browser.new_context(
+                **self.profile.context_options(self.screen_width, self.screen_height)
+            )
+            self.page = self.context.new_page()
+        self.router.install(self.context)
+        self.settle_detector.install(self.page)
+        default_overlay.install(self.page)
         # Navigate to Google Docs by default
-        self.page.goto("https://docs.google.com")
+        self.page.goto(START_URL)
     
     async def close(self):
         """Close the browser"""
+        if not self.owns_browser:
+            # Pooled pages go back to their pool (see BrowserPool.release)
+            self.is_initialized = False
+            return
         try:
-            if self.browser:
+            if self.browser or self.context:
                 loop = asyncio.get_event_loop()
-                await loop.run_in_executor(self._browser_executor, self._close_browser_sync)
+                await loop.run_in_executor(self._executor, self._close_browser_sync)
             self.is_initialized = False
             BrowserAutomation._instance = None
             print("🔒 Browser closed")
         except Exception as e:
             print(f"❌ Error closing browser: {e}")
     
+    def _launch_persistent_sync(self) -> BrowserContext:
+        """Chromium on the profile's user-data directory"""
+        return self.playwright.chromium.launch_persistent_context(
+            self.profile.user_data_dir,
+            headless=config.BROWSER_HEADLESS,
+            args=self.profile.launch_args(BROWSER_LAUNCH_ARGS),
+            viewport={"width": self.screen_width, "height": self.screen_height}
+        )
+
     def _close_browser_sync(self):
         """Synchronous browser close"""
+        if self.context:
+            try:
+                # Keep cookies and storage for the next launch
+                self.profile.save_storage_state(self.context.storage_state())
+            except Exception as e:
+                print(f"Could not save browser storage state: {e}")
         if self.browser:
             self.browser.close()
+        elif self.context:
+            self.context.close()
         if self.playwright:
             self.playwright.stop()
     
-    async def execute_task(self, task_prompt: str, turn_limit: int = 15, speech_callback: Optional[Callable] = None) -> Dict[str, Any]:
+    async def execute_task(self, task_prompt: str, turn_limit: int = 15, speech_callback: Optional[Callable] = None, lesson_id: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
         """
         Execute a browser automation task using Gemini Computer Use.
         
@@ -467,12 +705,15 @@ class BrowserAutomation:
             task_prompt: The task to perform (e.g., "Search for wireless earbuds")
             turn_limit: Maximum number of turns to prevent infinite loops
             speech_callback: Optional async callback function to speak text aloud
+            lesson_id: Known lesson the task matched, so differently phrased questions share one recording
+            cancel_token: Stops the demonstration between model turns and actions when cancelled
             
         Returns:
-            Dict with success status and result message
+            Dict with success status and result message ("cancelled": True if it was stopped)
         """
         try:
-            await self.initialize()
+            if not await self.initialize():
+                return {"success": False, "error": "The browser is not available"}
             
             print(f"\n{'='*50}")
             print(f"Goal: {task_prompt}")
@@ -481,14 +722,16 @@ class BrowserAutomation:
             # Capture the event loop for async callback scheduling
             loop = asyncio.get_event_loop()
             
-            # Run the agent loop in dedicated browser thread (same thread as init)
+            # Run the task in dedicated browser thread (same thread as init)
             result = await loop.run_in_executor(
-                self._browser_executor, 
-                self._run_agent_loop_sync, 
+                self._executor, 
+                self._run_task_sync, 
                 task_prompt, 
                 turn_limit,
                 speech_callback,
-                loop  # Pass the event loop
+                loop,  # Pass the event loop
+                lesson_id,
+                cancel_token
             )
             
             return result
@@ -497,62 +740,243 @@ class BrowserAutomation:
             print(f"Task execution failed: {e}")
             return {"success": False, "error": str(e)}
     
-    def _run_agent_loop_sync(self, task_prompt: str, turn_limit: int, speech_callback: Optional[Callable] = None, event_loop: Optional[asyncio.AbstractEventLoop] = None) -> Dict[str, Any]:
+    def _run_task_sync(self, task_prompt: str, turn_limit: int, speech_callback: Optional[Callable] = None, event_loop: Optional[asyncio.AbstractEventLoop] = None, lesson_id: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
+        """Replay a recorded demonstration if one matches, otherwise run the live agent loop"""
+        key = f"lesson:{lesson_id}" if lesson_id else task_key(task_prompt)
+        recorder = TrajectoryRecorder(task_prompt, key) if config.TRAJECTORY_RECORDING else None
+        trace = tracer.start_demo(task_prompt, backend="sync", streamed=self.stream_responses)
+        trace_token = activate(trace)
+        # Speech runs on its own thread so narration never holds up the browser
+        summarizer = trace.timed(SPEECH_SUMMARY, summarize_for_speech) if trace else summarize_for_speech
+        speech = SpeechPipeline(speech_callback, event_loop, summarizer)
+        result = {}
+
+        try:
+            if config.TRAJECTORY_REPLAY:
+                trajectory = self.trajectory_store.load(key)
+                if trajectory:
+                    with span(REPLAY):
+                        result = self._replay_trajectory_sync(trajectory, speech, recorder, cancel_token)
+                    if result:
+                        return result
+
+            result = self._run_agent_loop_sync(task_prompt, turn_limit, speech, recorder, cancel_token)
+            return result
+        except DemoCancelled as e:
+            print(f"⏹️ Demonstration stopped: {e}")
+            # Whatever was still waiting to be said no longer applies
+            speech.cancel()
+            self._restore_page_sync()
+            result = {"success": False, "cancelled": True, "error": f"Demonstration stopped ({e})"}
+            return result
+        finally:
+            # Let the last steps be spoken before reporting the demonstration as done
+            speech.close(timeout=config.SPEECH_FLUSH_TIMEOUT)
+            stats = summary_cache.stats()
+            print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+            if default_cassette.mode != "off":
+                tape = default_cassette.stats()
+                print(f"Gemini cassette: {tape['recorded']} recorded, {tape['replayed']} replayed ({tape['model_seconds']:.1f}s of model time), {tape['misses']} missed")
+            if trace:
+                trace.finish(success=bool(result and result.get("success")), cancelled=bool(result and result.get("cancelled")), replayed=bool(result and result.get("replayed")))
+            deactivate(trace_token)
+
+    def _restore_page_sync(self):
+        """After a stopped demonstration: release a held mouse button and close any open menu or dialog"""
+        try:
+            self.page.mouse.up()
+            self.page.keyboard.press("Escape")
+        except Exception as e:
+            print(f"Could not tidy up the page: {e}")
+
+    def _generate_sync(self, contents, model_config, cancel_token: Optional[CancelToken] = None):
+        """Ask the model for the next step; abandoned as soon as the demonstration is cancelled"""
+        if cancel_token is None:
+            return self.client.models.generate_content(model=COMPUTER_USE_MODEL, contents=contents, config=model_config)
+        cancel_token.raise_if_cancelled()
+        future = self._model_executor.submit(
+            self.client.models.generate_content,
+            model=COMPUTER_USE_MODEL,
+            contents=contents,
+            config=model_config,
+        )
+        return cancel_token.result(future)
+
+    def _stream_turn_sync(self, contents, model_config, speech: SpeechPipeline, cancel_token: Optional[CancelToken] = None) -> ModelTurn:
+        """
+        Stream the model's next step, narrating its explanation and running each action as soon as it is complete.
+
+        The response is read on the model executor while the actions run here,
+        so the rest of the response keeps arriving during the first action.
+        """
+        turn = ModelTurn()
+        response = StreamedResponse()
+        chunks = queue.Queue()
+        stop = threading.Event()
+        started = time.monotonic()
+        unspoken = None  # Explanation waiting for the action it describes
+        thinking = True  # Until the first part that isn't a thought
+        unsettled = None  # Input action whose settle waits to see whether another input action follows
+
+        def read():
+            stream = None
+            try:
+                stream = self.client.models.generate_content_stream(model=COMPUTER_USE_MODEL, contents=contents, config=model_config)
+                for chunk in stream:
+                    if stop.is_set():
+                        return
+                    chunks.put(chunk)
+                chunks.put(None)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                # Closing the stream drops the connection of a response nobody reads any more
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+
+        reader = self._model_executor.submit(read)
+        try:
+            while True:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                try:
+                    chunk = chunks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                for kind, value in response.feed(chunk) if chunk is not None else response.finish():
+                    if thinking and kind != THOUGHT:
+                        record_since(THINKING, started)
+                        thinking = False
+                    if kind == THOUGHT:
+                        print(f"Model's reasoning: {value}")
+                    elif kind == TEXT:
+                        if unspoken:
+                            turn.narrate(speech, unspoken, [])
+                        unspoken = clean_model_text(value)
+                        print(f"Model says: {unspoken}")
+                    elif kind == CALL:
+                        turn.function_calls.append(value)
+                        if unspoken:
+                            turn.narrate(speech, unspoken, [value])
+                            unspoken = None
+                        if turn.first_action_after is None:
+                            turn.first_action_after = time.monotonic() - started
+                            print(f"⚡ First action {turn.first_action_after:.2f}s after the request")
+                        if unsettled and value.name not in INPUT_ACTIONS:
+                            settle_page(self.page, self.settle_detector, unsettled)
+                        batched = config.UI_SETTLE_BATCH_INPUT and value.name in INPUT_ACTIONS
+                        turn.results.append(execute_function_call(
+                            value, self.page, self.screen_width, self.screen_height, self.settle_detector, cancel_token, wait=not batched
+                        ))
+                        unsettled = value.name if batched else None
+                if chunk is None:
+                    break
+        finally:
+            stop.set()
+            reader.cancel()  # Never started (the executor was busy): don't send the request at all
+
+        if unsettled:
+            settle_page(self.page, self.settle_detector, unsettled)
+
+        if unspoken:
+            turn.narrate(speech, unspoken, [])
+        turn.parts = response.parts
+        return turn
+
+    def _replay_trajectory_sync(self, trajectory: Dict[str, Any], speech: SpeechPipeline, recorder: Optional[TrajectoryRecorder] = None, cancel_token: Optional[CancelToken] = None) -> Optional[Dict[str, Any]]:
+        """
+        Replay a recorded demonstration locally, without calling the model.
+
+        Before every step the current screen is compared with the one seen
+        when the demonstration was recorded. Returns None as soon as a step
+        diverges (or an action fails) so the caller can hand over to the
+        live model loop from the current screen.
+        """
+        steps = trajectory["steps"]
+        threshold = config.TRAJECTORY_MATCH_THRESHOLD
+        print(f"▶️ Replaying recorded demonstration ({len(steps)} steps)")
+        try:
+            for index, step in enumerate(steps):
+                fingerprint = self.screenshot_encoder.fingerprint(self.page)
+                distance = fingerprint_distance(fingerprint, step["fingerprint"])
+                if distance > threshold:
+                    print(f"↩️ Replay diverged at step {index + 1} (difference {distance:.3f}), handing over to the model")
+                    return None
+
+                for text in step["speech"]:
+                    speech.speak(text)
+
+                results = execute_function_calls(
+                    candidate_from_calls(step["calls"]),
+                    self.page,
+                    self.screen_width,
+                    self.screen_height,
+                    self.settle_detector,
+                    cancel_token
+                )
+                if any("error" in result for _, result in results):
+                    print(f"↩️ Replayed action failed at step {index + 1}, handing over to the model")
+                    if recorder:
+                        recorder.mark_failed()
+                    return None
+                if recorder:
+                    recorder.add_step(step["url"], fingerprint, step["speech"], step["calls"])
+
+            distance = fingerprint_distance(self.screenshot_encoder.fingerprint(self.page), trajectory["final_fingerprint"])
+            if distance > threshold:
+                print(f"↩️ Replay ended on an unexpected screen (difference {distance:.3f}), handing over to the model")
+                return None
+        except DemoCancelled:
+            raise
+        except Exception as e:
+            print(f"❌ Replay error: {e}")
+            if recorder:
+                recorder.mark_failed()
+            return None
+
+        print("✅ Replay finished")
+        return {
+            "success": True,
+            "message": trajectory["final_message"] or "Task completed successfully",
+            "url": self.page.url,
+            "replayed": True
+        }
+
+    def _run_agent_loop_sync(self, task_prompt: str, turn_limit: int, speech: SpeechPipeline, recorder: Optional[TrajectoryRecorder] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
         """Synchronous agent loop execution"""
         try:
             # Configure the model with Computer Use tool
-            model_config = types.GenerateContentConfig(
-                tools=[types.Tool(computer_use=types.ComputerUse(
-                    environment=types.Environment.ENVIRONMENT_BROWSER
-                ))],
-                thinking_config=types.ThinkingConfig(include_thoughts=True),
-            )
+            model_config = computer_use_config()
 
             # Take initial screenshot
-            initial_screenshot = self.page.screenshot(type="png")
+            with span(SCREENSHOT, encoding=self.screenshot_encoder.describe()) as attrs:
+                initial_screenshot = self.screenshot_encoder.capture(self.page)
+                attrs["bytes"] = len(initial_screenshot)
             current_url = self.page.url
             
-            print(f"Initial screenshot taken at: {current_url}")
+            print(f"Initial screenshot taken at: {current_url} ({self.screenshot_encoder.describe()}, {len(initial_screenshot) // 1024} KB)")
+            # Thumbnail of what the model is looking at, recorded with each step for replay
+            observation = self.screenshot_encoder.fingerprint(self.page) if recorder else []
 
             # Add instructions for teaching mode
-            enhanced_prompt = f"""{task_prompt}
-
-You are a TEACHING ASSISTANT demonstrating how to use Google Docs/Sheets/Slides.
-
-TEACHING RULES:
-1. Perform the action step-by-step while explaining what you're doing
-2. After each step, briefly describe what you did (e.g., "I clicked on File menu")
-3. Complete the demonstration fully - show the whole process
-4. If you encounter a login page, explain that the user needs to sign in first
-5. SHOW ONLY ONE EXAMPLE - do NOT demonstrate multiple alternatives or repeat the same action with different options
-
-EXAMPLE TEACHING FLOW for "How do I create a new document?":
-- Step 1: Click the + button or File > New (explain: "First, click the + New button")
-- Step 2: Select "Google Docs" (explain: "Now select Google Docs from the menu")
-- Step 3: Document opens (explain: "And there you have a new document ready to use!")
-- STOP after showing ONE complete example
-
-IMPORTANT:
-- Speak naturally as if teaching a friend
-- Explain each action as you do it
-- Keep explanations brief but helpful
-- STOP after demonstrating ONE complete example - do not show alternatives like "you could also try this font" or "another option is..."
-
-TEXT SELECTION TIPS (use these when you need to select text):
-- To select ALL text: Use key_combination with "Control+a"
-- To select a word: Double-click on the word
-- To select a line/paragraph: Triple-click on the line
-- To format selected text as BOLD: Use key_combination with "Control+b"
-- To format selected text as ITALIC: Use key_combination with "Control+i"
-- To UNDO: Use key_combination with "Control+z" """
+            enhanced_prompt = teaching_prompt(task_prompt, recorder)
+            initial_parts = [Part.from_bytes(data=initial_screenshot, mime_type=self.screenshot_encoder.mime_type)]
+            if self.ui_observer.enabled:
+                enhanced_prompt += SNAPSHOT_INSTRUCTIONS
+                with span(UI_SNAPSHOT):
+                    initial_parts.append(Part(text=self.ui_observer.observe(self.page, force_screenshot=True).text or ""))
 
             # Initialize conversation history with enhanced prompt + initial screenshot
-            contents = [
-                Content(role="user", parts=[
-                    Part(text=enhanced_prompt),
-                    Part.from_bytes(data=initial_screenshot, mime_type='image/png')
-                ])
-            ]
+            history = ConversationHistory(self.history_policy)
+            history.add_user(
+                [Part(text=enhanced_prompt)] + initial_parts,
+                url=current_url,
+                step_text="Initial view before the demonstration",
+            )
 
             final_response = ""
             failed_click_count = 0  # Track consecutive failed clicks
@@ -562,91 +986,107 @@ TEXT SELECTION TIPS (use these when you need to select text):
             for i in range(turn_limit):
                 print(f"\n{'='*50}")
                 print(f"--- Turn {i+1} ---")
+                trace = current_trace()
+                if trace:
+                    trace.begin_turn(i + 1)
+                
+                # Replace old screenshots with placeholders before resending the history
+                history.prune()
+                # Fold the oldest steps into a summary once the prompt outgrows its token budget
+                folded = history.compact()
+                if folded:
+                    print(f"🗜️ Folded {folded} older step(s) into the summary ({history.folded_steps} so far)")
+                payload_bytes = history.payload_bytes()
+                prompt_tokens = history.estimated_tokens()
+                print(f"Sending {payload_bytes // 1024} KB, ~{prompt_tokens} tokens ({history.screenshot_count()} screenshot(s))")
                 print("Thinking...")
                 
-                # Step 1: Send query to the model
-                response = client.models.generate_content(
-                    model='gemini-2.5-computer-use-preview-10-2025',
-                    contents=contents,
-                    config=model_config,
-                )
+                # Step 1: Ask the model. A streamed response is narrated and acted on as it arrives,
+                # so its span also covers the actions run during the stream
+                with span(MODEL_REQUEST, payload_bytes=payload_bytes, estimated_tokens=prompt_tokens, screenshots=history.screenshot_count(), streamed=self.stream_responses) as request_attrs:
+                    if self.stream_responses:
+                        turn = self._stream_turn_sync(history.contents, model_config, speech, cancel_token)
+                        request_attrs["first_action_ms"] = round(turn.first_action_after * 1000, 1) if turn.first_action_after is not None else None
+                    else:
+                        response = self._generate_sync(history.contents, model_config, cancel_token)
+                        request_attrs.update(usage_attrs(response))
+                if request_attrs.get("prompt_tokens"):
+                    print(f"Prompt was {request_attrs['prompt_tokens']} tokens")
+                if not self.stream_responses:
+                    candidate = response.candidates[0]
+                    turn = ModelTurn(candidate.content)
 
-                candidate = response.candidates[0]
-                
-                # Print the model's thoughts/reasoning (with null check)
-                if candidate.content and candidate.content.parts:
-                    for part in candidate.content.parts:
+                    # Print the model's thoughts/reasoning (with null check)
+                    for part in turn.parts:
                         if hasattr(part, 'text') and part.text:
                             is_thought = getattr(part, 'thought', False)
                             if is_thought:
                                 print(f"Model's reasoning: {part.text}")
                             else:
                                 # Clean up the text by removing "I have evaluated step X" prefix
-                                clean_text = re.sub(r'^I have evaluated step \d+[,.]?\s*(and\s*)?', '', part.text, flags=re.IGNORECASE)
+                                clean_text = clean_model_text(part.text)
                                 print(f"Model says: {clean_text}")
-                                
-                                # Speak every response for teaching mode
-                                if speech_callback and clean_text.strip() and event_loop:
-                                    try:
-                                        # Summarize verbose text to brief speech using Gemini Flash
-                                        brief_speech = summarize_for_speech(clean_text)
-                                        print(f"Speaking: {brief_speech}")
-                                        
-                                        # Use run_coroutine_threadsafe to schedule on main event loop
-                                        future = asyncio.run_coroutine_threadsafe(
-                                            speech_callback(brief_speech),
-                                            event_loop
-                                        )
-                                        # Wait briefly for it to be queued (session.say is fast)
-                                        future.result(timeout=2.0)
-                                    except Exception as e:
-                                        print(f"Speech callback error: {e}")
-                                
-                                final_response = clean_text
+
+                                # Speak every response for teaching mode. Describe the turn's actions
+                                # locally when we can; otherwise summarize on the speech thread while
+                                # we carry on with the actions
+                                turn.narrate(speech, clean_text, turn.function_calls)
+
+                    # Step 2: Execute the function calls
+                    if turn.function_calls:
+                        print("Executing actions...")
+                        turn.results = execute_function_calls(
+                            candidate,
+                            self.page,
+                            self.screen_width,
+                            self.screen_height,
+                            self.settle_detector,
+                            cancel_token
+                        )
+                final_response = turn.last_text or final_response
                 
                 # Add model's response to conversation history
-                if candidate.content:
-                    contents.append(candidate.content)
+                if turn.content:
+                    history.add_model(turn.content)
 
-                # Check if model returned function calls (with null check)
-                has_function_calls = False
-                if candidate.content and candidate.content.parts:
-                    has_function_calls = any(part.function_call for part in candidate.content.parts if hasattr(part, 'function_call'))
-                
-                if not has_function_calls:
+                if not turn.function_calls:
                     # No more actions - model is done
-                    text_response = ""
-                    if candidate.content and candidate.content.parts:
-                        text_response = " ".join([part.text for part in candidate.content.parts if hasattr(part, 'text') and part.text and not getattr(part, 'thought', False)])
+                    text_response = turn.text
                     print("\n" + "="*50)
                     print("✅ Agent finished with response:")
                     print("="*50)
                     print(text_response)
+                    if recorder and recorder.steps and not recorder.failed:
+                        try:
+                            # The recording stores what was actually spoken; never wait on it unbounded here,
+                            # on the browser thread
+                            if speech.flush(timeout=config.SPEECH_FLUSH_TIMEOUT):
+                                self.trajectory_store.save(recorder.to_dict(observation, text_response))
+                                print(f"💾 Recorded demonstration ({len(recorder.steps)} steps)")
+                            else:
+                                print("Trajectory not saved: narration didn't finish in time")
+                        except Exception as e:
+                            print(f"Trajectory save error: {e}")
                     return {
                         "success": True,
                         "message": text_response or "Task completed successfully",
                         "url": self.page.url
                     }
 
-                # Step 2: Execute the function calls
-                print("Executing actions...")
-                
                 # Check if this was a click action
-                was_click = any(
-                    part.function_call and part.function_call.name == "click_at" 
-                    for part in candidate.content.parts if part.function_call
-                )
-                
-                results = execute_function_calls(
-                    candidate, 
-                    self.page, 
-                    self.screen_width, 
-                    self.screen_height
-                )
+                was_click = any(call.name == "click_at" for call in turn.function_calls)
+                results = turn.results
+                step_text = turn.step_text
+                if recorder:
+                    recorder.add_step(last_url, observation, turn.spoken, turn.function_calls)
+                    if any("error" in result for _, result in results):
+                        recorder.mark_failed()
 
                 # Step 3: Capture state and build function responses
                 print("Capturing state...")
-                function_responses = get_function_responses(self.page, results)
+                function_responses = get_function_responses(self.page, results, self.screenshot_encoder, self.ui_observer)
+                if recorder:
+                    observation = self.screenshot_encoder.fingerprint(self.page)
                 
                 # Check if URL changed after action
                 new_url = self.page.url
@@ -663,18 +1103,15 @@ TEXT SELECTION TIPS (use these when you need to select text):
                 
                 # If 2+ failed clicks, add hint to try keyboard navigation
                 if failed_click_count >= 2:
-                    hint = Part(text="""
-HINT: Clicking doesn't seem to be working. Try these alternatives:
-1. Use keyboard: Press Tab to focus the element, then Enter to activate
-2. Try clicking the product IMAGE instead of text
-3. Or just report that you cannot open this item and stop
-""")
-                    function_responses.append(hint)
+                    function_responses.append(Part(text=KEYBOARD_HINT))
                     print("💡 Added keyboard navigation hint")
 
                 # Step 4: Send results back to the model for next iteration
-                contents.append(
-                    Content(role="user", parts=function_responses)
+                history.add_user(
+                    function_responses,
+                    url=new_url,
+                    actions=[name for name, _ in results],
+                    step_text=step_text,
                 )
             
             print(f"\n⚠️ Reached turn limit ({turn_limit}). Stopping.")
@@ -684,6 +1121,8 @@ HINT: Clicking doesn't seem to be working. Try these alternatives:
                 "url": self.page.url
             }
             
+        except DemoCancelled:
+            raise
         except Exception as e:
             print(f"❌ Agent loop error: {e}")
             import traceback
@@ -698,7 +1137,7 @@ HINT: Clicking doesn't seem to be working. Try these alternatives:
             
             loop = asyncio.get_event_loop()
             url = self.page.url
-            title = await loop.run_in_executor(None, lambda: self.page.title())
+            title = await loop.run_in_executor(self._executor, lambda: self.page.title())
             
             return {
                 "success": True,
@@ -0,0 +1,566 @@
+"""
+Browser Pool for concurrent learning sessions
+Leases isolated browser contexts to sessions so one worker can serve many rooms
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+import config
+from async_browser_controller import AsyncBrowserAutomation
+from browser_controller import BROWSER_LAUNCH_ARGS, SCREEN_HEIGHT, SCREEN_WIDTH, START_URL, BrowserAutomation
+from browser_profile import default_profile
+from request_router import default_router
+
+# What a lease hands out, depending on the configured backend
+Automation = Union[BrowserAutomation, AsyncBrowserAutomation]
+
+
+def _browser_pid(process_info: dict) -> Optional[int]:
+    """The browser process's PID from a SystemInfo.getProcessInfo result"""
+    for process in process_info.get("processInfo", []):
+        if process.get("type") == "browser":
+            return process.get("id")
+    return None
+
+
+class BrowserHost:
+    """
+    One Chromium process driven from its own thread.
+
+    Sync Playwright objects can only be used from the thread that created
+    them, so every call touching this host's browser, contexts or pages
+    goes through its single-thread executor. Pages on the same host take
+    turns; pages on different hosts run in parallel.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"browser_host_{index}")
+        self.playwright = None
+        self.browser = None
+        self.pid: Optional[int] = None  # Chromium's browser process, for the worker's memory accounting
+
+    async def run(self, fn, *args):
+        """Run a function on this host's thread from any event loop"""
+        return await asyncio.wrap_future(self.executor.submit(fn, *args))
+
+    def is_connected(self) -> bool:
+        return bool(self.browser and self.browser.is_connected())
+
+    async def start(self):
+        await self.run(self.start_sync)
+
+    async def stop(self):
+        await self.run(self.stop_sync)
+
+    async def reset_slot(self, slot: "PooledPage", start_url: str):
+        await self.run(self._reset_slot_sync, slot, start_url)
+
+    async def is_healthy(self, slot: "PooledPage", max_page_age: float) -> bool:
+        return await self.run(self._is_healthy_sync, slot, max_page_age)
+
+    async def attach(self, slot: "PooledPage") -> BrowserAutomation:
+        """A BrowserAutomation driving the slot's page from this host's thread"""
+        automation = BrowserAutomation(executor=self.executor)
+        await self.run(automation.attach, self.browser, slot.context, slot.page)
+        return automation
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def start_sync(self):
+        """Launch Chromium (again, if it crashed)"""
+        if self.is_connected():
+            return
+        self.stop_sync()
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(
+            headless=config.BROWSER_HEADLESS,
+            args=default_profile.launch_args(BROWSER_LAUNCH_ARGS)
+        )
+        try:
+            session = self.browser.new_browser_cdp_session()
+            self.pid = _browser_pid(session.send("SystemInfo.getProcessInfo"))
+            session.detach()
+        except Exception as e:
+            print(f"Could not read the PID of browser host {self.index}: {e}")
+        print(f"✅ Browser host {self.index} launched")
+
+    def stop_sync(self):
+        """Close Chromium and stop Playwright"""
+        try:
+            if self.browser:
+                self.browser.close()
+        except Exception as e:
+            print(f"Error closing browser host {self.index}: {e}")
+        try:
+            if self.playwright:
+                self.playwright.stop()
+        except Exception as e:
+            print(f"Error stopping Playwright on host {self.index}: {e}")
+        self.browser = None
+        self.playwright = None
+        self.pid = None
+
+    def _reset_slot_sync(self, slot: "PooledPage", start_url: str):
+        """On the host thread: close the old context, open and warm up a new one"""
+        if slot.context:
+            try:
+                slot.context.close()
+            except Exception:
+                pass  # The browser may already be gone
+            slot.context = None
+            slot.page = None
+        self.start_sync()
+        # Starts from the saved storage state (if any); never written back, so rooms stay isolated
+        slot.context = self.browser.new_context(**default_profile.context_options(SCREEN_WIDTH, SCREEN_HEIGHT))
+        default_router.install(slot.context)
+        slot.page = slot.context.new_page()
+        slot.created_at = time.monotonic()
+        try:
+            slot.page.goto(start_url)
+        except Exception as e:
+            # Still usable; the agent loop can navigate on its own
+            print(f"Warm-up navigation failed on host {self.index}: {e}")
+
+    def _is_healthy_sync(self, slot: "PooledPage", max_page_age: float) -> bool:
+        """On the host thread: is the page alive, responsive and fresh enough to lease?"""
+        try:
+            if max_page_age and time.monotonic() - slot.created_at > max_page_age:
+                return False
+            return (
+                self.is_connected()
+                and slot.page is not None
+                and not slot.page.is_closed()
+                and slot.page.evaluate("1") == 1
+            )
+        except Exception:
+            return False
+
+
+class AsyncBrowserHost:
+    """
+    One Chromium process driven by async Playwright on its own event loop.
+
+    The loop runs on a dedicated thread so jobs on other threads can share
+    the host; a demonstration hops onto it once and then runs entirely as
+    coroutines. Unlike BrowserHost, pages on the same host are driven
+    concurrently: while one page waits for the UI to settle, another can
+    be clicking.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=f"browser_host_{index}", daemon=True)
+        self._thread.start()
+        self.playwright = None
+        self.browser = None
+        self.pid: Optional[int] = None  # Chromium's browser process, for the worker's memory accounting
+
+    async def run(self, coro):
+        """Await a coroutine on this host's loop from any event loop"""
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def is_connected(self) -> bool:
+        return bool(self.browser and self.browser.is_connected())
+
+    async def start(self):
+        await self.run(self._start())
+
+    async def stop(self):
+        await self.run(self._stop())
+
+    async def reset_slot(self, slot: "PooledPage", start_url: str):
+        await self.run(self._reset_slot(slot, start_url))
+
+    async def is_healthy(self, slot: "PooledPage", max_page_age: float) -> bool:
+        return await self.run(self._is_healthy(slot, max_page_age))
+
+    async def attach(self, slot: "PooledPage") -> AsyncBrowserAutomation:
+        """An AsyncBrowserAutomation driving the slot's page on this host's loop"""
+        automation = AsyncBrowserAutomation()
+        await self.run(automation.attach(self.browser, slot.context, slot.page))
+        return automation
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _start(self):
+        """Launch Chromium (again, if it crashed)"""
+        if self.is_connected():
+            return
+        await self._stop()
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(
+            headless=config.BROWSER_HEADLESS,
+            args=default_profile.launch_args(BROWSER_LAUNCH_ARGS)
+        )
+        try:
+            session = await self.browser.new_browser_cdp_session()
+            self.pid = _browser_pid(await session.send("SystemInfo.getProcessInfo"))
+            await session.detach()
+        except Exception as e:
+            print(f"Could not read the PID of browser host {self.index}: {e}")
+        print(f"✅ Browser host {self.index} launched (async)")
+
+    async def _stop(self):
+        """Close Chromium and stop Playwright"""
+        try:
+            if self.browser:
+                await self.browser.close()
+        except Exception as e:
+            print(f"Error closing browser host {self.index}: {e}")
+        try:
+            if self.playwright:
+                await self.playwright.stop()
+        except Exception as e:
+            print(f"Error stopping Playwright on host {self.index}: {e}")
+        self.browser = None
+        self.playwright = None
+        self.pid = None
+
+    async def _reset_slot(self, slot: "PooledPage", start_url: str):
+        """On the host loop: close the old context, open and warm up a new one"""
+        if slot.context:
+            try:
+                await slot.context.close()
+            except Exception:
+                pass  # The browser may already be gone
+            slot.context = None
+            slot.page = None
+        await self._start()
+        slot.context = await self.browser.new_context(**default_profile.context_options(SCREEN_WIDTH, SCREEN_HEIGHT))
+        await default_router.install_async(slot.context)
+        slot.page = await slot.context.new_page()
+        slot.created_at = time.monotonic()
+        try:
+            await slot.page.goto(start_url)
+        except Exception as e:
+            print(f"Warm-up navigation failed on host {self.index}: {e}")
+
+    async def _is_healthy(self, slot: "PooledPage", max_page_age: float) -> bool:
+        """On the host loop: is the page alive, responsive and fresh enough to lease?"""
+        try:
+            if max_page_age and time.monotonic() - slot.created_at > max_page_age:
+                return False
+            return (
+                self.is_connected()
+                and slot.page is not None
+                and not slot.page.is_closed()
+                and await slot.page.evaluate("1") == 1
+            )
+        except Exception:
+            return False
+
+
+class PooledPage:
+    """A browser context with one page, leased to at most one session at a time"""
+
+    def __init__(self, host: Union[BrowserHost, "AsyncBrowserHost"]):
+        self.host = host
+        self.context = None
+        self.page = None
+        self.session_id: Optional[str] = None
+        self.automation: Optional[Automation] = None
+        self.created_at = 0.0
+        self.leases = 0
+        self.in_service = True  # False while recycling has given up on it
+        self.retry_at = 0.0  # When an out-of-service page is tried again
+
+
+class BrowserPool:
+    """
+    Pool of isolated browser contexts shared by all sessions on a worker.
+
+    Sessions lease a page, run their demonstrations on it and release it
+    when the room closes. Released pages are recycled: the context is
+    closed and a fresh one is opened and navigated to Docs in the
+    background, so cookies, storage and history never leak from one room
+    to the next and the next lease still gets a warm page. Pages are
+    health-checked on lease and recycled when broken or too old.
+
+    The pool is used from several event loops (jobs run on their own
+    threads), so it only relies on thread-safe primitives. A session
+    waiting for a page parks a future on its own loop; a freed page is
+    handed to the oldest waiter, and put back if that wait was abandoned.
+    """
+
+    def __init__(self, size: Optional[int] = None, hosts: Optional[int] = None, start_url: Optional[str] = None, lease_timeout: Optional[float] = None, max_page_age: Optional[float] = None, backend: Optional[str] = None, retry_delay: Optional[float] = None):
+        """
+        Args:
+            size: Number of pages (concurrent sessions)
+            hosts: Number of Chromium processes/threads the pages are spread over
+            start_url: Page every context opens on
+            lease_timeout: Seconds to wait for a free page before giving up
+            max_page_age: Seconds after which an idle page is recycled before being leased
+            backend: "sync" (BrowserHost threads) or "async" (AsyncBrowserHost event loops)
+            retry_delay: Seconds before a page that could not be recycled is tried again
+        """
+        self.size = max(1, size or config.BROWSER_POOL_SIZE)
+        host_count = max(1, min(self.size, hosts or config.BROWSER_POOL_HOSTS))
+        self.start_url = start_url or START_URL
+        self.lease_timeout = config.BROWSER_POOL_LEASE_TIMEOUT if lease_timeout is None else lease_timeout
+        self.max_page_age = config.BROWSER_POOL_MAX_PAGE_AGE if max_page_age is None else max_page_age
+        self.retry_delay = config.BROWSER_POOL_RETRY_DELAY if retry_delay is None else retry_delay
+
+        self.backend = (backend or config.BROWSER_BACKEND).lower()
+        if self.backend not in ("sync", "async"):
+            raise ValueError(f"Unknown browser backend '{self.backend}'")
+
+        host_class = AsyncBrowserHost if self.backend == "async" else BrowserHost
+        self.hosts = [host_class(i) for i in range(host_count)]
+        self.slots = [PooledPage(self.hosts[i % host_count]) for i in range(self.size)]
+        self._free: Deque[PooledPage] = deque()
+        # Leases waiting for a free page: (their loop, the future the page is handed over on)
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._leases: Dict[str, PooledPage] = {}
+        # Leases being set up, so concurrent calls for one session share a page
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._starting = False
+        self._start_lock = threading.Lock()
+        self._warming: List[asyncio.Future] = []  # Pages being opened by start()
+
+    async def start(self, ready: Optional[int] = None):
+        """
+        Launch the hosts and open every page (idempotent).
+
+        Args:
+            ready: Return once this many pages are open and on Docs; the rest keep
+                   warming on the caller's loop (await warmed() for them). Default: all
+        """
+        with self._start_lock:
+            if self._started or self._starting:
+                return
+            self._starting = True
+        try:
+            default_profile.ensure_healthy()
+            await asyncio.gather(*(host.start() for host in self.hosts))
+            self._started = True
+        finally:
+            # A failed launch leaves the pool unstarted, so the next lease tries again
+            self._starting = False
+        self._warming = [asyncio.ensure_future(self._recycle(slot)) for slot in self.slots]
+        ready = self.size if ready is None else max(0, min(ready, self.size))
+        for warming in asyncio.as_completed(self._warming):
+            if ready <= 0:
+                break
+            await warming
+            ready -= 1
+        if all(task.done() for task in self._warming):
+            print(f"✅ Browser pool ready: {self.size} page(s) on {len(self.hosts)} {self.backend} host(s)")
+
+    async def warmed(self):
+        """Wait for the pages start() left warming in the background, from any event loop"""
+        pending = [task for task in self._warming if not task.done()]
+        if not pending:
+            return
+        loop = pending[0].get_loop()
+        if loop is asyncio.get_running_loop():
+            await asyncio.gather(*pending)
+        else:
+            async def gather():
+                await asyncio.gather(*pending)
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(gather(), loop))
+        print(f"✅ Browser pool ready: {self.size} page(s) on {len(self.hosts)} {self.backend} host(s)")
+
+    async def lease(self, session_id: str) -> Automation:
+        """
+        Lease a page to a session (the same one again if it already holds a lease).
+
+        Raises:
+            TimeoutError: if no page frees up within the lease timeout
+        """
+        owner = False
+        with self._lock:
+            slot = self._leases.get(session_id)
+            pending = self._pending.get(session_id)
+            if not slot and not pending:
+                pending = self._pending[session_id] = Future()
+                owner = True
+        if slot:
+            return slot.automation
+        if not owner:
+            return await asyncio.wrap_future(pending)
+
+        try:
+            automation = await self._lease_free_page(session_id)
+            pending.set_result(automation)
+            return automation
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(session_id, None)
+
+    async def _lease_free_page(self, session_id: str) -> Automation:
+        """Wait for a healthy free page and bind it to a session"""
+        await self.start()
+        self._retry_due()
+        deadline = time.monotonic() + self.lease_timeout
+        while True:
+            slot = await self._take_free(deadline - time.monotonic())
+            if slot is None:
+                raise TimeoutError(f"No browser page became free within {self.lease_timeout:.0f}s")
+            if await slot.host.is_healthy(slot, self.max_page_age):
+                break
+            print(f"♻️ Recycling unhealthy or stale page on host {slot.host.index}")
+            # Recycling puts it back on the free queue; meanwhile keep waiting for any page
+            asyncio.ensure_future(self._recycle(slot))
+
+        try:
+            automation = await slot.host.attach(slot)
+        except BaseException:
+            # Cancelled or failed before the session owned it; don't lose the page
+            asyncio.ensure_future(self._recycle(slot))
+            raise
+        slot.automation = automation
+        slot.session_id = session_id
+        slot.leases += 1
+        with self._lock:
+            self._leases[session_id] = slot
+        print(f"🔑 Leased page on host {slot.host.index} to session {session_id}")
+        return automation
+
+    async def release(self, session_id: str):
+        """Return a session's page; it is recycled before anyone else gets it"""
+        with self._lock:
+            slot = self._leases.pop(session_id, None)
+        if not slot:
+            return
+        if slot.automation:
+            slot.automation.is_initialized = False  # Stale references must not keep driving the page
+        slot.automation = None
+        slot.session_id = None
+        print(f"↩️ Session {session_id} released its page")
+        await self._recycle(slot)
+
+    def stats(self) -> Dict[str, int]:
+        """Pool occupancy (pages neither leased, free nor out of service are being recycled)"""
+        with self._lock:
+            leased = len(self._leases)
+        out_of_service = sum(1 for slot in self.slots if not slot.in_service)
+        return {"size": self.size, "leased": leased, "free": len(self._free), "out_of_service": out_of_service, "hosts": len(self.hosts)}
+
+    def sessions(self) -> List[str]:
+        """Sessions currently holding a page"""
+        with self._lock:
+            return list(self._leases)
+
+    async def close(self):
+        """Close every context and browser"""
+        with self._lock:
+            self._leases.clear()
+        await asyncio.gather(*(host.stop() for host in self.hosts), return_exceptions=True)
+        for host in self.hosts:
+            host.shutdown()
+        self._started = False
+
+    async def _take_free(self, timeout: float) -> Optional[PooledPage]:
+        """Wait up to timeout for a free page; None if none came (cancelling the wait never loses one)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free:
+                return self._free.popleft()
+            if timeout <= 0:
+                return None
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except BaseException:
+            slot = self._withdraw(waiter)
+            if slot:
+                self._put_free(slot)
+            raise
+        return self._withdraw(waiter)
+
+    def _withdraw(self, waiter: asyncio.Future) -> Optional[PooledPage]:
+        """Stop waiting for a page; returns the page if one was handed over meanwhile"""
+        with self._lock:
+            self._waiters = deque(entry for entry in self._waiters if entry[1] is not waiter)
+        if waiter.done():
+            return waiter.result()
+        # A hand-over already scheduled on this loop sees the cancelled future and puts the page back
+        waiter.cancel()
+        return None
+
+    def _put_free(self, slot: PooledPage):
+        """Make a page leasable: hand it to the oldest waiting lease, or queue it"""
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, waiter, slot)
+                    return
+                except RuntimeError:
+                    pass  # That lease's loop has closed
+            self._free.append(slot)
+
+    def _hand_over(self, waiter: asyncio.Future, slot: PooledPage):
+        """On the waiting lease's loop: give it the page, unless it stopped waiting"""
+        if waiter.done():
+            self._put_free(slot)
+        else:
+            waiter.set_result(slot)
+
+    async def _recycle(self, slot: PooledPage):
+        """Replace a slot's context with a fresh one and make it leasable again"""
+        for attempt in range(2):
+            try:
+                await slot.host.reset_slot(slot, self.start_url)
+                slot.in_service = True
+                self._put_free(slot)
+                return
+            except Exception as e:
+                print(f"❌ Could not prepare page on host {slot.host.index} (attempt {attempt + 1}): {e}")
+                # Only a browser that crashed is relaunched; other pages may still be leased on this one
+                if not slot.host.is_connected():
+                    await slot.host.stop()
+        slot.in_service = False
+        slot.retry_at = time.monotonic() + self.retry_delay
+        print(f"⚠️ Page on host {slot.host.index} is out of service, retrying in {self.retry_delay:.0f}s")
+        # If this loop is gone by then, the next lease picks the retry up instead
+        asyncio.get_running_loop().call_later(self.retry_delay, self._retry, slot, slot.retry_at)
+
+    def _retry_due(self):
+        """Recycle again the out-of-service pages whose retry delay has passed"""
+        now = time.monotonic()
+        for slot in self.slots:
+            if not slot.in_service and slot.retry_at <= now:
+                self._retry(slot, slot.retry_at)
+
+    def _retry(self, slot: PooledPage, retry_at: float):
+        """Recycle an out-of-service page again, once per failure however many timers and leases ask"""
+        with self._lock:
+            if not self._started or slot.in_service or slot.retry_at != retry_at:
+                return
+            slot.retry_at = float("inf")  # Claimed; _recycle schedules the next try if this one fails too
+        print(f"♻️ Retrying out-of-service page on host {slot.host.index}")
+        asyncio.ensure_future(self._recycle(slot))
+
+
+# Shared pool for the worker process
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> BrowserPool:
+    """Get the worker-wide browser pool (created on first use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
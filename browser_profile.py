@@ -0,0 +1,190 @@
+"""
+Browser Profile for the automation browser
+Keeps cookies, storage and caches across relaunches, checks them and resets them when corrupted
+
+Usage:
+    python browser_profile.py --check
+    python browser_profile.py --reset
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import config
+
+# Chromium files that must be valid JSON when present in a user-data directory
+PROFILE_JSON_FILES = ["Local State", os.path.join("Default", "Preferences")]
+# Chromium's single-instance lock files in a user-data directory
+PROFILE_LOCK_FILES = ["SingletonLock", "SingletonSocket", "SingletonCookie"]
+
+
+class BrowserProfile:
+    """
+    Where the automation browser keeps its state between launches.
+
+    user_data_dir: a persistent Chromium profile (cookies, HTTP cache,
+        service workers, Docs' offline assets), used by the standalone
+        browser through launch_persistent_context.
+    storage_state: a Playwright storage-state file (cookies and local
+        storage) loaded into every new context, including pooled ones (a
+        persistent profile keeps its own). Only the standalone browser
+        writes it back; pooled contexts never do, so nothing a room does
+        leaks into the next one.
+    disk_cache_dir: Chromium disk cache shared by every launch.
+
+    Each is off when its setting is empty, which is the original behaviour:
+    a fresh browser with nothing carried over.
+    """
+
+    def __init__(self, user_data_dir: Optional[str] = None, storage_state: Optional[str] = None, disk_cache_dir: Optional[str] = None):
+        self.user_data_dir = config.BROWSER_PROFILE_DIR if user_data_dir is None else user_data_dir
+        self.storage_state = config.BROWSER_STORAGE_STATE if storage_state is None else storage_state
+        self.disk_cache_dir = config.BROWSER_DISK_CACHE_DIR if disk_cache_dir is None else disk_cache_dir
+
+    @property
+    def persistent(self) -> bool:
+        """Whether the standalone browser runs on a persistent user-data directory"""
+        return bool(self.user_data_dir)
+
+    def launch_args(self, args: List[str]) -> List[str]:
+        """Chromium flags for a launch, with the shared disk cache if configured"""
+        if not self.disk_cache_dir:
+            return list(args)
+        os.makedirs(self.disk_cache_dir, exist_ok=True)
+        return list(args) + [f"--disk-cache-dir={os.path.abspath(self.disk_cache_dir)}"]
+
+    def context_options(self, width: int, height: int) -> Dict[str, Any]:
+        """new_context() arguments: the viewport, plus the saved storage state when it is usable"""
+        options: Dict[str, Any] = {"viewport": {"width": width, "height": height}}
+        if self.storage_state and self._storage_state_problem() is None:
+            options["storage_state"] = self.storage_state
+        return options
+
+    def check(self) -> List[str]:
+        """
+        Integrity check of the saved state.
+
+        Removes stale Chromium lock files left by a crash on the way.
+
+        Returns:
+            Problems found (empty when the profile is usable)
+        """
+        problems = []
+        if self.storage_state and os.path.exists(self.storage_state):
+            problem = self._storage_state_problem()
+            if problem:
+                problems.append(problem)
+        if self.user_data_dir and os.path.isdir(self.user_data_dir):
+            for name in PROFILE_JSON_FILES:
+                path = os.path.join(self.user_data_dir, name)
+                if not os.path.exists(path):
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        json.load(f)
+                except (OSError, ValueError) as e:
+                    problems.append(f"{path} is unreadable: {e}")
+            self._clear_stale_locks()
+        return problems
+
+    def ensure_healthy(self) -> bool:
+        """
+        Check the profile and reset it if it is corrupted.
+
+        Returns:
+            True if it was reset
+        """
+        problems = self.check()
+        if not problems:
+            return False
+        for problem in problems:
+            print(f"⚠️ Browser profile: {problem}")
+        self.reset()
+        return True
+
+    def reset(self):
+        """Throw away the user-data directory, saved storage state and disk cache"""
+        for directory in (self.user_data_dir, self.disk_cache_dir):
+            if directory and os.path.isdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+        if self.storage_state and os.path.exists(self.storage_state):
+            os.remove(self.storage_state)
+        print("♻️ Browser profile reset")
+
+    def save_storage_state(self, state: Dict[str, Any]):
+        """Atomically write a context's storage_state() for the next launch"""
+        if not self.storage_state:
+            return
+        directory = os.path.dirname(self.storage_state) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.storage_state)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _storage_state_problem(self) -> Optional[str]:
+        """Why the storage-state file can't be loaded, or None if it can"""
+        if not os.path.exists(self.storage_state):
+            return f"{self.storage_state} does not exist"
+        try:
+            with open(self.storage_state, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            return f"{self.storage_state} is unreadable: {e}"
+        if not isinstance(state, dict) or not isinstance(state.get("cookies"), list) or not isinstance(state.get("origins"), list):
+            return f"{self.storage_state} is not a Playwright storage state"
+        return None
+
+    def _clear_stale_locks(self):
+        """Remove Chromium's lock files if the process that held them is gone"""
+        lock = os.path.join(self.user_data_dir, "SingletonLock")
+        if not os.path.islink(lock):
+            return
+        # The lock is a symlink to "<hostname>-<pid>"
+        try:
+            pid = int(os.readlink(lock).rsplit("-", 1)[-1])
+            os.kill(pid, 0)
+            return  # Still running: the profile is in use, leave it alone
+        except ProcessLookupError:
+            pass
+        except (OSError, ValueError):
+            return
+        for name in PROFILE_LOCK_FILES:
+            try:
+                os.remove(os.path.join(self.user_data_dir, name))
+            except OSError:
+                pass
+        print(f"Removed stale browser profile lock in {self.user_data_dir}")
+
+
+# Profile shared by the standalone browser and the pool
+default_profile = BrowserProfile()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or reset the automation browser's saved profile")
+    parser.add_argument("--check", action="store_true", help="report problems (the default)")
+    parser.add_argument("--reset", action="store_true", help="delete the profile, storage state and disk cache")
+    args = parser.parse_args()
+
+    if args.reset:
+        default_profile.reset()
+        return
+    problems = default_profile.check()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Browser profile is healthy")
+    raise SystemExit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Cooperative Cancellation for demonstrations
+Lets a running demonstration be stopped between model turns and between actions
+"""
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, List, Optional
+
+
+class DemoCancelled(Exception):
+    """Raised inside a demonstration once its CancelToken has been cancelled"""
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag shared by a demonstration and whoever may stop it.
+
+    The sync backend checks it from its browser thread, the async backend
+    from an event loop, and it is cancelled from the session's loop (a
+    barge-in or a room closing), so it only uses thread-safe primitives.
+    Waits (pauses, model requests) go through the token so they end as
+    soon as it is cancelled instead of running to completion.
+    """
+
+    def __init__(self):
+        self.reason = ""
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel (idempotent); registered callbacks run on the calling thread"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback error: {e}")
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Call a function when the token is cancelled (immediately if it already is)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        """Raise DemoCancelled if the token has been cancelled"""
+        if self._event.is_set():
+            raise DemoCancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """time.sleep that ends early, raising DemoCancelled, when the token is cancelled"""
+        if self._event.wait(seconds):
+            raise DemoCancelled(self.reason)
+
+    def result(self, future: Future, timeout: Optional[float] = None):
+        """
+        Wait for a concurrent future unless the token is cancelled first.
+
+        On cancellation a future that hasn't started is cancelled; one that is
+        running is left to finish in the background and its result discarded.
+
+        Raises:
+            DemoCancelled: if the token was cancelled while waiting
+        """
+        signal = Future()
+        callback = lambda: signal.set_result(None)
+        self.add_callback(callback)
+        try:
+            wait([future, signal], timeout=timeout, return_when=FIRST_COMPLETED)
+        finally:
+            self.remove_callback(callback)
+        if self.cancelled:
+            future.cancel()
+        self.raise_if_cancelled()
+        return future.result(timeout=0)
+
+    async def sleep_async(self, seconds: float):
+        """asyncio.sleep that ends early, raising DemoCancelled, when the token is cancelled"""
+        signal, resolve = self._async_signal()
+        try:
+            await asyncio.wait_for(asyncio.shield(signal), seconds)
+        except asyncio.TimeoutError:
+            return
+        finally:
+            self._release_async_signal(signal, resolve)
+        raise DemoCancelled(self.reason)
+
+    async def run_async(self, awaitable):
+        """
+        Await a coroutine unless the token is cancelled first, in which case the
+        coroutine's task is cancelled (aborting e.g. an in-flight HTTP request).
+
+        Raises:
+            DemoCancelled: if the token was cancelled while waiting
+        """
+        task = asyncio.ensure_future(awaitable)
+        signal, resolve = self._async_signal()
+        try:
+            await asyncio.wait([task, signal], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._release_async_signal(signal, resolve)
+        if self.cancelled and not task.done():
+            task.cancel()
+        self.raise_if_cancelled()
+        return task.result()
+
+    def _async_signal(self):
+        """Future on the running loop that resolves when the token is cancelled, and its callback"""
+        loop = asyncio.get_running_loop()
+        signal = loop.create_future()
+
+        def resolve():
+            loop.call_soon_threadsafe(lambda: signal.done() or signal.set_result(None))
+
+        self.add_callback(resolve)
+        return signal, resolve
+
+    def _release_async_signal(self, signal: asyncio.Future, resolve: Callable[[], None]):
+        self.remove_callback(resolve)
+        if not signal.done():
+            signal.cancel()
@@ -0,0 +1,354 @@
+"""
+Gemini Cassette for offline runs
+Records Gemini requests and responses to disk keyed by a request fingerprint and
+replays them with their original or a compressed timing
+
+Usage:
+    GEMINI_CASSETTE=record python agent.py dev     # talk to Gemini and keep every response
+    GEMINI_CASSETTE=replay GEMINI_CASSETTE_SPEED=0 python agent.py dev   # no API calls, no model latency
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from google.genai.types import GenerateContentResponse
+
+import config
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(KeyError):
+    """A replayed request that was never recorded"""
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-ready form of request arguments, with image bytes replaced by their MIME type"""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        canonical = {}
+        for key, item in value.items():
+            if key == "inline_data" and isinstance(item, dict):
+                # Screenshots of the same screen differ in pixel noise from run to run
+                canonical[key] = {"mime_type": item.get("mime_type")}
+            else:
+                canonical[key] = _canonical(item)
+        return canonical
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, bytes):
+        return None
+    return value
+
+
+def fingerprint(model: str, contents: Any, config: Any = None) -> str:
+    """
+    Key of a generate_content request.
+
+    Covers the model, the conversation and the generation config, but not
+    the pixels of any image, so a rerun of the same demonstration on the
+    same screens finds its recording.
+    """
+    payload = json.dumps(
+        {"model": model, "contents": _canonical(contents), "config": _canonical(config)},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _dump(response) -> Dict[str, Any]:
+    return json.loads(response.model_dump_json(exclude_none=True))
+
+
+def load_response(data: Dict[str, Any]) -> GenerateContentResponse:
+    """A response from its recorded form"""
+    return GenerateContentResponse.model_validate_json(json.dumps(data))
+
+
+def model_chunk(parts: List[Dict[str, Any]], delay: float = 0.0) -> Dict[str, Any]:
+    """A recorded chunk whose response is one model turn with these parts (for hand-written recordings)"""
+    return {"delay": delay, "response": {"candidates": [{"content": {"role": "model", "parts": parts}}]}}
+
+
+class Cassette:
+    """
+    Recorded Gemini interactions, one JSON file per request fingerprint.
+
+    An interaction is the list of chunks the request returned, each
+    {"delay": seconds since the previous chunk, "response": response dict}
+    (a blocking call is a single chunk whose delay is the whole request).
+    streaming.RecordedModel plays the same chunks back. The same request made twice in a
+    run is stored twice and replayed in order.
+
+    speed scales the replayed delays: 1.0 is the recorded timing, 10 ten
+    times faster, 0 returns at once, which leaves only our own overhead.
+    """
+
+    def __init__(self, directory: Optional[str] = None, mode: Optional[str] = None, speed: Optional[float] = None):
+        self.directory = config.GEMINI_CASSETTE_DIR if directory is None else directory
+        self.mode = (config.GEMINI_CASSETTE if mode is None else mode).lower()
+        self.speed = config.GEMINI_CASSETTE_SPEED if speed is None else speed
+        if self.mode not in (OFF, RECORD, REPLAY):
+            print(f"⚠️ Unknown GEMINI_CASSETTE mode {self.mode!r}, not recording")
+            self.mode = OFF
+        self._lock = threading.Lock()
+        self._written: set = set()  # Fingerprints recorded by this process (earlier recordings are replaced)
+        self._played: Dict[str, int] = defaultdict(int)
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0, "model_seconds": 0.0}
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def wrap(self, client):
+        """The client to use: itself when the cassette is off, otherwise a recording or replaying proxy"""
+        if self.mode == OFF:
+            return client
+        print(f"📼 Gemini cassette: {self.mode} ({self.directory})")
+        return CassetteClient(client, self)
+
+    def record(self, key: str, model: str, chunks: List[Dict[str, Any]]):
+        """Append an interaction to its fingerprint's file"""
+        with self._lock:
+            interactions = self._read(key) if key in self._written else []
+            interactions.append({"model": model, "chunks": chunks})
+            self._write(key, interactions)
+            self._written.add(key)
+            self._stats["recorded"] += 1
+
+    def next(self, key: str) -> List[Dict[str, Any]]:
+        """
+        The chunks of the next recorded interaction for a fingerprint.
+
+        Raises:
+            CassetteMiss: Nothing (more) was recorded for the request
+        """
+        with self._lock:
+            interactions = self._read(key)
+            index = self._played[key]
+            if index >= len(interactions):
+                if not interactions:
+                    self._stats["misses"] += 1
+                    raise CassetteMiss(f"No recorded Gemini response for request {key}")
+                # Asked more often than recorded: the last answer is the best guess
+                index = len(interactions) - 1
+            self._played[key] += 1
+            self._stats["replayed"] += 1
+            chunks = interactions[index]["chunks"]
+            self._stats["model_seconds"] += sum(chunk["delay"] for chunk in chunks)
+            return chunks
+
+    def delay(self, seconds: float) -> float:
+        """Replay delay for a recorded one"""
+        return seconds / self.speed if self.speed > 0 else 0.0
+
+    def rewind(self):
+        """Replay every recording from its first interaction again"""
+        with self._lock:
+            self._played.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """recorded, replayed and missed requests, and the model time the replays stood in for"""
+        with self._lock:
+            return dict(self._stats, model_seconds=round(self._stats["model_seconds"], 3))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> List[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            print(f"Cassette read error: {e}")
+            return []
+
+    def _write(self, key: str, interactions: List[Dict[str, Any]]):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(interactions, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class CassetteClient:
+    """
+    Stand-in for genai.Client that records through a real client or replays from a cassette.
+
+    Only generate_content and generate_content_stream (sync and .aio) go
+    through the cassette. Anything else is passed to the real client; when
+    replaying without one, models.get (the prewarm) is answered with None.
+    """
+
+    def __init__(self, client, cassette: Cassette):
+        self._client = client
+        self.cassette = cassette
+        self.models = _CassetteModels(client.models if client else None, cassette)
+        self.aio = _AsyncCassetteClient(client.aio if client else None, cassette)
+
+    def __getattr__(self, name):
+        if self._client is None:
+            raise AttributeError(f"{name} is not available while replaying a Gemini cassette")
+        return getattr(self._client, name)
+
+
+class _CassetteModels:
+    """CassetteClient.models"""
+
+    def __init__(self, models, cassette: Cassette):
+        self._models = models
+        self._cassette = cassette
+
+    def generate_content(self, model: str, contents: Any, config: Any = None):
+        key = fingerprint(model, contents, config)
+        if self._cassette.replaying:
+            chunks = self._cassette.next(key)
+            time.sleep(self._cassette.delay(sum(chunk["delay"] for chunk in chunks)))
+            return load_response(merge_chunks(chunks))
+        started = time.monotonic()
+        response = self._models.generate_content(model=model, contents=contents, config=config)
+        self._cassette.record(key, model, [{"delay": time.monotonic() - started, "response": _dump(response)}])
+        return response
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[Any]:
+        key = fingerprint(model, contents, config)
+        if self._cassette.replaying:
+            for chunk in self._cassette.next(key):
+                time.sleep(self._cassette.delay(chunk["delay"]))
+                yield load_response(chunk["response"])
+            return
+        chunks = []
+        last = time.monotonic()
+        try:
+            for response in self._models.generate_content_stream(model=model, contents=contents, config=config):
+                now = time.monotonic()
+                chunks.append({"delay": now - last, "response": _dump(response)})
+                last = now
+                yield response
+        except GeneratorExit:
+            # The caller stopped reading (a cancelled demonstration); what it saw is what replays
+            if chunks:
+                self._cassette.record(key, model, chunks)
+            raise
+        self._cassette.record(key, model, chunks)
+
+    def get(self, *args, **kwargs):
+        if self._models is None:
+            return None
+        return self._models.get(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if self._models is None:
+            raise AttributeError(f"models.{name} is not available while replaying a Gemini cassette")
+        return getattr(self._models, name)
+
+
+class _AsyncCassetteClient:
+    """CassetteClient.aio"""
+
+    def __init__(self, aio, cassette: Cassette):
+        self._aio = aio
+        self.models = _AsyncCassetteModels(aio.models if aio else None, cassette)
+
+    def __getattr__(self, name):
+        if self._aio is None:
+            raise AttributeError(f"aio.{name} is not available while replaying a Gemini cassette")
+        return getattr(self._aio, name)
+
+
+class _AsyncCassetteModels:
+    """CassetteClient.aio.models"""
+
+    def __init__(self, models, cassette: Cassette):
+        self._models = models
+        self._cassette = cassette
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None):
+        key = fingerprint(model, contents, config)
+        if self._cassette.replaying:
+            chunks = self._cassette.next(key)
+            await asyncio.sleep(self._cassette.delay(sum(chunk["delay"] for chunk in chunks)))
+            return load_response(merge_chunks(chunks))
+        started = time.monotonic()
+        response = await self._models.generate_content(model=model, contents=contents, config=config)
+        self._cassette.record(key, model, [{"delay": time.monotonic() - started, "response": _dump(response)}])
+        return response
+
+    async def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> AsyncIterator[Any]:
+        key = fingerprint(model, contents, config)
+        if self._cassette.replaying:
+            recorded = self._cassette.next(key)
+
+            async def replay():
+                for chunk in recorded:
+                    await asyncio.sleep(self._cassette.delay(chunk["delay"]))
+                    yield load_response(chunk["response"])
+            return replay()
+
+        started = time.monotonic()
+        stream = await self._models.generate_content_stream(model=model, contents=contents, config=config)
+
+        async def record():
+            chunks = []
+            last = started
+            try:
+                async for response in stream:
+                    now = time.monotonic()
+                    chunks.append({"delay": now - last, "response": _dump(response)})
+                    last = now
+                    yield response
+            except GeneratorExit:
+                # The caller stopped reading (a cancelled demonstration); what it saw is what replays
+                if chunks:
+                    self._cassette.record(key, model, chunks)
+                raise
+            self._cassette.record(key, model, chunks)
+        return record()
+
+    async def get(self, *args, **kwargs):
+        if self._models is None:
+            return None
+        return await self._models.get(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if self._models is None:
+            raise AttributeError(f"aio.models.{name} is not available while replaying a Gemini cassette")
+        return getattr(self._models, name)
+
+
+def merge_chunks(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A blocking response from a recorded stream: every chunk's parts in one candidate"""
+    if len(chunks) == 1:
+        return chunks[0]["response"]
+    merged = json.loads(json.dumps(chunks[-1]["response"]))
+    parts = []
+    for chunk in chunks:
+        for candidate in chunk["response"].get("candidates", [])[:1]:
+            parts.extend(candidate.get("content", {}).get("parts", []))
+    candidates = merged.setdefault("candidates", [{}])
+    if not candidates:
+        candidates.append({})
+    candidates[0].setdefault("content", {"role": "model"})["parts"] = parts
+    return merged
+
+
+# Cassette around the module-level Gemini client
+default_cassette = Cassette()
@@ -34,6 +34,215 @@ DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 # Browser Configuration (for Gemini Computer Use)
 # ============================================
 BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+# Playwright backend: sync (each browser on its own thread) or async (pages driven concurrently on an event loop)
+BROWSER_BACKEND = os.getenv("BROWSER_BACKEND", "sync").lower()
+# Persistent Chromium profile for the standalone browser: cookies, HTTP cache, service workers (empty: fresh each launch)
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", "")
+# Playwright storage state (cookies, local storage) loaded into every new context and saved by the standalone browser
+BROWSER_STORAGE_STATE = os.getenv("BROWSER_STORAGE_STATE", "")
+# Chromium disk cache shared across launches
+BROWSER_DISK_CACHE_DIR = os.getenv("BROWSER_DISK_CACHE_DIR", "")
+
+# ============================================
+# Network Routing
+# ============================================
+# Route the automation browser's requests: block telemetry and serve static assets from a local cache.
+# Off by default with the sync backend, whose route handlers only run while its thread is in a Playwright
+# call: requests made while it waits on Gemini or sits idle would stall until the next action
+NETWORK_FILTER = os.getenv("NETWORK_FILTER", "true" if BROWSER_BACKEND == "async" else "false").lower() == "true"
+# Extra block rules and allow-list exceptions, comma-separated fnmatch patterns (host, or full URL if it has a "/")
+NETWORK_BLOCK = [rule.strip() for rule in os.getenv("NETWORK_BLOCK", "").split(",") if rule.strip()]
+NETWORK_ALLOW = [rule.strip() for rule in os.getenv("NETWORK_ALLOW", "").split(",") if rule.strip()]
+# Resource types to block outright, e.g. "font,media" (fonts change how Docs renders, so nothing by default)
+NETWORK_BLOCK_TYPES = [kind.strip() for kind in os.getenv("NETWORK_BLOCK_TYPES", "").split(",") if kind.strip()]
+# Content-addressed cache of scripts, styles, fonts and images; an empty path disables it
+NETWORK_CACHE_DIR = os.getenv("NETWORK_CACHE_DIR", "data/asset_cache")
+NETWORK_CACHE_MAX_BYTES = int(os.getenv("NETWORK_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Only responses cacheable for at least this many seconds are stored
+NETWORK_CACHE_MIN_MAX_AGE = int(os.getenv("NETWORK_CACHE_MIN_MAX_AGE", "3600"))
+
+# ============================================
+# Browser Pool
+# ============================================
+# Pages (isolated browser contexts) available to concurrent sessions on one worker
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+# Chromium processes the pages are spread over; with the sync backend pages on one process take turns
+BROWSER_POOL_HOSTS = int(os.getenv("BROWSER_POOL_HOSTS", "1"))
+# Seconds a session waits for a free page
+BROWSER_POOL_LEASE_TIMEOUT = float(os.getenv("BROWSER_POOL_LEASE_TIMEOUT", "30"))
+# Idle pages older than this are recycled before being leased (0 disables)
+BROWSER_POOL_MAX_PAGE_AGE = float(os.getenv("BROWSER_POOL_MAX_PAGE_AGE", "3600"))
+# Seconds before a page that could not be recycled is tried again (relaunching its browser if it crashed)
+BROWSER_POOL_RETRY_DELAY = float(os.getenv("BROWSER_POOL_RETRY_DELAY", "30"))
+
+# ============================================
+# Worker Prewarm
+# ============================================
+# Pool pages opened on Docs before the worker reports itself ready for jobs (0 skips the browser warmup)
+PREWARM_BROWSERS = int(os.getenv("PREWARM_BROWSERS", str(BROWSER_POOL_SIZE)))
+# Open Gemini connections (DNS, TLS) before the first demonstration
+PREWARM_CLIENTS = os.getenv("PREWARM_CLIENTS", "true").lower() == "true"
+
+# ============================================
+# Worker Load
+# ============================================
+# Load at which LiveKit stops dispatching rooms to the worker (and request_fnc refuses them)
+WORKER_LOAD_THRESHOLD = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.95"))
+# Chromium resident memory that counts as full load (default: 512 MB per pooled page plus 512 MB)
+WORKER_BROWSER_MEMORY_MB = float(os.getenv("WORKER_BROWSER_MEMORY_MB", str(512 * BROWSER_POOL_SIZE + 512)))
+# Fraction of the machine's memory in use that counts as full load
+WORKER_SYSTEM_MEMORY_HIGH = float(os.getenv("WORKER_SYSTEM_MEMORY_HIGH", "0.9"))
+# Event-loop lag that counts as full load
+WORKER_MAX_LOOP_LAG_MS = float(os.getenv("WORKER_MAX_LOOP_LAG_MS", "250"))
+
+# ============================================
+# Model Responses
+# ============================================
+# Stream the computer-use model's responses, narrating and starting each action as soon as it arrives
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() == "true"
+
+# ============================================
+# Gemini Cassette
+# ============================================
+# Record Gemini requests and responses to disk, or replay them with no API calls: off, record or replay
+GEMINI_CASSETTE = os.getenv("GEMINI_CASSETTE", "off").lower()
+GEMINI_CASSETTE_DIR = os.getenv("GEMINI_CASSETTE_DIR", "data/cassettes")
+# Replay timing: 1.0 is the recorded latency, 10 ten times faster, 0 no delay at all
+GEMINI_CASSETTE_SPEED = float(os.getenv("GEMINI_CASSETTE_SPEED", "1.0"))
+
+# ============================================
+# Latency Tracing
+# ============================================
+# Timed spans for every turn of the agent loop (model request, actions, settle, screenshots, speech)
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+# JSONL trace file, rotated at TRACE_MAX_BYTES with TRACE_BACKUPS old files kept; an empty path keeps spans in memory only
+TRACE_PATH = os.getenv("TRACE_PATH", "data/traces/agent_trace.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+# Recent spans per kind kept in memory for percentiles
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", "1000"))
+
+# ============================================
+# Speech
+# ============================================
+# Seconds to wait for queued narration before a demonstration is reported as finished
+SPEECH_FLUSH_TIMEOUT = float(os.getenv("SPEECH_FLUSH_TIMEOUT", "15"))
+# Narrate steps locally from the chosen actions instead of asking Gemini Flash
+NARRATION_TEMPLATES = os.getenv("NARRATION_TEMPLATES", "true").lower() == "true"
+# Gemini Flash summaries kept in memory (LRU) and on disk; an empty path disables persistence
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "512"))
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "data/summary_cache.json")
+
+# ============================================
+# Action Highlights
+# ============================================
+# Don't wait for the page to draw a highlight before the action's pause (the sync backend shortens the pause instead)
+HIGHLIGHT_FIRE_AND_FORGET = os.getenv("HIGHLIGHT_FIRE_AND_FORGET", "true").lower() == "true"
+
+# ============================================
+# UI Settle Detection
+# ============================================
+# How to decide an action has finished: dom (mutation + network quiescence), frames (stable screenshots) or fixed (1s sleep)
+UI_SETTLE_MODE = os.getenv("UI_SETTLE_MODE", "dom")
+UI_SETTLE_QUIET_MS = int(os.getenv("UI_SETTLE_QUIET_MS", "300"))  # No changes for this long counts as settled
+UI_SETTLE_TIMEOUT_MS = int(os.getenv("UI_SETTLE_TIMEOUT_MS", "3000"))  # Ceiling on any single wait
+UI_SETTLE_REQUEST_WINDOW_MS = int(os.getenv("UI_SETTLE_REQUEST_WINDOW_MS", "2000"))  # Older in-flight requests (long polls) are ignored
+UI_SETTLE_FRAME_TOLERANCE = float(os.getenv("UI_SETTLE_FRAME_TOLERANCE", "0.002"))  # Max thumbnail difference for "frames" mode
+# Run consecutive input actions of a turn (key combinations, typing) back to back and settle once after the last
+UI_SETTLE_BATCH_INPUT = os.getenv("UI_SETTLE_BATCH_INPUT", "true").lower() == "true"
+
+# ============================================
+# Agent Loop History
+# ============================================
+# Only the last N screenshots are resent as images; older ones become text placeholders
+HISTORY_KEEP_SCREENSHOTS = int(os.getenv("HISTORY_KEEP_SCREENSHOTS", "3"))
+# Byte budget for the screenshots resent on each turn (the newest one is always kept)
+HISTORY_MAX_SCREENSHOT_BYTES = int(os.getenv("HISTORY_MAX_SCREENSHOT_BYTES", str(4 * 1024 * 1024)))
+# Estimated prompt tokens beyond which the oldest steps are folded into a rolling text summary
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "24000"))
+# Most recent model turns (with their responses) always sent verbatim
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+# Leave the model's thought summaries out of the history it is sent back
+HISTORY_STRIP_THOUGHTS = os.getenv("HISTORY_STRIP_THOUGHTS", "true").lower() == "true"
+
+# ============================================
+# Screenshot Encoding
+# ============================================
+# Named preset from screenshot_encoding.QUALITY_TIERS (lossless, high, balanced, fast).
+# When set it takes precedence over the individual settings below.
+SCREENSHOT_TIER = os.getenv("SCREENSHOT_TIER", "")
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "png")  # png, jpeg or webp
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "80"))  # 1-100, ignored for png
+SCREENSHOT_SCALE = float(os.getenv("SCREENSHOT_SCALE", "1.0"))  # downscale factor in (0, 1]
+# How observations are captured: screenshot (one capture per turn) or screencast (read from a
+# buffer of Chromium screencast frames, with a screenshot only when no new frame arrives)
+SCREENSHOT_BACKEND = os.getenv("SCREENSHOT_BACKEND", "screenshot")
+# Newest screencast frames kept per page
+SCREENCAST_BUFFER_FRAMES = int(os.getenv("SCREENCAST_BUFFER_FRAMES", "4"))
+# How long a capture waits for a frame newer than the last action before taking a screenshot instead
+SCREENCAST_MAX_WAIT_MS = int(os.getenv("SCREENCAST_MAX_WAIT_MS", "250"))
+
+# ============================================
+# Observation
+# ============================================
+# How the model sees the page after each turn: screenshot, both (screenshot + UI snapshot),
+# or auto (UI snapshot every turn, screenshot only when the UI changed a lot)
+OBSERVATION_MODE = os.getenv("OBSERVATION_MODE", "screenshot")
+# Most controls listed in a UI snapshot
+OBSERVATION_MAX_ELEMENTS = int(os.getenv("OBSERVATION_MAX_ELEMENTS", "250"))
+# Fraction of the listed controls that must change for auto mode to send a screenshot too
+OBSERVATION_CHANGE_THRESHOLD = float(os.getenv("OBSERVATION_CHANGE_THRESHOLD", "0.3"))
+# Most turns in a row auto mode sends without a screenshot
+OBSERVATION_MAX_TEXT_TURNS = int(os.getenv("OBSERVATION_MAX_TEXT_TURNS", "3"))
+
+# ============================================
+# Demonstration Replay
+# ============================================
+# Record successful demonstrations and replay them locally for matching tasks
+TRAJECTORY_RECORDING = os.getenv("TRAJECTORY_RECORDING", "true").lower() == "true"
+TRAJECTORY_REPLAY = os.getenv("TRAJECTORY_REPLAY", "true").lower() == "true"
+TRAJECTORY_DIR = os.getenv("TRAJECTORY_DIR", "data/trajectories")
+# Max mean luminance difference (0-1) between the recorded and current screen before falling back to the model
+TRAJECTORY_MATCH_THRESHOLD = float(os.getenv("TRAJECTORY_MATCH_THRESHOLD", "0.06"))
+# Minimum similarity (0-1) for a question to count as a known lesson
+LESSON_MATCH_THRESHOLD = float(os.getenv("LESSON_MATCH_THRESHOLD", "0.6"))
+
+# ============================================
+# Demonstration Queue
+# ============================================
+# Demonstrations a session may have waiting behind the running one; more are turned away
+DEMO_QUEUE_MAX_BACKLOG = int(os.getenv("DEMO_QUEUE_MAX_BACKLOG", "2"))
+# Seconds after a demonstration finishes during which the same request is treated as a model re-invocation
+DEMO_REPEAT_WINDOW = float(os.getenv("DEMO_REPEAT_WINDOW", "20"))
+
+# ============================================
+# Barge-in
+# ============================================
+# Stop a running demonstration when the learner starts talking over it (needs livekit-plugins-silero)
+BARGE_IN = os.getenv("BARGE_IN", "true").lower() == "true"
+# Seconds of speech before it counts as barging in (filters coughs and clicks)
+BARGE_IN_MIN_SPEECH = float(os.getenv("BARGE_IN_MIN_SPEECH", "0.4"))
+# Silero speech probability needed to count as speech
+BARGE_IN_ACTIVATION = float(os.getenv("BARGE_IN_ACTIVATION", "0.6"))
+
+# ============================================
+# Browser Video
+# ============================================
+# Publish the automation page to the room as a video track (needs Pillow and the async backend); on by default when headless,
+# where nobody can watch the browser window
+BROWSER_VIDEO = os.getenv("BROWSER_VIDEO", "true" if BROWSER_HEADLESS else "false").lower() == "true"
+# Frame rate range the stream adapts within
+BROWSER_VIDEO_MAX_FPS = float(os.getenv("BROWSER_VIDEO_MAX_FPS", "15"))
+BROWSER_VIDEO_MIN_FPS = float(os.getenv("BROWSER_VIDEO_MIN_FPS", "3"))
+# Frame width range in pixels (height follows the viewport)
+BROWSER_VIDEO_WIDTH = int(os.getenv("BROWSER_VIDEO_WIDTH", "1280"))
+BROWSER_VIDEO_MIN_WIDTH = int(os.getenv("BROWSER_VIDEO_MIN_WIDTH", "720"))
+# JPEG quality of the screencast frames (1-100)
+BROWSER_VIDEO_QUALITY = int(os.getenv("BROWSER_VIDEO_QUALITY", "70"))
+# Seconds between repeats of the last frame while the page is still
+BROWSER_VIDEO_KEEPALIVE = float(os.getenv("BROWSER_VIDEO_KEEPALIVE", "2.0"))
+# Share of one CPU core a stream may spend decoding frames before it lowers frame rate, then resolution
+BROWSER_VIDEO_CPU_BUDGET = float(os.getenv("BROWSER_VIDEO_CPU_BUDGET", "0.25"))
 
 # ============================================
 # Google Docs URLs
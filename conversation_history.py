@@ -0,0 +1,281 @@
+"""
+Conversation History for Gemini Computer Use
+Keeps the agent loop's prompt bounded as a demonstration goes on
+"""
+import math
+from typing import Dict, List, Optional
+
+from google.genai.types import Content, Part
+
+import config
+from screenshot_encoding import image_size
+
+# Gemini bills an image of up to 384x384 as one 258-token tile, larger ones as 768x768 tiles
+IMAGE_TILE_TOKENS = 258
+IMAGE_TILE_SIZE = 768
+IMAGE_SMALL_SIZE = 384
+DEFAULT_IMAGE_SIZE = (1440, 900)  # The automation viewport, for images whose header we can't read
+BYTES_PER_TOKEN = 4  # Rough average for English text and JSON
+# Steps listed in the rolling summary; older ones are only counted
+SUMMARY_MAX_STEPS = 30
+# Text observations of the UI start with this; only the newest is resent in full
+SNAPSHOT_PREFIX = "[UI snapshot"
+SNAPSHOT_PLACEHOLDER = "[Earlier UI snapshot omitted]"
+# Hints the agent loop adds to a turn start with this; a repeated one is only kept where it is most recent
+HINT_PREFIX = "HINT:"
+
+
+class HistoryPolicy:
+    """
+    How many screenshots are resent to the model and how many bytes they may take,
+    and the token budget beyond which older steps are folded into a summary
+    """
+
+    def __init__(self, keep_screenshots: Optional[int] = None, max_screenshot_bytes: Optional[int] = None, max_tokens: Optional[int] = None, keep_turns: Optional[int] = None, strip_thoughts: Optional[bool] = None):
+        self.keep_screenshots = max(1, config.HISTORY_KEEP_SCREENSHOTS if keep_screenshots is None else keep_screenshots)
+        self.max_screenshot_bytes = config.HISTORY_MAX_SCREENSHOT_BYTES if max_screenshot_bytes is None else max_screenshot_bytes
+        self.max_tokens = config.HISTORY_MAX_TOKENS if max_tokens is None else max_tokens
+        self.keep_turns = max(1, config.HISTORY_KEEP_TURNS if keep_turns is None else keep_turns)
+        self.strip_thoughts = config.HISTORY_STRIP_THOUGHTS if strip_thoughts is None else strip_thoughts
+
+
+def _is_image(part: Part) -> bool:
+    """Check whether a part carries inline image data (a screenshot)"""
+    inline = getattr(part, 'inline_data', None)
+    return bool(inline and inline.data and (inline.mime_type or "").startswith("image/"))
+
+
+def part_bytes(part: Part) -> int:
+    """Approximate upload size of a single part in bytes"""
+    if _is_image(part):
+        return len(part.inline_data.data)
+    if getattr(part, 'text', None):
+        return len(part.text.encode("utf-8"))
+    if getattr(part, 'function_response', None) or getattr(part, 'function_call', None):
+        return len(part.model_dump_json(exclude_none=True))
+    return 0
+
+
+def payload_bytes(contents: List[Content]) -> int:
+    """Approximate upload size of a whole conversation in bytes"""
+    return sum(part_bytes(part) for content in contents for part in (content.parts or []))
+
+
+def image_tokens(data: bytes) -> int:
+    """Tokens Gemini counts for an image, from its dimensions"""
+    width, height = image_size(data) or DEFAULT_IMAGE_SIZE
+    if width <= IMAGE_SMALL_SIZE and height <= IMAGE_SMALL_SIZE:
+        return IMAGE_TILE_TOKENS
+    return math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE) * IMAGE_TILE_TOKENS
+
+
+def part_tokens(part: Part) -> int:
+    """Estimated prompt tokens of a single part"""
+    if _is_image(part):
+        return image_tokens(part.inline_data.data)
+    return math.ceil(part_bytes(part) / BYTES_PER_TOKEN)
+
+
+def estimated_tokens(contents: List[Content]) -> int:
+    """Estimated prompt tokens of a whole conversation"""
+    return sum(part_tokens(part) for content in contents for part in (content.parts or []))
+
+
+def _is_thought(part: Part) -> bool:
+    """A thought summary that can be left out when the turn is resent"""
+    # Parts carrying a thought signature are kept: the model needs them back to resume its reasoning
+    return bool(getattr(part, 'thought', False) and not getattr(part, 'thought_signature', None))
+
+
+class ConversationHistory:
+    """
+    Conversation sent to the computer-use model on every turn.
+
+    Only the most recent screenshots are kept as images. Older ones are
+    replaced in place by a short text placeholder describing what the model
+    saw (URL, actions taken, the model's step text), so the upload size per
+    turn stays flat instead of growing with every turn.
+
+    The rest of the prompt is kept in check too: thought summaries are not
+    resent, a hint repeated on a later turn replaces its earlier copy, only
+    the newest UI snapshot is sent in full, and
+    once the estimated prompt exceeds the token budget the oldest steps are
+    folded into a rolling text summary attached to the first (task) turn.
+    """
+
+    def __init__(self, policy: Optional[HistoryPolicy] = None):
+        self.policy = policy or HistoryPolicy()
+        self.contents: List[Content] = []
+        # Screenshots still sent as images, oldest first: (content index, part index, placeholder text)
+        self._screenshots = []
+        # One-line description of the step that led to each user turn, by id() of its Content
+        self._step_notes: Dict[int, str] = {}
+        self._summary_lines: List[str] = []
+        self._summary_index: Optional[int] = None  # Part of the first turn holding the summary
+        self.folded_steps = 0
+
+    def add_user(self, parts: List[Part], url: str = "", actions: Optional[List[str]] = None, step_text: str = ""):
+        """
+        Append a user turn, remembering any screenshots it carries.
+
+        Args:
+            parts: Parts of the turn (function responses, screenshot, hints)
+            url: Page URL at the time the screenshot was taken
+            actions: Names of the actions executed before the screenshot
+            step_text: The model's explanation of the step that led here
+        """
+        content_index = len(self.contents)
+        content = Content(role="user", parts=list(parts))
+        for part in content.parts:
+            if getattr(part, 'text', None) and part.text.startswith(SNAPSHOT_PREFIX):
+                self._supersede_snapshots()
+            elif content_index > 0 and getattr(part, 'text', None) and part.text.startswith(HINT_PREFIX):
+                # A hint repeated on a later turn only needs to be sent once, where it is most recent
+                self._remove_text(part.text)
+        if content_index > 0:
+            self._step_notes[id(content)] = self._step_note(url, actions or [], step_text)
+        self.contents.append(content)
+        for part_index, part in enumerate(parts):
+            if _is_image(part):
+                placeholder = self._placeholder(url, actions or [], step_text)
+                self._screenshots.append((content_index, part_index, placeholder))
+
+    def add_model(self, content: Content):
+        """Append the model's turn, without its thought summaries if the policy says so"""
+        if self.policy.strip_thoughts and content.parts:
+            parts = [part for part in content.parts if not _is_thought(part)]
+            if parts and len(parts) != len(content.parts):
+                content = Content(role=content.role, parts=parts)
+        self.contents.append(content)
+
+    def prune(self) -> int:
+        """
+        Apply the history policy before the next request.
+
+        Returns:
+            Number of screenshot bytes dropped by this call
+        """
+        dropped = 0
+        # Keep only the last N screenshots
+        while len(self._screenshots) > self.policy.keep_screenshots:
+            dropped += self._drop_oldest()
+        # Then enforce the byte budget, always keeping the newest screenshot
+        while len(self._screenshots) > 1 and self.screenshot_bytes() > self.policy.max_screenshot_bytes:
+            dropped += self._drop_oldest()
+        return dropped
+
+    def compact(self) -> int:
+        """
+        Fold the oldest steps into the rolling summary until the estimated
+        prompt fits the token budget, always keeping the task turn and the
+        policy's most recent turns verbatim.
+
+        Returns:
+            Number of steps folded by this call
+        """
+        folded = 0
+        while self.estimated_tokens() > self.policy.max_tokens and self._model_turns() > self.policy.keep_turns:
+            self._fold_oldest()
+            folded += 1
+        self.folded_steps += folded
+        return folded
+
+    def estimated_tokens(self) -> int:
+        """Estimated prompt tokens of the next request"""
+        return estimated_tokens(self.contents)
+
+    def screenshot_count(self) -> int:
+        """Number of screenshots still sent as images"""
+        return len(self._screenshots)
+
+    def screenshot_bytes(self) -> int:
+        """Total size of the screenshots still sent as images"""
+        return sum(part_bytes(self.contents[c].parts[p]) for c, p, _ in self._screenshots)
+
+    def payload_bytes(self) -> int:
+        """Approximate upload size of the next request"""
+        return payload_bytes(self.contents)
+
+    def _model_turns(self) -> int:
+        return sum(1 for content in self.contents[1:] if content.role == "model")
+
+    def _fold_oldest(self):
+        """Replace the oldest step after the task turn (a model turn and its responses) with a summary line"""
+        end = 2
+        while end < len(self.contents) and self.contents[end].role != "model":
+            end += 1
+        removed = self.contents[1:end]
+        del self.contents[1:end]
+        for content in removed:
+            note = self._step_notes.pop(id(content), None)
+            if note:
+                self._summary_lines.append(note)
+        # Screenshots in the folded turns are gone; later ones move up
+        count = end - 1
+        self._screenshots = [
+            (c - count if c >= end else c, p, placeholder) for c, p, placeholder in self._screenshots if not 1 <= c < end
+        ]
+        self._write_summary()
+
+    def _write_summary(self):
+        """Put the rolling summary into the task turn, replacing the previous one"""
+        lines = self._summary_lines[-SUMMARY_MAX_STEPS:]
+        earlier = len(self._summary_lines) - len(lines)
+        header = "[Steps already taken in this demonstration, oldest first"
+        header += f" ({earlier} earlier steps not listed)]" if earlier else "]"
+        summary = Part(text="\n".join([header] + [f"- {line}" for line in lines]))
+        parts = self.contents[0].parts
+        if self._summary_index is None:
+            self._summary_index = len(parts)
+            parts.append(summary)
+        else:
+            parts[self._summary_index] = summary
+
+    def _supersede_snapshots(self):
+        """Replace the UI snapshots already in the history with a short placeholder"""
+        for content in self.contents:
+            for part_index, part in enumerate(content.parts or []):
+                if getattr(part, 'text', None) and part.text.startswith(SNAPSHOT_PREFIX):
+                    content.parts[part_index] = Part(text=SNAPSHOT_PLACEHOLDER)
+
+    def _remove_text(self, text: str):
+        """Drop an earlier copy of a hint from the user turns after the task turn"""
+        for content_index, content in enumerate(self.contents[1:], start=1):
+            if content.role != "user" or not content.parts:
+                continue
+            for part_index, part in enumerate(content.parts):
+                if getattr(part, 'text', None) == text and not _is_image(part) and len(content.parts) > 1:
+                    del content.parts[part_index]
+                    self._screenshots = [
+                        (c, p - 1 if c == content_index and p > part_index else p, placeholder)
+                        for c, p, placeholder in self._screenshots
+                    ]
+                    break
+
+    def _drop_oldest(self) -> int:
+        """Replace the oldest remaining screenshot with its text placeholder"""
+        content_index, part_index, placeholder = self._screenshots.pop(0)
+        parts = self.contents[content_index].parts
+        size = part_bytes(parts[part_index])
+        parts[part_index] = Part(text=placeholder)
+        return size
+
+    @staticmethod
+    def _step_note(url: str, actions: List[str], step_text: str) -> str:
+        """One line of the rolling summary"""
+        step = " ".join(step_text.split())
+        if len(step) > 120:
+            step = step[:117] + "..."
+        return f"{step or 'No explanation'} ({', '.join(actions) if actions else 'no actions'}; then at {url or 'unknown URL'})"
+
+    @staticmethod
+    def _placeholder(url: str, actions: List[str], step_text: str) -> str:
+        """Short text standing in for a screenshot that is no longer sent"""
+        step = " ".join(step_text.split())
+        if len(step) > 160:
+            step = step[:157] + "..."
+        return (
+            f"[Earlier screenshot omitted. URL: {url or 'unknown'}; "
+            f"actions: {', '.join(actions) if actions else 'none'}; "
+            f"step: {step or 'none'}]"
+        )
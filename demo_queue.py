@@ -0,0 +1,263 @@
+"""
+Demonstration Queue for browser_action
+Runs each session's demonstrations one at a time, in order, without losing requests
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, NamedTuple, Optional
+
+import config
+from cancellation import CancelToken, DemoCancelled
+
+# Outcomes of DemoQueue.submit
+DONE = "done"            # The demonstration ran for this request
+COALESCED = "coalesced"  # An identical request was already queued or running; shared its result
+REPEAT = "repeat"        # The same demonstration just finished; treated as a re-invocation
+BUSY = "busy"            # The session's backlog was full
+CANCELLED = "cancelled"  # Stopped (or dropped from the backlog) before it finished
+
+# Seconds forget() waits for a cancelled demonstration to reach its next checkpoint
+FORGET_TIMEOUT = 10.0
+
+
+class DemoOutcome(NamedTuple):
+    """What happened to a submitted request"""
+    status: str
+    result: Any = None
+    waited: float = 0.0  # Seconds spent queued before the demonstration started
+
+
+class DemoRequest:
+    """A demonstration waiting in (or running from) a session queue"""
+
+    def __init__(self, task: str, key: str, run: Callable[[CancelToken], Awaitable[Any]]):
+        self.task = task
+        self.key = key
+        self.run = run
+        self.token = CancelToken()
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _SessionQueue:
+    """One session's backlog; only touched from that session's event loop"""
+
+    def __init__(self):
+        self.pending: Deque[DemoRequest] = deque()
+        self.running: Optional[DemoRequest] = None
+        self.recent: Dict[str, float] = {}  # key -> when it last finished
+        self.worker: Optional[asyncio.Task] = None
+
+    def find(self, key: str) -> Optional[DemoRequest]:
+        if self.running and self.running.key == key:
+            return self.running
+        return next((request for request in self.pending if request.key == key), None)
+
+
+class DemoQueue:
+    """
+    Per-session FIFO of demonstrations.
+
+    Each session runs one demonstration at a time and other sessions are
+    never held up by it. A request identical to one already queued or
+    running shares that demonstration's result instead of running twice;
+    one identical to a demonstration that just finished is answered at once
+    (the realtime model tends to call the tool again when a demonstration
+    takes a while); and when the backlog is full the request is turned
+    away explicitly so the caller can tell the learner.
+
+    Sessions run on different threads, so the registry and the counters
+    are guarded by a lock; each session's own queue lives on its loop.
+    """
+
+    def __init__(self, max_backlog: Optional[int] = None, repeat_window: Optional[float] = None, wait_samples: int = 500):
+        """
+        Args:
+            max_backlog: Requests allowed to wait behind the running one, per session
+            repeat_window: Seconds during which a just-finished request counts as a re-invocation
+            wait_samples: Recent queue wait times kept for the metrics
+        """
+        self.max_backlog = config.DEMO_QUEUE_MAX_BACKLOG if max_backlog is None else max_backlog
+        self.repeat_window = config.DEMO_REPEAT_WINDOW if repeat_window is None else repeat_window
+        self._sessions: Dict[str, _SessionQueue] = {}
+        self._waits: Deque[float] = deque(maxlen=wait_samples)
+        self._counts = {DONE: 0, COALESCED: 0, REPEAT: 0, BUSY: 0, CANCELLED: 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    async def submit(self, session_id: str, task: str, key: str, run: Callable[[CancelToken], Awaitable[Any]]) -> DemoOutcome:
+        """
+        Queue a demonstration for a session and wait for it to finish.
+
+        Args:
+            session_id: Session (room) the request belongs to
+            task: The learner's question, for logs
+            key: Requests with the same key are the same demonstration (lesson ID or normalized task)
+            run: Coroutine function that performs the demonstration, stopping when the token it is given is cancelled
+
+        Returns:
+            DemoOutcome; its result is whatever run returned (shared by coalesced requests)
+        """
+        with self._lock:
+            queue = self._sessions.setdefault(session_id, _SessionQueue())
+
+        existing = queue.find(key)
+        if existing:
+            print(f"🔁 Same demonstration already {'running' if existing is queue.running else 'queued'}, joining it: {task}")
+            self._count(COALESCED)
+            try:
+                result = await asyncio.shield(existing.future)
+            except DemoCancelled:
+                return DemoOutcome(CANCELLED)
+            return DemoOutcome(CANCELLED if existing.token.cancelled else COALESCED, result)
+
+        finished_at = queue.recent.get(key)
+        if finished_at is not None and time.monotonic() - finished_at < self.repeat_window:
+            print(f"🔁 Demonstration just finished, ignoring repeat request: {task}")
+            self._count(REPEAT)
+            return DemoOutcome(REPEAT)
+
+        # With nothing running, the head of the queue is about to start rather than waiting
+        waiting = len(queue.pending) if queue.running else max(0, len(queue.pending) - 1)
+        if waiting >= self.max_backlog:
+            print(f"🚫 Demonstration backlog full for session {session_id}, turning away: {task}")
+            self._count(BUSY)
+            return DemoOutcome(BUSY)
+
+        request = DemoRequest(task, key, run)
+        queue.pending.append(request)
+        if queue.running or len(queue.pending) > 1:
+            print(f"⏳ Queued demonstration ({waiting + 1} waiting): {task}")
+        if not queue.worker or queue.worker.done():
+            queue.worker = asyncio.ensure_future(self._drain(queue))
+
+        try:
+            result = await asyncio.shield(request.future)
+        except DemoCancelled:
+            return DemoOutcome(CANCELLED)
+        return DemoOutcome(CANCELLED if request.token.cancelled else DONE, result, request.started_at - request.enqueued_at)
+
+    def depth(self, session_id: str) -> int:
+        """Demonstrations running or waiting for a session"""
+        with self._lock:
+            queue = self._sessions.get(session_id)
+        if not queue:
+            return 0
+        return len(queue.pending) + (1 if queue.running else 0)
+
+    def allow_repeat(self, session_id: str, key: str):
+        """Let a request that just finished be asked again right away (e.g. it failed)"""
+        with self._lock:
+            queue = self._sessions.get(session_id)
+        if queue:
+            queue.recent.pop(key, None)
+
+    def cancel(self, session_id: str, reason: str = "cancelled") -> int:
+        """
+        Stop a session's running demonstration and drop its backlog.
+
+        The running demonstration stops at its next checkpoint (between
+        model turns and actions); waiting requests resolve as cancelled.
+
+        Returns:
+            Number of demonstrations cancelled
+        """
+        with self._lock:
+            queue = self._sessions.get(session_id)
+        if not queue:
+            return 0
+        cancelled = 0
+        running = queue.running
+        if running and not running.token.cancelled:
+            running.token.cancel(reason)
+            cancelled += 1
+        while queue.pending:
+            request = queue.pending.popleft()
+            request.token.cancel(reason)
+            request.future.get_loop().call_soon_threadsafe(self._resolve_cancelled, request)
+            cancelled += 1
+        if cancelled:
+            print(f"⏹️ Cancelled {cancelled} demonstration(s) for session {session_id}: {reason}")
+            with self._lock:
+                self._counts[CANCELLED] += cancelled
+        return cancelled
+
+    async def forget(self, session_id: str, timeout: float = FORGET_TIMEOUT):
+        """
+        Drop a session's queue when its room closes.
+
+        Anything running or waiting is cancelled, and this waits (up to
+        timeout) for the running demonstration to stop so the caller can
+        hand its page back without it still being driven.
+        """
+        self.cancel(session_id, "session closed")
+        with self._lock:
+            queue = self._sessions.pop(session_id, None)
+        worker = queue.worker if queue else None
+        if worker and not worker.done() and worker.get_loop() is asyncio.get_running_loop():
+            _, still_running = await asyncio.wait({worker}, timeout=timeout)
+            if still_running:
+                print(f"⚠️ Demonstration for session {session_id} did not stop within {timeout:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth across sessions, outcome counters and queue wait times (seconds)"""
+        with self._lock:
+            queues = list(self._sessions.values())
+            waits = sorted(self._waits)
+            counts = dict(self._counts)
+        running = sum(1 for queue in queues if queue.running)
+        queued = sum(len(queue.pending) for queue in queues)
+        return {
+            "sessions": len(queues),
+            "running": running,
+            "queued": queued,
+            **counts,
+            "wait_mean": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[max(0, int(len(waits) * 0.95) - 1)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
+
+    @staticmethod
+    def _resolve_cancelled(request: DemoRequest):
+        if not request.future.done():
+            request.future.set_exception(DemoCancelled(request.token.reason))
+
+    def _count(self, status: str):
+        with self._lock:
+            self._counts[status] += 1
+
+    async def _drain(self, queue: _SessionQueue):
+        """Run a session's demonstrations one after another"""
+        while queue.pending:
+            request = queue.pending.popleft()
+            queue.running = request
+            request.started_at = time.monotonic()
+            waited = request.started_at - request.enqueued_at
+            with self._lock:
+                self._waits.append(waited)
+            if waited >= 0.5:
+                print(f"⏱️ Demonstration started after waiting {waited:.1f}s: {request.task}")
+            try:
+                result = await request.run(request.token)
+                if not request.token.cancelled:
+                    queue.recent[request.key] = time.monotonic()
+                    self._count(DONE)
+                if not request.future.done():
+                    request.future.set_result(result)
+            except BaseException as e:
+                if not isinstance(e, DemoCancelled):
+                    self._count("failed")
+                if not request.future.done():
+                    request.future.set_exception(e)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+            finally:
+                queue.running = None
+            stats = self.stats()
+            print(f"📊 Demo queue: {stats['running']} running, {stats['queued']} queued, wait p95 {stats['wait_p95']:.1f}s")
+
+
+# Shared queue for the worker process
+demo_queue = DemoQueue()
@@ -0,0 +1,161 @@
+"""
+Highlight Overlay for demonstrated actions
+Installs the click/typing highlight once per page and shows it with a single small call per action
+"""
+import asyncio
+from typing import Optional
+
+import config
+
+# Installed once per document (and re-installed by the init script after navigations).
+# The dots live in a closed shadow root: the settle probe's MutationObserver doesn't see
+# shadow trees, so a highlight never reads as the page still changing. Dots are reused.
+OVERLAY_JS = """
+(() => {
+    if (window.__docbotHighlight) return;
+    const css = `
+        .dot, .ring { position: fixed; width: 16px; height: 16px; margin: -8px 0 0 -8px; border-radius: 50%;
+                      pointer-events: none; display: none; }
+        .dot { opacity: 0.8; }
+        .ring { border: 2px solid; box-sizing: border-box; }
+    `;
+    let host = null, root = null;
+    const free = [];
+    const mount = () => {
+        if (host && host.isConnected) return root;
+        host = document.createElement('docbot-overlay');
+        host.style.cssText = 'position: fixed; inset: 0; pointer-events: none; z-index: 2147483647;';
+        root = host.attachShadow({ mode: 'closed' });
+        const style = document.createElement('style');
+        style.textContent = css;
+        root.appendChild(style);
+        free.length = 0;
+        (document.body || document.documentElement).appendChild(host);
+        return root;
+    };
+    const take = () => {
+        const overlay = mount();
+        let marker = free.pop();
+        if (!marker) {
+            marker = { dot: document.createElement('div'), ring: document.createElement('div') };
+            marker.dot.className = 'dot';
+            marker.ring.className = 'ring';
+            overlay.append(marker.dot, marker.ring);
+        }
+        return marker;
+    };
+    window.__docbotHighlight = (x, y, color, duration) => {
+        if (!document.body && !document.documentElement) return;
+        const marker = take();
+        for (const element of [marker.dot, marker.ring]) {
+            element.style.left = x + 'px';
+            element.style.top = y + 'px';
+            element.style.display = 'block';
+        }
+        marker.dot.style.background = color;
+        marker.dot.style.boxShadow = `0 0 10px ${color}, 0 0 20px ${color}80`;
+        marker.ring.style.borderColor = color;
+        marker.dot.animate([
+            { transform: 'scale(1)', opacity: 0.8 },
+            { transform: 'scale(1.3)', opacity: 0.5 },
+            { transform: 'scale(1.8)', opacity: 0 },
+        ], { duration, easing: 'ease-out', fill: 'forwards' });
+        marker.ring.animate([
+            { transform: 'scale(1)', opacity: 1 },
+            { transform: 'scale(3)', opacity: 0 },
+        ], { duration, easing: 'ease-out', fill: 'forwards' }).onfinish = () => {
+            marker.dot.style.display = 'none';
+            marker.ring.style.display = 'none';
+            free.push(marker);
+        };
+    };
+})();
+"""
+
+# The per-action call: false if the page has no overlay yet
+SHOW_JS = """
+([x, y, color, duration]) => {
+    if (!window.__docbotHighlight) return false;
+    window.__docbotHighlight(x, y, color, duration);
+    return true;
+}
+"""
+
+
+class HighlightOverlay:
+    """
+    Shows where each demonstrated action happens.
+
+    The overlay runtime is installed with the page (install / install_async,
+    idempotent) so an action costs one evaluate of SHOW_JS with four
+    arguments instead of building and parsing a new script. With
+    fire_and_forget the async backend doesn't wait for that evaluate: the
+    pause that follows a highlight already gives it time to appear. The
+    sync API can't leave a call in flight, so there the pause is shortened
+    by the evaluate's round trip instead (see run_page_ops).
+    """
+
+    def __init__(self, fire_and_forget: Optional[bool] = None):
+        self.fire_and_forget = config.HIGHLIGHT_FIRE_AND_FORGET if fire_and_forget is None else fire_and_forget
+        self._installed_pages = set()
+        self._pending = set()  # Fire-and-forget calls still in flight (kept referenced until done)
+
+    def install(self, page):
+        """Install the overlay runtime on a page and on every document it loads (idempotent)"""
+        if id(page) in self._installed_pages:
+            return
+        page.add_init_script(OVERLAY_JS)
+        page.evaluate(OVERLAY_JS)
+        self._remember(page)
+
+    async def install_async(self, page):
+        """install() for async Playwright pages"""
+        if id(page) in self._installed_pages:
+            return
+        await page.add_init_script(OVERLAY_JS)
+        await page.evaluate(OVERLAY_JS)
+        self._remember(page)
+
+    def show(self, page, x: int, y: int, color: str = "#FF4444", duration: int = 800):
+        """
+        Show a highlight at a viewport position.
+
+        Args:
+            page: Playwright page object
+            x: X coordinate in pixels
+            y: Y coordinate in pixels
+            color: Color of the highlight (default red for clicks)
+            duration: Duration of animation in milliseconds
+        """
+        try:
+            if not page.evaluate(SHOW_JS, [x, y, color, duration]):
+                # A page we never installed on, or a document that loaded before the init script
+                page.evaluate(OVERLAY_JS)
+                page.evaluate(SHOW_JS, [x, y, color, duration])
+        except Exception as e:
+            print(f"Highlight error: {e}")
+
+    async def show_async(self, page, x: int, y: int, color: str = "#FF4444", duration: int = 800):
+        """show() for async Playwright pages; returns without waiting for the page when fire_and_forget"""
+        if not self.fire_and_forget:
+            await self._show_async(page, x, y, color, duration)
+            return
+        task = asyncio.ensure_future(self._show_async(page, x, y, color, duration))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _show_async(self, page, x: int, y: int, color: str, duration: int):
+        try:
+            if not await page.evaluate(SHOW_JS, [x, y, color, duration]):
+                await page.evaluate(OVERLAY_JS)
+                await page.evaluate(SHOW_JS, [x, y, color, duration])
+        except Exception as e:
+            print(f"Highlight error: {e}")
+
+    def _remember(self, page):
+        self._installed_pages.add(id(page))
+        page.on("close", lambda _: self._installed_pages.discard(id(page)))
+
+
+# Overlay shared by every automation page
+default_overlay = HighlightOverlay()
@@ -0,0 +1,280 @@
+"""
+Lesson Index for browser_action questions
+Matches free-form learner questions to known lessons locally, without network calls
+"""
+import math
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import config
+
+# Words that carry no meaning for matching ("How do I ...", "Can you show me ...")
+STOPWORDS = frozenset("""
+a an the i me my we you your it its this that these those to of in on at for with from by into onto
+how do does did can could would should will please show teach tell explain want wanna need help
+is are was be been am so just some way use using go about like up there here what where which when
+make get google
+""".split())
+
+# Synonyms mapped to one canonical token
+SYNONYMS: Dict[str, str] = {
+    # Creating things
+    "start": "create", "new": "create", "begin": "create", "blank": "create",
+    # Adding things
+    "add": "insert", "put": "insert", "place": "insert", "embed": "insert", "attach": "insert",
+    # Formatting
+    "embolden": "bold", "bolder": "bold", "thick": "bold", "heavy": "bold",
+    "italics": "italic", "italicize": "italic", "slanted": "italic", "slant": "italic",
+    "underlined": "underline",
+    "strike": "strikethrough", "crossed": "strikethrough",
+    "colour": "color", "colors": "color", "colours": "color",
+    "size": "fontsize",
+    "typeface": "font", "fonts": "font",
+    "highlighting": "highlight", "highlighter": "highlight",
+    # Editing
+    "remove": "delete", "erase": "delete", "clear": "delete", "rid": "delete",
+    "revert": "undo",
+    "copy": "duplicate", "clone": "duplicate",
+    "rename": "title", "name": "title",
+    "find": "search", "locate": "search", "look": "search",
+    "change": "edit", "modify": "edit", "adjust": "edit", "set": "edit", "format": "edit",
+    # Objects
+    "document": "doc", "documents": "doc", "docs": "doc", "file": "doc", "page": "doc",
+    "spreadsheet": "sheet", "spreadsheets": "sheet", "sheets": "sheet", "excel": "sheet",
+    "presentation": "slide", "presentations": "slide", "slides": "slide", "deck": "slide", "powerpoint": "slide",
+    "picture": "image", "photo": "image", "pictures": "image", "images": "image", "photos": "image",
+    "grid": "table", "tables": "table",
+    "hyperlink": "link", "url": "link", "links": "link",
+    "bullets": "bullet", "bulleted": "bullet", "list": "bullet", "lists": "bullet",
+    "numbered": "numbering", "numbers": "numbering",
+    "heading": "header", "headings": "header", "headers": "header",
+    "comments": "comment", "note": "comment", "notes": "comment",
+    "words": "text", "word": "text", "sentence": "text", "paragraph": "text", "letters": "text", "writing": "text",
+    # Sharing
+    "send": "share", "collaborate": "share", "invite": "share", "sharing": "share",
+    "download": "export", "save": "export", "pdf": "export",
+    "printing": "print",
+    "spell": "spelling", "spellcheck": "spelling", "grammar": "spelling",
+    "align": "alignment", "center": "alignment", "centre": "alignment", "justify": "alignment",
+    "space": "spacing", "spaced": "spacing",
+    "margin": "margins",
+}
+_CANONICAL = frozenset(SYNONYMS.values())
+
+# Built-in lessons: ID -> phrasings a learner might use
+DEFAULT_LESSONS: Dict[str, List[str]] = {
+    "create-document": ["How do I create a new document?", "Make a new Google Doc", "Start a blank document"],
+    "create-spreadsheet": ["How do I create a new spreadsheet?", "Make a new Google Sheet"],
+    "create-presentation": ["How do I create a new presentation?", "Make a new slide deck"],
+    "bold-text": ["How do I make text bold?", "How do I bold text?", "Bold the selected words"],
+    "italic-text": ["How do I make text italic?", "How do I italicize text?"],
+    "underline-text": ["How do I underline text?"],
+    "strikethrough-text": ["How do I strike through text?", "How do I cross out text?"],
+    "font-size": ["How do I change the font size?", "Make the text bigger or smaller"],
+    "font-family": ["How do I change the font?", "Use a different typeface"],
+    "text-color": ["How do I change the text color?", "Make the words red"],
+    "highlight-text": ["How do I highlight text?", "Add a highlight color"],
+    "align-text": ["How do I center text?", "How do I change text alignment?"],
+    "line-spacing": ["How do I change line spacing?", "Double space the document"],
+    "insert-table": ["How do I add a table?", "How do I insert a table?"],
+    "insert-image": ["How do I insert an image?", "How do I add a picture?"],
+    "insert-link": ["How do I add a link?", "How do I insert a hyperlink?"],
+    "bullet-list": ["How do I make a bulleted list?", "How do I add bullet points?"],
+    "numbered-list": ["How do I make a numbered list?"],
+    "add-heading": ["How do I add a heading?", "How do I make a title heading?"],
+    "add-comment": ["How do I add a comment?", "Leave a note on the document"],
+    "share-document": ["How do I share this document?", "How do I invite someone to edit?"],
+    "download-pdf": ["How do I download as PDF?", "How do I export the document?"],
+    "print-document": ["How do I print the document?"],
+    "rename-document": ["How do I rename the document?", "How do I change the document title?"],
+    "undo": ["How do I undo?", "How do I revert my last change?"],
+    "find-replace": ["How do I find and replace text?", "How do I search the document?"],
+    "spell-check": ["How do I check spelling?", "How do I run spell check?"],
+    "page-margins": ["How do I change the margins?", "How do I set page margins?"],
+    "word-count": ["How do I see the word count?", "How many words are in my document?"],
+    "select-all": ["How do I select all text?", "Select everything in the document"],
+}
+
+
+# Minimum character-bigram similarity for snapping an unknown word to a known one
+TYPO_MIN_SIMILARITY = 0.5
+
+
+class LessonMatch(NamedTuple):
+    """Best lesson for a question"""
+    lesson_id: str
+    confidence: float  # Cosine similarity in [0, 1]
+    phrasing: str  # The known phrasing that matched
+
+
+def _stem(token: str) -> str:
+    """Very light suffix stripping so plurals and -ing forms line up"""
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _bigrams(token: str) -> set:
+    """Character bigrams of a word, padded so first and last letters count"""
+    padded = f"#{token}#"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def normalize(text: str) -> List[str]:
+    """
+    Lowercase, drop punctuation and filler words, and map synonyms to canonical tokens.
+
+    Example:
+        "How do I make text bold?" -> ["text", "bold"]
+    """
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if word in SYNONYMS:
+            word = SYNONYMS[word]
+        elif word not in _CANONICAL:
+            word = _stem(word)
+            word = SYNONYMS.get(word, word)
+        tokens.append(word)
+    return tokens
+
+
+def features(tokens: List[str]) -> Dict[str, int]:
+    """Unigram and bigram term counts"""
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    for first, second in zip(tokens, tokens[1:]):
+        bigram = f"{first} {second}"
+        counts[bigram] = counts.get(bigram, 0) + 1
+    return counts
+
+
+class LessonIndex:
+    """
+    In-process TF-IDF index over lesson phrasings.
+
+    Questions are normalized (stopwords, synonyms, light stemming), turned
+    into unigram+bigram TF-IDF vectors and scored by cosine similarity
+    through an inverted index, so only phrasings sharing a term with the
+    question are ever touched. Words the index has never seen are
+    snapped to the closest known word by character bigram overlap,
+    which absorbs most speech-to-text typos ("tabel" -> "table").
+    """
+
+    def __init__(self, lessons: Optional[Dict[str, Iterable[str]]] = None):
+        self._entries: List[tuple] = []  # (lesson_id, phrasing)
+        self._postings: Dict[str, List[tuple]] = {}  # term -> [(entry index, weight)]
+        self._idf: Dict[str, float] = {}
+        self._ngram_index: Dict[str, List[str]] = {}
+        self._typo_cache: Dict[str, Optional[str]] = {}
+        self._built = False
+        for lesson_id, phrasings in (lessons if lessons is not None else DEFAULT_LESSONS).items():
+            self.add(lesson_id, *phrasings)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, lesson_id: str, *phrasings: str):
+        """Add phrasings for a lesson; the index is rebuilt lazily on the next match"""
+        for phrasing in phrasings:
+            self._entries.append((lesson_id, phrasing))
+        self._built = False
+
+    def build(self):
+        """(Re)compute TF-IDF weights and the inverted index"""
+        doc_features = [features(normalize(phrasing)) for _, phrasing in self._entries]
+        doc_freq: Dict[str, int] = {}
+        for counts in doc_features:
+            for term in counts:
+                doc_freq[term] = doc_freq.get(term, 0) + 1
+
+        total = len(doc_features)
+        self._idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in doc_freq.items()}
+        self._postings = {}
+        for index, counts in enumerate(doc_features):
+            weights = {term: (1 + math.log(count)) * self._idf[term] for term, count in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._postings.setdefault(term, []).append((index, weight / norm))
+
+        self._ngram_index = {}
+        for term in doc_freq:
+            if " " not in term:
+                for gram in _bigrams(term):
+                    self._ngram_index.setdefault(gram, []).append(term)
+        self._typo_cache = {}
+        self._built = True
+
+    def match(self, question: str) -> Optional[LessonMatch]:
+        """
+        Find the lesson that best matches a question.
+
+        Args:
+            question: The learner's raw question
+
+        Returns:
+            LessonMatch with the lesson ID and a confidence in [0, 1],
+            or None if the question shares nothing with any known lesson
+        """
+        if not self._built:
+            self.build()
+
+        tokens = [self._known(token) for token in normalize(question)]
+        counts = features([token for token in tokens if token])
+        if not counts:
+            return None
+
+        query = {term: (1 + math.log(count)) * self._idf[term] for term, count in counts.items() if term in self._idf}
+        norm = math.sqrt(sum(w * w for w in query.values()))
+        if not norm:
+            return None
+
+        scores: Dict[int, float] = {}
+        for term, weight in query.items():
+            weight /= norm
+            for index, doc_weight in self._postings[term]:
+                scores[index] = scores.get(index, 0.0) + weight * doc_weight
+
+        best = max(scores, key=scores.get)
+        lesson_id, phrasing = self._entries[best]
+        return LessonMatch(lesson_id, min(1.0, scores[best]), phrasing)
+
+    def _known(self, token: str) -> Optional[str]:
+        """Map a token to itself if indexed, else to the closest indexed word by bigram overlap"""
+        if token in self._idf:
+            return token
+        if token in self._typo_cache:
+            return self._typo_cache[token]
+
+        grams = _bigrams(token)
+        overlap: Dict[str, int] = {}
+        for gram in grams:
+            for term in self._ngram_index.get(gram, ()):
+                overlap[term] = overlap.get(term, 0) + 1
+        best, best_score = None, 0.0
+        for term, shared in overlap.items():
+            # Dice coefficient
+            score = 2 * shared / (len(grams) + len(_bigrams(term)))
+            if score > best_score:
+                best, best_score = term, score
+        result = best if best_score >= TYPO_MIN_SIMILARITY else None
+        self._typo_cache[token] = result
+        return result
+
+
+# Shared index used by the browser tools
+lesson_index = LessonIndex()
+
+
+def match_lesson(question: str) -> Optional[LessonMatch]:
+    """Match a question against the shared index, honouring the configured confidence threshold"""
+    match = lesson_index.match(question)
+    if match and match.confidence >= config.LESSON_MATCH_THRESHOLD:
+        return match
+    return None
@@ -0,0 +1,220 @@
+"""
+Step Narration for teaching mode
+Builds short spoken instructions locally from the actions the model chose
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import config
+
+# What common shortcuts do, for "Press Ctrl+B to bold"
+KEY_PURPOSES = {
+    "control+a": "to select everything",
+    "control+b": "to make it bold",
+    "control+i": "to make it italic",
+    "control+u": "to underline it",
+    "control+z": "to undo",
+    "control+y": "to redo",
+    "control+c": "to copy",
+    "control+x": "to cut",
+    "control+v": "to paste",
+    "control+k": "to add a link",
+    "control+f": "to find text",
+    "control+h": "to find and replace",
+    "control+p": "to print",
+    "control+s": "to save",
+    "control+shift+7": "to make a numbered list",
+    "control+shift+8": "to make a bulleted list",
+    "control+alt+m": "to add a comment",
+}
+
+KEY_NAMES = {
+    "control": "Ctrl", "ctrl": "Ctrl", "alt": "Alt", "shift": "Shift", "meta": "Cmd", "cmd": "Cmd",
+    "enter": "Enter", "return": "Enter", "escape": "Escape", "esc": "Escape", "tab": "Tab",
+    "backspace": "Backspace", "delete": "Delete", "space": "Space",
+}
+
+# "click on the 'File' menu to open it" -> "'File' menu"
+_CLICK_TARGET = re.compile(
+    r"\b(?:click|clicking|clicked|select|selecting|choose|choosing|open|opening)\s+(?:on\s+)?(?:the\s+)?"
+    r"(?P<target>[^.,;:!?()]+?)"
+    r"(?=\s+(?:to|in order to|so|which|that|and|at|from|in|on)\b|[.,;:!?()]|$)",
+    re.IGNORECASE,
+)
+
+# Longest click target we are willing to speak; anything longer is reasoning, not a label
+_MAX_TARGET_WORDS = 6
+
+
+def _key_label(keys: str) -> str:
+    """"control+shift+b" -> "Ctrl+Shift+B" """
+    parts = [part.strip() for part in keys.replace("-", "+").split("+") if part.strip()]
+    return "+".join(KEY_NAMES.get(part.lower(), part.upper() if len(part) == 1 else part.capitalize()) for part in parts)
+
+
+def _click_target(model_text: str) -> Optional[str]:
+    """Pull a short UI label out of the model's explanation"""
+    match = _CLICK_TARGET.search(model_text or "")
+    if not match:
+        return None
+    target = match.group("target").strip().strip("'\"“”‘’")
+    target = re.sub(r"[\"“”‘’]|(?<!\w)'|'(?!\w)", "", target).strip()
+    if not target or len(target.split()) > _MAX_TARGET_WORDS:
+        return None
+    return target
+
+
+def _phrase(name: str, args: Dict[str, Any], model_text: str) -> Optional[str]:
+    """Instruction for a single action, or None if there is no good template"""
+    if name in ("click_at", "double_click", "triple_click"):
+        target = _click_target(model_text)
+        verb = {"click_at": "click", "double_click": "double-click", "triple_click": "triple-click"}[name]
+        if target:
+            return f"{verb} the {target}"
+        if name == "double_click":
+            return "double-click the word to select it"
+        if name == "triple_click":
+            return "triple-click the line to select it"
+        return None
+    if name == "type_text_at":
+        text = str(args.get("text", "")).strip()
+        if not text:
+            return None
+        if len(text) > 40:
+            text = text[:37].rstrip() + "..."
+        phrase = f'type "{text}"'
+        return phrase + " and press Enter" if args.get("press_enter") else phrase
+    if name == "key_combination":
+        keys = str(args.get("keys", "")).strip()
+        if not keys:
+            return None
+        purpose = KEY_PURPOSES.get(keys.lower().replace(" ", "").replace("ctrl", "control"))
+        return f"press {_key_label(keys)}" + (f" {purpose}" if purpose else "")
+    if name == "press_key":
+        key = str(args.get("key", "")).strip()
+        return f"press {_key_label(key)}" if key else None
+    if name == "select_all":
+        return "select all the text"
+    if name in ("scroll", "scroll_document", "scroll_at"):
+        return f"scroll {args.get('direction', 'down')}"
+    if name == "drag_and_drop":
+        return "drag across the text to select it"
+    if name == "navigate":
+        host = urlparse(str(args.get("url", ""))).netloc
+        return f"go to {host}" if host else None
+    if name == "go_back":
+        return "go back to the previous page"
+    return None
+
+
+def narrate_calls(function_calls: List[Any], model_text: str = "") -> Optional[str]:
+    """
+    Build a short spoken instruction for a turn from its function calls.
+
+    Args:
+        function_calls: FunctionCall objects (or {"name", "args"} dicts) from the model
+        model_text: The model's explanation, used to name click targets
+
+    Returns:
+        e.g. "Click the File menu" or "Press Ctrl+A to select everything, then press Ctrl+B to make it bold";
+        None when any action lacks a good template, so the caller can fall back to summarization
+    """
+    phrases = []
+    for call in function_calls[:2]:
+        name = call["name"] if isinstance(call, dict) else call.name
+        args = (call["args"] if isinstance(call, dict) else call.args) or {}
+        if name == "open_web_browser":
+            continue
+        phrase = _phrase(name, args, model_text)
+        if not phrase:
+            return None
+        phrases.append(phrase)
+    if not phrases or len(function_calls) > 2:
+        return None
+    sentence = ", then ".join(phrases)
+    return sentence[0].upper() + sentence[1:]
+
+
+class SummaryCache:
+    """
+    Bounded LRU cache of Gemini Flash summaries, optionally persisted to disk.
+
+    Keys are the verbose model text with case and whitespace normalized,
+    so a demonstration that is repeated word for word never pays for the
+    same summary twice.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, path: Optional[str] = None):
+        self.max_entries = config.SUMMARY_CACHE_SIZE if max_entries is None else max_entries
+        self.path = config.SUMMARY_CACHE_PATH if path is None else path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        # The speech thread reads and writes; stats are read from the browser thread
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def get(self, text: str) -> Optional[str]:
+        """Cached summary for a text, counting the hit or miss"""
+        key = self._key(text)
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def put(self, text: str, summary: str):
+        """Store a summary, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[self._key(text)] = summary
+            self._entries.move_to_end(self._key(text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            snapshot = list(self._entries.items())
+        self._save(snapshot)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            for key, summary in items[-self.max_entries:]:
+                self._entries[key] = summary
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Ignoring unreadable summary cache {self.path}: {e}")
+
+    def _save(self, items):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(items, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Summary cache save error: {e}")
+
+
+# Shared cache used by summarize_for_speech
+summary_cache = SummaryCache()
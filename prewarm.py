@@ -0,0 +1,115 @@
+"""
+Worker Prewarm for DocBot
+Opens browser pages on Docs and Gemini connections before the worker takes its first job
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+import config
+from browser_controller import COMPUTER_USE_MODEL, SUMMARY_MODEL, client
+from browser_pool import AsyncBrowserHost, BrowserPool, get_pool
+from worker_load import WorkerCapacity, default_capacity
+
+# Load reported while the worker is still warming, so LiveKit dispatches to warm workers instead
+COLD_LOAD = 1.0
+
+
+class WorkerWarmup:
+    """
+    Warms a worker in the background and reports when it is ready.
+
+    Opening the first PREWARM_BROWSERS pool pages means launching Chromium
+    and loading docs.google.com; warming the Gemini clients means doing the
+    DNS lookup and TLS handshake with a cheap metadata request. A fresh
+    worker would otherwise pay both inside the first demonstration. Both
+    run on a thread of their own with its own event loop, so the worker
+    keeps registering and answering health checks meanwhile; the load
+    reported to LiveKit stays at COLD_LOAD until the warmup is done, and
+    then comes from the browser capacity model (see worker_load).
+    """
+
+    def __init__(self, pool: Optional[BrowserPool] = None, browsers: Optional[int] = None, clients: Optional[bool] = None, capacity: Optional[WorkerCapacity] = None):
+        """
+        Args:
+            pool: Pool to warm (default: the worker's shared pool)
+            browsers: Pages that must be open on Docs before the worker is ready
+            clients: Whether to open Gemini connections ahead of time
+            capacity: Load model reported once warm (default: one over the same pool)
+        """
+        self._pool = pool
+        self.capacity = capacity or (WorkerCapacity(pool) if pool else default_capacity)
+        self.browsers = config.PREWARM_BROWSERS if browsers is None else browsers
+        self.clients = config.PREWARM_CLIENTS if clients is None else clients
+        self.ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> BrowserPool:
+        return self._pool or get_pool()
+
+    def start(self):
+        """Start warming up (idempotent; returns at once)"""
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), name="worker_warmup", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the worker is warm; True if it is"""
+        return self.ready.wait(timeout)
+
+    def load(self, *_) -> float:
+        """
+        LiveKit load_fnc: COLD_LOAD until warm, then the browser capacity load.
+
+        Accepts and ignores the Worker LiveKit passes in, and starts the
+        warmup if prewarm_fnc has not run yet.
+        """
+        self.start()
+        if not self.ready.is_set():
+            return COLD_LOAD
+        return self.capacity.load()
+
+    async def _run(self):
+        started = time.monotonic()
+        results = await asyncio.gather(self._warm_browsers(), self._warm_clients(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                # A partly warm worker still works; demonstrations just start slower
+                print(f"⚠️ Prewarm step failed: {result}")
+        self.ready.set()
+        print(f"🔥 Worker warm in {time.monotonic() - started:.1f}s")
+        # Pages beyond PREWARM_BROWSERS keep opening on this loop after the worker reports ready
+        await self.pool.warmed()
+
+    async def _warm_browsers(self):
+        if self.browsers <= 0:
+            return
+        await self.pool.start(ready=self.browsers)
+        print(f"🔥 {min(self.browsers, self.pool.size)} browser page(s) warm on Docs")
+
+    async def _warm_clients(self):
+        if not self.clients:
+            return
+        # The sync client serves the sync backend and the Flash summaries
+        await asyncio.gather(
+            asyncio.to_thread(client.models.get, model=COMPUTER_USE_MODEL),
+            asyncio.to_thread(client.models.get, model=SUMMARY_MODEL),
+        )
+        # The async backend makes its requests from each host's own loop
+        hosts = [host for host in self.pool.hosts if isinstance(host, AsyncBrowserHost)]
+        await asyncio.gather(*(host.run(client.aio.models.get(model=COMPUTER_USE_MODEL)) for host in hosts))
+        print("🔥 Gemini connections open")
+
+
+# Warmup shared by every job thread in the worker process
+warmup = WorkerWarmup()
+
+
+def prewarm(proc=None):
+    """LiveKit prewarm_fnc: start warming the worker without holding up process initialization"""
+    warmup.start()
@@ -0,0 +1,377 @@
+"""
+Request Routing for the demo browser
+Blocks analytics and telemetry, serves static assets from a local content-addressed cache
+and keeps per-host byte and timing counters
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import config
+
+# What to do with a request
+BLOCK = "block"        # Abort it; the page never sees a response
+CACHED = "cached"      # Fulfil it from the local asset cache
+FETCH = "fetch"        # Fetch it ourselves and store the response in the cache
+CONTINUE = "continue"  # Let the browser handle it as usual
+
+# Beacons, analytics and telemetry Docs and Drive send that never change what the learner sees.
+# Patterns are fnmatch-style against the full URL, or against the host when they contain no "/".
+DEFAULT_BLOCK_RULES = [
+    "*.google-analytics.com",
+    "*.googletagmanager.com",
+    "*.doubleclick.net",
+    "*/gen_204*",
+    "*/csi?*",
+    "*/jserror*",
+    "*/log?format=json*",
+    "play.google.com",
+]
+
+# Resource types whose responses may be cached (Docs' JS, CSS, fonts and images are versioned URLs)
+CACHEABLE_TYPES = {"script", "stylesheet", "font", "image"}
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class RoutingRules:
+    """Block rules with allow-list exceptions; an allow match always wins"""
+
+    def __init__(self, block: Optional[List[str]] = None, allow: Optional[List[str]] = None, block_types: Optional[List[str]] = None):
+        self.block = DEFAULT_BLOCK_RULES + config.NETWORK_BLOCK if block is None else block
+        self.allow = config.NETWORK_ALLOW if allow is None else allow
+        self.block_types = set(config.NETWORK_BLOCK_TYPES if block_types is None else block_types)
+
+    def blocks(self, url: str, resource_type: str) -> bool:
+        if self._matches(self.allow, url):
+            return False
+        return resource_type in self.block_types or self._matches(self.block, url)
+
+    @staticmethod
+    def _matches(patterns: List[str], url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        for pattern in patterns:
+            if "/" in pattern:
+                if fnmatch.fnmatchcase(url, pattern):
+                    return True
+            elif fnmatch.fnmatchcase(host, pattern) or (pattern.startswith("*.") and host == pattern[2:]):
+                return True
+        return False
+
+
+class AssetCache:
+    """
+    Content-addressed cache of static responses on disk.
+
+    Bodies are stored once per SHA-256 under objects/, so assets served
+    from several URLs share a file; index/ holds one small JSON entry per
+    URL with the response headers, the body hash and when it expires.
+    Entries follow the response's Cache-Control max-age and the least
+    recently used ones are dropped once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None, min_max_age: Optional[int] = None):
+        self.directory = config.NETWORK_CACHE_DIR if directory is None else directory
+        self.max_bytes = config.NETWORK_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.min_max_age = config.NETWORK_CACHE_MIN_MAX_AGE if min_max_age is None else min_max_age
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """The cached entry for a URL with its body, or None if missing or expired"""
+        if not self.enabled:
+            return None
+        index_path = self._index_path(url)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("url") != url or entry.get("expires", 0) < time.time():
+                return None
+            with open(self._object_path(entry["sha256"]), "rb") as f:
+                body = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        if hashlib.sha256(body).hexdigest() != entry["sha256"]:
+            return None  # Damaged on disk; it will be fetched and stored again
+        os.utime(index_path)  # Recently used
+        entry["body"] = body
+        return entry
+
+    def cacheable(self, method: str, resource_type: str) -> bool:
+        """Whether a request may be answered from (and stored in) the cache"""
+        return self.enabled and method == "GET" and resource_type in CACHEABLE_TYPES
+
+    def store(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> bool:
+        """
+        Store a response if its headers allow long enough caching.
+
+        Returns:
+            True if it was stored
+        """
+        max_age = self._max_age(headers)
+        if status != 200 or max_age is None or max_age < self.min_max_age or not body:
+            return False
+        digest = hashlib.sha256(body).hexdigest()
+        entry = {
+            "url": url,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in ("content-length", "content-encoding", "set-cookie")},
+            "sha256": digest,
+            "size": len(body),
+            "expires": time.time() + max_age,
+        }
+        object_path = self._object_path(digest)
+        with self._lock:
+            try:
+                if not os.path.exists(object_path):
+                    self._write(object_path, body)
+                    if self._size is not None:
+                        self._size += len(body)
+                self._write(self._index_path(url), json.dumps(entry).encode("utf-8"))
+            except OSError as e:
+                print(f"Asset cache write error: {e}")
+                return False
+            self._evict()
+        return True
+
+    def clear(self):
+        """Delete every cached asset"""
+        with self._lock:
+            if self.directory and os.path.isdir(self.directory):
+                shutil.rmtree(self.directory, ignore_errors=True)
+            self._size = None
+
+    def _max_age(self, headers: Dict[str, str]) -> Optional[int]:
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control or "no-cache" in cache_control:
+            return None
+        if "immutable" in cache_control:
+            return 365 * 24 * 3600
+        match = MAX_AGE_RE.search(cache_control)
+        return int(match.group(1)) if match else None
+
+    def _evict(self):
+        """Over budget: drop the least recently used quarter of the entries and the bodies no longer referenced (lock held)"""
+        if not self.max_bytes:
+            return
+        if self._size is None:
+            self._size = sum(os.path.getsize(path) for path in self._files("objects"))
+        if self._size <= self.max_bytes:
+            return
+        entries = sorted(self._files("index"), key=os.path.getmtime)
+        for index_path in entries[:max(1, len(entries) // 4)]:
+            try:
+                os.remove(index_path)
+            except OSError:
+                pass
+        referenced = set()
+        for index_path in self._files("index"):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    referenced.add(json.load(f)["sha256"])
+            except (OSError, ValueError, KeyError):
+                pass
+        for object_path in self._files("objects"):
+            if os.path.basename(object_path) not in referenced:
+                try:
+                    self._size -= os.path.getsize(object_path)
+                    os.remove(object_path)
+                except OSError:
+                    pass
+
+    def _files(self, kind: str) -> List[str]:
+        paths = []
+        for root, _, names in os.walk(os.path.join(self.directory, kind)):
+            paths.extend(os.path.join(root, name) for name in names if not name.endswith(".tmp"))
+        return paths
+
+    def _index_path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "index", digest[:2], f"{digest}.json")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        """Atomic write, so a crash never leaves a half-written entry"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class HostStats:
+    """Counters for one host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.cache_hits = 0
+        self.bytes = 0             # Bytes received over the network
+        self.cached_bytes = 0      # Bytes served from the local cache instead
+        self.time_ms = 0.0         # Total time from request start to response end
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class RequestRouter:
+    """
+    Routing layer on a Playwright browser context.
+
+    Every request from every page of the context goes through route():
+    blocked ones are aborted, cacheable static assets are answered from
+    the AssetCache (or fetched once and stored), and the rest continue to
+    the network untouched, long-polling channels included. Per-host
+    counters come from the context's response and requestfinished events,
+    so they cover every request, routed or not.
+
+    One router can serve many contexts on different threads (the pool
+    installs it on each of its contexts).
+
+    Sync Playwright only runs route handlers while the context's thread is
+    inside a Playwright call, so with the sync backend a request the page
+    makes while that thread waits on the model (or is idle) hangs until the
+    next action. That is why NETWORK_FILTER is off by default there; turn it
+    on only where the page is driven continuously, as in the benchmarks.
+    """
+
+    def __init__(self, rules: Optional[RoutingRules] = None, cache: Optional[AssetCache] = None, enabled: Optional[bool] = None):
+        self.rules = rules or RoutingRules()
+        self.cache = cache or AssetCache()
+        self.enabled = config.NETWORK_FILTER if enabled is None else enabled
+        self._stats: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    def install(self, context):
+        """Route a sync Playwright context's requests through this router"""
+        if not self.enabled:
+            return
+        context.route("**/*", self._handle)
+        self._observe(context)
+
+    async def install_async(self, context):
+        """install() for async Playwright contexts"""
+        if not self.enabled:
+            return
+        await context.route("**/*", self._handle_async)
+        self._observe(context)
+
+    def decide(self, request) -> tuple:
+        """
+        What to do with a request.
+
+        Returns:
+            (BLOCK | CACHED | FETCH | CONTINUE, cached entry for CACHED)
+        """
+        url = request.url
+        if self.rules.blocks(url, request.resource_type):
+            return BLOCK, None
+        if self.cache.cacheable(request.method, request.resource_type):
+            entry = self.cache.lookup(url)
+            return (CACHED, entry) if entry else (FETCH, None)
+        return CONTINUE, None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host counters, busiest host first"""
+        with self._lock:
+            stats = {host: host_stats.as_dict() for host, host_stats in self._stats.items()}
+        return dict(sorted(stats.items(), key=lambda item: -(item[1]["bytes"] + item[1]["cached_bytes"])))
+
+    def totals(self) -> Dict[str, Any]:
+        """Counters summed over every host"""
+        totals = HostStats().as_dict()
+        for host_stats in self.stats().values():
+            for key, value in host_stats.items():
+                totals[key] += value
+        return totals
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _handle(self, route, request):
+        action, entry = self.decide(request)
+        if action == BLOCK:
+            self._count(request.url, blocked=1)
+            route.abort("blockedbyclient")
+        elif action == CACHED:
+            self._count(request.url, cache_hits=1, cached_bytes=entry["size"])
+            route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+        elif action == FETCH:
+            try:
+                response = route.fetch()
+                body = response.body()
+            except Exception:
+                route.continue_()
+                return
+            self.cache.store(request.url, response.status, response.headers, body)
+            route.fulfill(response=response, body=body)
+        else:
+            route.continue_()
+
+    async def _handle_async(self, route, request):
+        action, entry = self.decide(request)
+        if action == BLOCK:
+            self._count(request.url, blocked=1)
+            await route.abort("blockedbyclient")
+        elif action == CACHED:
+            self._count(request.url, cache_hits=1, cached_bytes=entry["size"])
+            await route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+        elif action == FETCH:
+            try:
+                response = await route.fetch()
+                body = await response.body()
+            except Exception:
+                await route.continue_()
+                return
+            self.cache.store(request.url, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
+        else:
+            await route.continue_()
+
+    def _observe(self, context):
+        """Count network bytes and time from the context's events (properties only, no protocol calls)"""
+        def on_response(response):
+            if response.from_service_worker:
+                return
+            self._count(response.url, bytes=int(response.headers.get("content-length") or 0))
+
+        def on_finished(request):
+            timing = request.timing
+            if timing and timing.get("responseEnd", -1) >= 0:
+                self._count(request.url, requests=1, time_ms=timing["responseEnd"])
+
+        context.on("response", on_response)
+        context.on("requestfinished", on_finished)
+
+    def _count(self, url: str, **counters):
+        host = urlsplit(url).hostname or "(none)"
+        with self._lock:
+            host_stats = self._stats.setdefault(host, HostStats())
+            for key, value in counters.items():
+                setattr(host_stats, key, getattr(host_stats, key) + value)
+
+
+# Router shared by the standalone browser and the pool
+default_router = RequestRouter()
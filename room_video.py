@@ -0,0 +1,270 @@
+"""
+Browser Video for the LiveKit room
+Publishes the automation page's screencast as a video track so learners can watch headless demonstrations
+"""
+import asyncio
+import base64
+import io
+import time
+from typing import Dict, Optional
+
+import psutil
+from livekit import rtc
+
+import config
+from async_browser_controller import AsyncBrowserAutomation
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it the browser isn't streamed
+    Image = None
+
+TRACK_NAME = "docbot-browser"
+# How often the frame rate and resolution are reconsidered
+ADAPT_INTERVAL = 1.0
+# Resolution steps: each degrade multiplies the width by this, each upgrade divides by it
+WIDTH_STEP = 0.75
+
+
+class BrowserVideoPublisher:
+    """
+    Streams one session's browser page into its room.
+
+    Chromium pushes a JPEG screencast frame whenever the page repaints
+    (nothing while it is still), acked on the page's host loop so it
+    keeps sending. Frames are handed to the session's loop through
+    a one-slot mailbox: a frame that arrives before the previous one was
+    published replaces it, so a slow decoder drops frames instead of
+    falling behind. Identical frames are skipped; when nothing changes
+    the last frame is only repeated every keepalive seconds, for
+    subscribers that join late.
+
+    The publisher measures the CPU it spends decoding each frame. Once a
+    second, if that exceeds cpu_budget (a fraction of one core) or a
+    frame takes longer than the frame interval, it lowers the frame rate
+    and then, at min_fps, the screencast resolution. With headroom it
+    restores resolution first (text must stay legible), then frame rate.
+
+    Only async backend pages are streamed. Sync Playwright handles CDP
+    events (and sends their acks) only while its thread is inside a
+    Playwright call, so the video would freeze whenever the demonstration
+    waits on the model.
+    """
+
+    def __init__(self, max_fps: Optional[float] = None, min_fps: Optional[float] = None, width: Optional[int] = None, min_width: Optional[int] = None, quality: Optional[int] = None, keepalive: Optional[float] = None, cpu_budget: Optional[float] = None):
+        self.max_fps = config.BROWSER_VIDEO_MAX_FPS if max_fps is None else max_fps
+        self.min_fps = min(self.max_fps, config.BROWSER_VIDEO_MIN_FPS if min_fps is None else min_fps)
+        self.max_width = config.BROWSER_VIDEO_WIDTH if width is None else width
+        self.min_width = min(self.max_width, config.BROWSER_VIDEO_MIN_WIDTH if min_width is None else min_width)
+        self.quality = config.BROWSER_VIDEO_QUALITY if quality is None else quality
+        self.keepalive = config.BROWSER_VIDEO_KEEPALIVE if keepalive is None else keepalive
+        self.cpu_budget = config.BROWSER_VIDEO_CPU_BUDGET if cpu_budget is None else cpu_budget
+        self.fps = self.max_fps
+        self.width = self.max_width
+        self._aspect = 10 / 16  # Height over width of the page's viewport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._room: Optional[rtc.Room] = None
+        self._source: Optional[rtc.VideoSource] = None
+        self._track: Optional[rtc.LocalVideoTrack] = None
+        self._task: Optional[asyncio.Task] = None
+        self._mailbox: Optional[str] = None
+        self._arrived = asyncio.Event()
+        self._restart: Optional[dict] = None  # Screencast parameters the page side should switch to
+        self._pending = set()  # Acks still in flight on an async page (kept referenced until done)
+        self._stopped = False
+        self._stats = {"received": 0, "published": 0, "dropped": 0, "idle": 0, "keepalive": 0, "decode_cpu": 0.0}
+        self._window = {"cpu": 0.0, "late": 0, "frames": 0}
+        self._started_at = 0.0
+        self._process_cpu = 0.0
+
+    async def start(self, room: rtc.Room, automation) -> bool:
+        """
+        Publish the automation's page to the room.
+
+        Args:
+            room: The session's room
+            automation: The AsyncBrowserAutomation leased to the session
+
+        Returns:
+            False if browser video is disabled, Pillow is not installed or the page is on the sync backend
+        """
+        if not config.BROWSER_VIDEO:
+            return False
+        if not isinstance(automation, AsyncBrowserAutomation):
+            print("⚠️ Browser video needs the async backend (BROWSER_BACKEND=async); the browser is not streamed")
+            return False
+        if Image is None:
+            print("⚠️ Pillow is not installed; the browser is not streamed to the room")
+            return False
+        page = automation.page
+        viewport = page.viewport_size or {"width": 16, "height": 10}
+        self._aspect = viewport["height"] / max(1, viewport["width"])
+        self._loop = asyncio.get_running_loop()
+        self._room = room
+        self._started_at = time.monotonic()
+        self._process_cpu = sum(psutil.Process().cpu_times()[:2])
+
+        self._source = rtc.VideoSource(*self._size())
+        self._track = rtc.LocalVideoTrack.create_video_track(TRACK_NAME, self._source)
+        await room.local_participant.publish_track(
+            self._track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_SCREENSHARE)
+        )
+        await automation.run_on_browser(self._start_screencast(page))
+        self._task = asyncio.create_task(self._publish_frames())
+        return True
+
+    async def aclose(self):
+        """Stop streaming and unpublish the track (the page stops sending once its frames go unacked)"""
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._track and self._room:
+            try:
+                await self._room.local_participant.unpublish_track(self._track.sid)
+            except Exception as e:
+                print(f"Browser video unpublish error: {e}")
+        if self._source:
+            await self._source.aclose()
+        if self._started_at:
+            stats = self.stats()
+            print(
+                f"🎥 Browser video: {stats['published']} frames published, {stats['dropped']} dropped, "
+                f"{stats['idle']} idle skipped; decode {stats['decode_ms_per_frame']:.1f} ms/frame, "
+                f"process CPU {stats['process_cpu_share']:.0%} of a core"
+            )
+        self._track = self._source = self._room = None
+
+    def stats(self) -> Dict[str, float]:
+        """Frame counts, decode CPU per published frame and this process's CPU share since start"""
+        elapsed = max(1e-6, time.monotonic() - self._started_at)
+        process_cpu = sum(psutil.Process().cpu_times()[:2]) - self._process_cpu
+        published = max(1, self._stats["published"])
+        return {
+            **{key: value for key, value in self._stats.items() if key != "decode_cpu"},
+            "decode_ms_per_frame": self._stats["decode_cpu"] * 1000 / published,
+            "process_cpu_share": process_cpu / elapsed,
+            "fps": self.fps,
+            "width": self.width,
+        }
+
+    def _size(self):
+        return self.width, int(self.width * self._aspect)
+
+    def _screencast_params(self) -> dict:
+        width, height = self._size()
+        return {"format": "jpeg", "quality": self.quality, "maxWidth": width, "maxHeight": height, "everyNthFrame": 1}
+
+    # Page side: runs on the host loop that owns the page
+
+    async def _start_screencast(self, page):
+        session = await page.context.new_cdp_session(page)
+
+        def on_frame(params):
+            if self._stopped:
+                return
+            self._send(session, "Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+            restart, self._restart = self._restart, None
+            if restart:
+                self._send(session, "Page.startScreencast", restart)
+            self._loop.call_soon_threadsafe(self._offer, params["data"])
+
+        session.on("Page.screencastFrame", on_frame)
+        await session.send("Page.startScreencast", self._screencast_params())
+
+    def _send(self, session, method: str, params: dict):
+        call = asyncio.ensure_future(session.send(method, params))
+        self._pending.add(call)
+        call.add_done_callback(self._sent)
+
+    def _sent(self, call):
+        self._pending.discard(call)
+        if not call.cancelled():
+            call.exception()  # A page that closed mid-call; nothing to do
+
+    # Session side: runs on the session's loop
+
+    def _offer(self, data: str):
+        """Take a frame from the page, replacing one that wasn't published yet"""
+        self._stats["received"] += 1
+        if self._mailbox is not None:
+            self._stats["dropped"] += 1
+        self._mailbox = data
+        self._arrived.set()
+
+    async def _publish_frames(self):
+        last_data = None
+        last_frame: Optional[rtc.VideoFrame] = None
+        last_sent = 0.0
+        adapted_at = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=self.keepalive)
+            except asyncio.TimeoutError:
+                if last_frame is not None:
+                    self._source.capture_frame(last_frame)
+                    self._stats["keepalive"] += 1
+                    last_sent = time.monotonic()
+                continue
+            # Pace to the current frame rate; frames arriving meanwhile replace each other
+            wait = last_sent + 1 / self.fps - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._arrived.clear()
+            data, self._mailbox = self._mailbox, None
+            if data is None:
+                continue
+            if data == last_data:
+                self._stats["idle"] += 1
+                continue
+            started = time.monotonic()
+            try:
+                frame, cpu = await asyncio.to_thread(_decode, data)
+            except Exception as e:
+                print(f"Browser video frame error: {e}")
+                continue
+            self._source.capture_frame(frame)
+            last_data, last_frame, last_sent = data, frame, time.monotonic()
+            self._stats["published"] += 1
+            self._stats["decode_cpu"] += cpu
+            self._window["cpu"] += cpu
+            self._window["frames"] += 1
+            if last_sent - started > 1 / self.fps:
+                self._window["late"] += 1
+            if last_sent - adapted_at >= ADAPT_INTERVAL:
+                self._adapt(last_sent - adapted_at)
+                adapted_at = last_sent
+
+    def _adapt(self, elapsed: float):
+        """Trade frame rate and resolution against the CPU spent in the last window"""
+        share = self._window["cpu"] / elapsed
+        late = self._window["late"] > self._window["frames"] // 4
+        self._window = {"cpu": 0.0, "late": 0, "frames": 0}
+        fps, width = self.fps, self.width
+        if share > self.cpu_budget or late:
+            if self.fps > self.min_fps:
+                self.fps = max(self.min_fps, self.fps * 2 / 3)
+            else:
+                self.width = max(self.min_width, int(self.width * WIDTH_STEP))
+        elif share < self.cpu_budget / 2:
+            if self.width < self.max_width:
+                self.width = min(self.max_width, int(self.width / WIDTH_STEP))
+            else:
+                self.fps = min(self.max_fps, self.fps * 3 / 2)
+        if width != self.width:
+            # Applied by the page side with the next frame's ack
+            self._restart = self._screencast_params()
+        if (fps, width) != (self.fps, self.width):
+            print(f"🎥 Browser video now {self.fps:.0f} fps at {self.width}px (decode CPU {share:.0%} of a core)")
+
+
+def _decode(data: str):
+    """Decode a screencast frame to an RGBA VideoFrame; returns it with the thread CPU seconds it took"""
+    started = time.thread_time()
+    image = Image.open(io.BytesIO(base64.b64decode(data))).convert("RGBA")
+    frame = rtc.VideoFrame(image.width, image.height, rtc.VideoBufferType.RGBA, image.tobytes())
+    return frame, time.thread_time() - started
@@ -0,0 +1,184 @@
+"""
+Screencast Capture for Gemini Computer Use
+Keeps the latest frames of Chromium's screencast in a ring buffer so an observation is a buffer read
+"""
+import asyncio
+import base64
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional
+
+import config
+from screenshot_encoding import MIME_TYPES, ScreenshotEncoder
+
+# Formats Page.startScreencast can emit; other encoder formats are streamed as JPEG
+SCREENCAST_FORMATS = ("png", "jpeg")
+
+# Wall-clock time (browser and worker share a clock) of the last input sent to each screencast page
+_input_at: Dict[int, float] = {}
+
+
+def mark_input(page):
+    """Note that an action just reached a page: only frames composited after this can observe it"""
+    if id(page) in _input_at:
+        _input_at[id(page)] = time.time()
+
+
+class Frame(NamedTuple):
+    data: str          # Base64 image, decoded only if the frame is used
+    timestamp: float   # When the browser composited it (seconds since the epoch)
+
+
+class ScreencastEncoder(ScreenshotEncoder):
+    """
+    ScreenshotEncoder that reads observations from a running screencast.
+
+    The first capture of a page starts Page.startScreencast and is taken
+    directly; from then on Chromium pushes a frame whenever the screen
+    changes, and the newest buffer_frames are kept per page. A capture
+    returns the newest frame composited after the last action (see
+    mark_input), so its timestamp proves it shows the action's result;
+    by then the settle wait has let the UI finish reacting. If no such
+    frame arrives within max_wait_ms (the action changed nothing on
+    screen, or the page is hidden and not painting) the capture falls
+    back to a regular screenshot.
+
+    Fingerprints still go through Page.captureScreenshot.
+    """
+
+    def __init__(self, format: Optional[str] = None, quality: Optional[int] = None, scale: Optional[float] = None, tier: Optional[str] = None, buffer_frames: Optional[int] = None, max_wait_ms: Optional[int] = None):
+        super().__init__(format, quality, scale, tier)
+        self.buffer_frames = max(1, config.SCREENCAST_BUFFER_FRAMES if buffer_frames is None else buffer_frames)
+        self.max_wait_ms = config.SCREENCAST_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self._frames: Dict[int, Deque[Frame]] = {}
+        self._pending = set()  # Frame acks still in flight on async pages (kept referenced until done)
+        self._stats = {"buffered": 0, "fallbacks": 0}
+
+    @property
+    def frame_format(self) -> str:
+        """Format of the screencast frames"""
+        return self.format if self.format in SCREENCAST_FORMATS else "jpeg"
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.frame_format]
+
+    def describe(self) -> str:
+        quality = "" if self.frame_format == "png" else f" q{self.quality}"
+        return f"screencast {self.frame_format}{quality} x{self.scale:g}"
+
+    def stats(self) -> Dict[str, int]:
+        """Captures served from the buffer and captures that fell back to a screenshot"""
+        return dict(self._stats)
+
+    def capture(self, page) -> bytes:
+        frames = self._frames.get(id(page))
+        if frames is None:
+            self._start(page)
+            return self._capture_direct(page)
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        # The sync API only delivers frames while a call is running: let the queued ones in first
+        page.wait_for_timeout(1)
+        frame = self._fresh(page, frames)
+        while frame is None and time.monotonic() < deadline:
+            page.wait_for_timeout(10)
+            frame = self._fresh(page, frames)
+        if frame is None:
+            return self._capture_direct(page)
+        self._stats["buffered"] += 1
+        return base64.b64decode(frame.data)
+
+    async def capture_async(self, page) -> bytes:
+        frames = self._frames.get(id(page))
+        if frames is None:
+            await self._start_async(page)
+            return await self._capture_direct_async(page)
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        frame = self._fresh(page, frames)
+        while frame is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+            frame = self._fresh(page, frames)
+        if frame is None:
+            return await self._capture_direct_async(page)
+        self._stats["buffered"] += 1
+        return base64.b64decode(frame.data)
+
+    @staticmethod
+    def _fresh(page, frames: Deque[Frame]) -> Optional[Frame]:
+        """The newest buffered frame if it was composited after the page's last input"""
+        if frames and frames[-1].timestamp >= _input_at.get(id(page), 0.0):
+            return frames[-1]
+        return None
+
+    def _capture_direct(self, page) -> bytes:
+        self._stats["fallbacks"] += 1
+        if self.format == self.frame_format:
+            return super().capture(page)
+        return self._capture_cdp(page, self.frame_format)
+
+    async def _capture_direct_async(self, page) -> bytes:
+        self._stats["fallbacks"] += 1
+        if self.format == self.frame_format:
+            return await super().capture_async(page)
+        return await self._capture_cdp_async(page, self.frame_format)
+
+    def _start(self, page):
+        """Start the screencast on a page (frames are acked as they arrive so Chromium keeps sending them)"""
+        session = page.context.new_cdp_session(page)
+        frames = self._track(page)
+
+        def on_frame(params):
+            frames.append(self._frame(params))
+            try:
+                session.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+            except Exception:
+                pass  # The page is closing
+
+        session.on("Page.screencastFrame", on_frame)
+        session.send("Page.startScreencast", self._screencast_params(page))
+
+    async def _start_async(self, page):
+        """_start() for async Playwright pages"""
+        session = await page.context.new_cdp_session(page)
+        frames = self._track(page)
+
+        def on_frame(params):
+            frames.append(self._frame(params))
+            ack = asyncio.ensure_future(session.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]}))
+            self._pending.add(ack)
+            ack.add_done_callback(self._acked)
+
+        session.on("Page.screencastFrame", on_frame)
+        await session.send("Page.startScreencast", self._screencast_params(page))
+
+    def _acked(self, ack):
+        self._pending.discard(ack)
+        if not ack.cancelled():
+            ack.exception()  # A page that closed mid-ack; nothing to do
+
+    def _track(self, page) -> Deque[Frame]:
+        frames: Deque[Frame] = deque(maxlen=self.buffer_frames)
+        self._frames[id(page)] = frames
+        _input_at.setdefault(id(page), 0.0)
+
+        def forget(_):
+            self._frames.pop(id(page), None)
+            _input_at.pop(id(page), None)
+
+        page.on("close", forget)
+        return frames
+
+    @staticmethod
+    def _frame(params: dict) -> Frame:
+        timestamp = params.get("metadata", {}).get("timestamp")
+        return Frame(params["data"], timestamp if timestamp is not None else time.time())
+
+    def _screencast_params(self, page) -> dict:
+        viewport = page.viewport_size or {"width": 0, "height": 0}
+        width, height = self.frame_size(viewport["width"], viewport["height"])
+        params = {"format": self.frame_format, "everyNthFrame": 1}
+        if width and height:
+            params.update(maxWidth=width, maxHeight=height)
+        if self.frame_format != "png":
+            params["quality"] = self.quality
+        return params
@@ -0,0 +1,295 @@
+"""
+Screenshot Encoding for Gemini Computer Use
+Captures the page in a configurable format, quality and scale
+"""
+import base64
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+# Named quality tiers: (format, quality, scale)
+QUALITY_TIERS: Dict[str, Tuple[str, int, float]] = {
+    "lossless": ("png", 100, 1.0),
+    "high": ("jpeg", 85, 1.0),
+    "balanced": ("webp", 75, 0.75),
+    "fast": ("jpeg", 60, 0.5),
+}
+
+# Width of the grayscale thumbnails used to compare frames
+FINGERPRINT_WIDTH = 32
+
+# Channels per pixel for the PNG color types Chromium emits (gray, RGB, gray+alpha, RGBA)
+_PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+class ScreenshotEncoder:
+    """
+    Encodes page screenshots before they are sent to the model.
+
+    PNG and JPEG at full size go through Playwright's own screenshot call.
+    WebP and downscaled frames are captured directly by Chromium over the
+    DevTools protocol, so the page is rendered, scaled and encoded in a
+    single pass without an extra decode/re-encode step in Python.
+
+    The model answers with coordinates normalized to 0-1000, which do not
+    depend on the size of the image it was shown. Clicks must therefore
+    always be denormalized against the viewport size, never the encoded
+    frame size.
+    """
+
+    def __init__(self, format: Optional[str] = None, quality: Optional[int] = None, scale: Optional[float] = None, tier: Optional[str] = None):
+        """
+        Args:
+            format: "png", "jpeg" or "webp"
+            quality: Encoder quality 1-100 (ignored for PNG)
+            scale: Downscale factor in (0, 1]; 0.5 sends a half-size frame
+            tier: Name of a preset in QUALITY_TIERS; explicit arguments override it
+        """
+        tier = tier if tier is not None else config.SCREENSHOT_TIER
+        if tier:
+            if tier not in QUALITY_TIERS:
+                raise ValueError(f"Unknown screenshot tier '{tier}', expected one of {', '.join(QUALITY_TIERS)}")
+            tier_format, tier_quality, tier_scale = QUALITY_TIERS[tier]
+        else:
+            tier_format, tier_quality, tier_scale = config.SCREENSHOT_FORMAT, config.SCREENSHOT_QUALITY, config.SCREENSHOT_SCALE
+
+        self.format = (format or tier_format).lower()
+        self.quality = int(quality if quality is not None else tier_quality)
+        self.scale = float(scale if scale is not None else tier_scale)
+
+        if self.format not in MIME_TYPES:
+            raise ValueError(f"Unsupported screenshot format '{self.format}'")
+        if not 0 < self.scale <= 1:
+            raise ValueError(f"Screenshot scale must be in (0, 1], got {self.scale}")
+        self.quality = min(100, max(1, self.quality))
+        self._cdp_sessions = {}
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type of the encoded frames"""
+        return MIME_TYPES[self.format]
+
+    def describe(self) -> str:
+        """Short label for logs and benchmarks"""
+        quality = "" if self.format == "png" else f" q{self.quality}"
+        return f"{self.format}{quality} x{self.scale:g}"
+
+    def frame_size(self, screen_width: int, screen_height: int) -> Tuple[int, int]:
+        """Pixel size of the encoded frame for a given viewport"""
+        return int(screen_width * self.scale), int(screen_height * self.scale)
+
+    def capture(self, page) -> bytes:
+        """
+        Capture and encode the current viewport.
+
+        Args:
+            page: Playwright page object
+
+        Returns:
+            Encoded image bytes (see mime_type)
+        """
+        if self.scale == 1 and self.format == "png":
+            return page.screenshot(type="png")
+        if self.scale == 1 and self.format == "jpeg":
+            return page.screenshot(type="jpeg", quality=self.quality)
+        return self._capture_cdp(page)
+
+    def fingerprint(self, page, width: int = FINGERPRINT_WIDTH) -> List[int]:
+        """
+        Capture a tiny grayscale thumbnail of the viewport for cheap comparisons.
+
+        Args:
+            page: Playwright page object
+            width: Thumbnail width in pixels
+
+        Returns:
+            Row-major luminance values (0-255)
+        """
+        png = self._capture_cdp(page, "png", self._fingerprint_scale(page, width))
+        return decode_png_gray(png)[2]
+
+    async def capture_async(self, page) -> bytes:
+        """capture() for async Playwright pages"""
+        if self.scale == 1 and self.format == "png":
+            return await page.screenshot(type="png")
+        if self.scale == 1 and self.format == "jpeg":
+            return await page.screenshot(type="jpeg", quality=self.quality)
+        return await self._capture_cdp_async(page)
+
+    async def fingerprint_async(self, page, width: int = FINGERPRINT_WIDTH) -> List[int]:
+        """fingerprint() for async Playwright pages"""
+        png = await self._capture_cdp_async(page, "png", self._fingerprint_scale(page, width))
+        return decode_png_gray(png)[2]
+
+    @staticmethod
+    def _fingerprint_scale(page, width: int) -> float:
+        viewport = page.viewport_size or {"width": width, "height": width}
+        return width / max(1, viewport["width"])
+
+    def _capture_cdp(self, page, format: Optional[str] = None, scale: Optional[float] = None) -> bytes:
+        """Capture through Chromium's Page.captureScreenshot with scaling"""
+        session = self._cdp_sessions.get(id(page))
+        if session is None:
+            session = page.context.new_cdp_session(page)
+            self._remember_session(page, session)
+        origin = _scroll_origin(session.send("Page.getLayoutMetrics"))
+        result = session.send("Page.captureScreenshot", self._cdp_params(page, format, scale, origin))
+        return base64.b64decode(result["data"])
+
+    async def _capture_cdp_async(self, page, format: Optional[str] = None, scale: Optional[float] = None) -> bytes:
+        """_capture_cdp() for async Playwright pages"""
+        session = self._cdp_sessions.get(id(page))
+        if session is None:
+            session = await page.context.new_cdp_session(page)
+            self._remember_session(page, session)
+        origin = _scroll_origin(await session.send("Page.getLayoutMetrics"))
+        result = await session.send("Page.captureScreenshot", self._cdp_params(page, format, scale, origin))
+        return base64.b64decode(result["data"])
+
+    def _remember_session(self, page, session):
+        self._cdp_sessions[id(page)] = session
+        page.on("close", lambda _: self._cdp_sessions.pop(id(page), None))
+
+    def _cdp_params(self, page, format: Optional[str], scale: Optional[float], origin: Tuple[float, float] = (0, 0)) -> dict:
+        format = format or self.format
+        viewport = page.viewport_size or {"width": 0, "height": 0}
+        params = {
+            "format": format,
+            # The clip is in document coordinates: start it where the page is scrolled to, as Playwright does
+            "clip": {
+                "x": origin[0],
+                "y": origin[1],
+                "width": viewport["width"],
+                "height": viewport["height"],
+                "scale": self.scale if scale is None else scale,
+            },
+        }
+        if format != "png":
+            params["quality"] = self.quality
+        return params
+
+
+def _scroll_origin(metrics: dict) -> Tuple[float, float]:
+    """Document position of the viewport's top-left corner, from Page.getLayoutMetrics"""
+    viewport = metrics.get("cssVisualViewport") or metrics.get("visualViewport") or {}
+    return viewport.get("pageX", 0), viewport.get("pageY", 0)
+
+
+def decode_png_gray(data: bytes) -> Tuple[int, int, List[int]]:
+    """
+    Decode an 8-bit, non-interlaced PNG (as produced by Chromium) to grayscale.
+
+    Only meant for the tiny thumbnails used as fingerprints; it is plain
+    Python and far too slow for full-size frames.
+
+    Returns:
+        (width, height, row-major luminance values)
+    """
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("Not a PNG image")
+    pos = 8
+    idat = []
+    width = height = color_type = 0
+    while pos < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b"IHDR":
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+            if bit_depth != 8 or interlace or color_type not in _PNG_CHANNELS:
+                raise ValueError("Unsupported PNG layout")
+        elif chunk_type == b"IDAT":
+            idat.append(chunk)
+        elif chunk_type == b"IEND":
+            break
+
+    channels = _PNG_CHANNELS[color_type]
+    stride = width * channels
+    raw = zlib.decompress(b"".join(idat))
+    previous = bytearray(stride)
+    gray = []
+    for row in range(height):
+        offset = row * (stride + 1)
+        filter_type = raw[offset]
+        line = bytearray(raw[offset + 1:offset + 1 + stride])
+        for i in range(stride):
+            left = line[i - channels] if i >= channels else 0
+            up = previous[i]
+            if filter_type == 1:
+                line[i] = (line[i] + left) & 0xFF
+            elif filter_type == 2:
+                line[i] = (line[i] + up) & 0xFF
+            elif filter_type == 3:
+                line[i] = (line[i] + ((left + up) >> 1)) & 0xFF
+            elif filter_type == 4:
+                up_left = previous[i - channels] if i >= channels else 0
+                estimate = left + up - up_left
+                pa, pb, pc = abs(estimate - left), abs(estimate - up), abs(estimate - up_left)
+                predictor = left if pa <= pb and pa <= pc else (up if pb <= pc else up_left)
+                line[i] = (line[i] + predictor) & 0xFF
+        for i in range(0, stride, channels):
+            if channels >= 3:
+                gray.append((299 * line[i] + 587 * line[i + 1] + 114 * line[i + 2]) // 1000)
+            else:
+                gray.append(line[i])
+        previous = line
+    return width, height, gray
+
+
+def image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) read from the header of a PNG, JPEG or WebP image, without decoding it.
+
+    Returns:
+        None if the format isn't recognised
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"\xff\xd8":
+        pos = 2
+        while pos + 9 < len(data):
+            if data[pos] != 0xFF:
+                pos += 1
+                continue
+            marker = data[pos + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                pos += 2
+                continue
+            length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+            # Start-of-frame markers (not DHT, JPG or DAC) carry the dimensions
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+                return width, height
+            pos += 2 + length
+        return None
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+
+def fingerprint_distance(a: List[int], b: List[int]) -> float:
+    """
+    Mean absolute luminance difference between two fingerprints.
+
+    Returns:
+        0.0 for identical frames up to 1.0; 1.0 if the sizes differ
+    """
+    if not a or len(a) != len(b):
+        return 1.0
+    return sum(abs(x - y) for x, y in zip(a, b)) / (255 * len(a))
@@ -9,6 +9,7 @@ from flask_cors import CORS
 from livekit import api
 from dotenv import load_dotenv
 import config
+from tracing import trace_percentiles
 
 load_dotenv()
 
@@ -92,6 +93,16 @@ def get_config():
     })
 
 
+@app.route('/api/metrics')
+def get_metrics():
+    """Latency percentiles per span kind, from the agent's trace file"""
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'trace_path': config.TRACE_PATH,
+        'spans': trace_percentiles(config.TRACE_PATH, limit)
+    })
+
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
@@ -0,0 +1,225 @@
+"""
+Speech Pipeline for step-by-step teaching
+Summarizes and speaks model text off the browser thread, in order
+"""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, List, Optional
+
+
+class SpeechPipeline:
+    """
+    Ordered speech stage that runs alongside the agent loop.
+
+    The browser thread only enqueues text and carries on executing actions
+    and capturing screenshots. A single worker thread summarizes each text
+    (which may be a model call) and hands the result to the async speech
+    callback on the main event loop. One worker means utterances are always
+    spoken in the order they were submitted.
+    """
+
+    def __init__(self, speech_callback: Optional[Callable] = None, event_loop: Optional[asyncio.AbstractEventLoop] = None, summarizer: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            speech_callback: Async callback that speaks a sentence
+            event_loop: Event loop the callback must run on
+            summarizer: Turns verbose model text into a short instruction
+        """
+        self._speech_callback = speech_callback
+        self._event_loop = event_loop
+        self._summarizer = summarizer or (lambda text: text)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech_thread")
+        self._pending: List[Future] = []
+        self._cancelled = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there is anyone to speak to"""
+        return bool(self._speech_callback and self._event_loop)
+
+    def submit(self, text: str) -> Optional[Future]:
+        """
+        Queue model text to be summarized and spoken.
+
+        Returns:
+            Future resolving to the sentence actually spoken, or None if speech is disabled
+        """
+        return self._enqueue(text, summarize=True)
+
+    def speak(self, text: str) -> Optional[Future]:
+        """Queue a sentence that is already short enough to speak as is"""
+        return self._enqueue(text, summarize=False)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far has been handed to the speech callback.
+
+        Returns:
+            True if the queue drained within the timeout (what didn't is still pending)
+        """
+        pending = list(self._pending)
+        if not pending:
+            return True
+        _, not_done = wait(pending, timeout=timeout)
+        self._pending = [future for future in self._pending if not future.done()]
+        return not not_done
+
+    def cancel(self):
+        """Drop everything not yet spoken; later submissions are ignored too"""
+        self._cancelled = True
+        for future in self._pending:
+            future.cancel()  # Only those still queued; one being spoken finishes on its own
+        self._pending = []
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush (unless cancelled: nothing left is worth waiting for) and stop the worker thread"""
+        if not self._cancelled and not self.flush(timeout):
+            print("⚠️ Speech queue did not drain before closing")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _enqueue(self, text: str, summarize: bool) -> Optional[Future]:
+        if not self.enabled or not text.strip():
+            return None
+        # Drop references to work that already finished so the list stays short
+        self._pending = [future for future in self._pending if not future.done()]
+        future = self._executor.submit(self._dispatch, text, summarize)
+        self._pending.append(future)
+        return future
+
+    def _dispatch(self, text: str, summarize: bool) -> str:
+        """Runs on the speech thread: summarize, then schedule speech on the main loop"""
+        if self._cancelled:
+            return ""
+        speech = text
+        if summarize:
+            try:
+                speech = self._summarizer(text)
+            except Exception as e:
+                print(f"Summarization error: {e}")
+            if self._cancelled:
+                return ""  # Stopped while the summary was being made
+        print(f"Speaking: {speech}")
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._speech_callback(speech), self._event_loop)
+            # Wait briefly for it to be queued (session.say is fast)
+            future.result(timeout=2.0)
+        except Exception as e:
+            print(f"Speech callback error: {e}")
+        return speech
+
+
+class AsyncSpeechPipeline:
+    """
+    SpeechPipeline for the async browser backend.
+
+    Lives on the event loop that drives the page: the agent loop enqueues
+    text and carries on, and a single consumer task summarizes and speaks
+    each text in submission order. A speech callback on that same loop is
+    awaited directly; one on another loop (a session whose page lives on a
+    pool host) is scheduled there without blocking either loop.
+    """
+
+    def __init__(self, speech_callback: Optional[Callable] = None, event_loop: Optional[asyncio.AbstractEventLoop] = None, summarizer: Optional[Callable[[str], Awaitable[str]]] = None):
+        """
+        Args:
+            speech_callback: Async callback that speaks a sentence
+            event_loop: Event loop the callback must run on
+            summarizer: Async function turning verbose model text into a short instruction
+        """
+        self._speech_callback = speech_callback
+        self._event_loop = event_loop
+        self._summarizer = summarizer
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: List[asyncio.Future] = []
+        self._cancelled = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there is anyone to speak to"""
+        return bool(self._speech_callback and self._event_loop)
+
+    def submit(self, text: str) -> Optional[asyncio.Future]:
+        """
+        Queue model text to be summarized and spoken.
+
+        Returns:
+            Future resolving to the sentence actually spoken, or None if speech is disabled
+        """
+        return self._enqueue(text, summarize=True)
+
+    def speak(self, text: str) -> Optional[asyncio.Future]:
+        """Queue a sentence that is already short enough to speak as is"""
+        return self._enqueue(text, summarize=False)
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far has been handed to the speech callback.
+
+        Returns:
+            True if the queue drained within the timeout (what didn't is still pending)
+        """
+        pending = list(self._pending)
+        if not pending:
+            return True
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        self._pending = [future for future in self._pending if not future.done()]
+        return not not_done
+
+    def cancel(self):
+        """Drop everything not yet spoken; later submissions are ignored too"""
+        self._cancelled = True
+        for future in self._pending:
+            future.cancel()  # The consumer skips them; one being spoken finishes on its own
+        self._pending = []
+
+    async def close(self, timeout: Optional[float] = None):
+        """Flush (unless cancelled: nothing left is worth waiting for) and stop the consumer task"""
+        if not self._cancelled and not await self.flush(timeout):
+            print("⚠️ Speech queue did not drain before closing")
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+
+    def _enqueue(self, text: str, summarize: bool) -> Optional[asyncio.Future]:
+        if not self.enabled or not text.strip():
+            return None
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._consume())
+        self._pending = [future for future in self._pending if not future.done()]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, summarize, future))
+        self._pending.append(future)
+        return future
+
+    async def _consume(self):
+        while True:
+            text, summarize, future = await self._queue.get()
+            speech = await self._dispatch(text, summarize)
+            if not future.done():
+                future.set_result(speech)
+
+    async def _dispatch(self, text: str, summarize: bool) -> str:
+        """Summarize, then hand the sentence to the speech callback"""
+        if self._cancelled:
+            return ""
+        speech = text
+        if summarize and self._summarizer:
+            try:
+                speech = await self._summarizer(text)
+            except Exception as e:
+                print(f"Summarization error: {e}")
+            if self._cancelled:
+                return ""  # Stopped while the summary was being made
+        print(f"Speaking: {speech}")
+        try:
+            if self._event_loop is asyncio.get_running_loop():
+                spoken = asyncio.ensure_future(self._speech_callback(speech))
+            else:
+                spoken = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._speech_callback(speech), self._event_loop))
+            # Wait briefly for it to be queued (session.say is fast)
+            await asyncio.wait_for(asyncio.shield(spoken), timeout=2.0)
+        except Exception as e:
+            print(f"Speech callback error: {e}")
+        return speech
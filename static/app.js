@@ -323,12 +323,20 @@ function setupRoomEvents(room) {
                 updateStatus('connected');
                 addTranscript('system', 'Agent connected! Start speaking now.');
             }
+        } else if (track.kind === Track.Kind.Video) {
+            // The agent's browser, streamed when it runs without a visible window
+            const container = document.getElementById('browser-video');
+            container.replaceChildren(track.attach());
+            container.classList.add('active');
         }
     });
 
     room.on(RoomEvent.TrackUnsubscribed, (track, publication, participant) => {
         console.log('🔇 Track unsubscribed:', track.kind, 'from:', participant?.identity);
         track.detach().forEach(el => el.remove());
+        if (track.kind === Track.Kind.Video) {
+            document.getElementById('browser-video').classList.remove('active');
+        }
 
         // If we lost audio from a remote participant, agent might have disconnected
         if (track.kind === Track.Kind.Audio && participant &&
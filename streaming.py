@@ -0,0 +1,175 @@
+"""
+Model Turns for the agent loop
+Collects what the model said and did in a turn, from a whole response or a streamed one,
+and plays back recorded responses so streaming can be timed offline
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from google.genai.types import Content, Part
+
+import config
+from cassette import load_response, merge_chunks
+from narration import narrate_calls
+
+# Events produced by StreamedResponse as parts of a streamed response complete
+THOUGHT = "thought"  # Reasoning text (printed, never spoken)
+TEXT = "text"        # The model's explanation for the step
+CALL = "call"        # A complete function call, ready to execute
+
+
+class ModelTurn:
+    """
+    One turn of the agent loop: the model's parts, what was spoken and which actions ran.
+
+    The blocking loop fills it from the finished response; the streaming
+    loop fills it part by part and runs each action as soon as it arrives,
+    so results are already known when the response ends.
+    """
+
+    def __init__(self, content: Optional[Content] = None):
+        self.parts: List[Part] = list(content.parts or []) if content else []
+        self.function_calls = [part.function_call for part in self.parts if part.function_call]
+        self.results: List[Tuple[str, dict]] = []  # (name, result) of each action run during the stream
+        self.spoken: List[Any] = []  # Utterances (futures from the speech pipeline), kept for trajectory replay
+        self.step_text = ""  # Model's explanation for this turn, kept for screenshot placeholders
+        self.last_text = ""
+        self.first_action_after: Optional[float] = None  # Seconds from the request to the first action, when streamed
+        self._narrated = False  # Only the first explanation of a turn is narrated from its actions
+
+    @property
+    def content(self) -> Optional[Content]:
+        return Content(role="model", parts=self.parts) if self.parts else None
+
+    @property
+    def text(self) -> str:
+        """The model's non-thought text, joined"""
+        return " ".join(part.text for part in self.parts if getattr(part, 'text', None) and not getattr(part, 'thought', False))
+
+    def narrate(self, speech, text: str, function_calls: List[Any]):
+        """
+        Speak an explanation: described locally from the turn's actions when we can,
+        otherwise summarized on the speech pipeline while the loop carries on.
+
+        Args:
+            speech: SpeechPipeline or AsyncSpeechPipeline
+            text: Cleaned model text
+            function_calls: The actions it explains (those known so far, when streaming)
+        """
+        narration = None
+        if config.NARRATION_TEMPLATES and function_calls and not self._narrated:
+            narration = narrate_calls(function_calls, text)
+            self._narrated = True
+        utterance = speech.speak(narration) if narration else speech.submit(text)
+        if utterance:
+            self.spoken.append(utterance)
+        self.last_text = text
+        self.step_text = f"{self.step_text} {text}".strip()
+
+
+class StreamedResponse:
+    """
+    Reassembles a streamed response and reports each part once it is complete.
+
+    Text arrives in pieces spread over several chunks, so a run of text is
+    reported (and stored as a single part) when something else follows it,
+    usually the function call it explains, or when the stream ends.
+    Function calls always arrive whole in a single chunk and are reported
+    straight away.
+    """
+
+    def __init__(self):
+        self.parts: List[Part] = []  # The response as it would have arrived unstreamed
+        self._text: List[str] = []
+        self._thought = False
+        self._signature = None
+
+    def feed(self, chunk) -> List[Tuple[str, Any]]:
+        """
+        Add a streamed chunk.
+
+        Returns:
+            (THOUGHT or TEXT, text) and (CALL, function_call) events completed by this chunk
+        """
+        events = []
+        candidates = getattr(chunk, 'candidates', None)
+        content = candidates[0].content if candidates else None
+        for part in (content.parts or []) if content else []:
+            if part.function_call:
+                events.extend(self._flush())
+                self.parts.append(part)
+                events.append((CALL, part.function_call))
+            elif getattr(part, 'text', None):
+                thought = bool(getattr(part, 'thought', False))
+                if self._text and thought != self._thought:
+                    events.extend(self._flush())
+                self._thought = thought
+                self._text.append(part.text)
+                self._signature = self._signature or getattr(part, 'thought_signature', None)
+            else:
+                # e.g. a bare thought signature; kept so the history matches what the model sent
+                events.extend(self._flush())
+                self.parts.append(part)
+        return events
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        """Events for text still buffered when the stream ends"""
+        return self._flush()
+
+    def _flush(self) -> List[Tuple[str, Any]]:
+        if not self._text:
+            return []
+        text, self._text = "".join(self._text), []
+        part = Part(text=text, thought=self._thought or None, thought_signature=self._signature)
+        self._signature = None
+        self.parts.append(part)
+        return [(THOUGHT if part.thought else TEXT, text)]
+
+
+class RecordedModel:
+    """
+    Stand-in for genai.Client that plays back a recorded response with its timing.
+
+    The chunks are one Gemini cassette interaction (see cassette.Cassette),
+    each {"delay": seconds since the previous chunk, "response": response dict}.
+    generate_content waits for the whole recording and returns it as one
+    response; generate_content_stream yields each chunk when it would have
+    arrived. Both the sync and the .aio APIs are provided, so either backend
+    can be timed offline, without an API key.
+    """
+
+    def __init__(self, chunks: List[dict]):
+        self.chunks = chunks
+        self.models = self
+        self.aio = _AsyncRecordedModel(self)
+
+    def generate_content(self, model=None, contents=None, config=None):
+        for chunk in self.chunks:
+            time.sleep(chunk["delay"])
+        return load_response(merge_chunks(self.chunks))
+
+    def generate_content_stream(self, model=None, contents=None, config=None) -> Iterator[Any]:
+        for chunk in self.chunks:
+            time.sleep(chunk["delay"])
+            yield load_response(chunk["response"])
+
+
+class _AsyncRecordedModel:
+    """RecordedModel.aio"""
+
+    def __init__(self, recorded: RecordedModel):
+        self._recorded = recorded
+        self.models = self
+
+    async def generate_content(self, model=None, contents=None, config=None):
+        for chunk in self._recorded.chunks:
+            await asyncio.sleep(chunk["delay"])
+        return load_response(merge_chunks(self._recorded.chunks))
+
+    async def generate_content_stream(self, model=None, contents=None, config=None) -> AsyncIterator[Any]:
+        async def stream():
+            for chunk in self._recorded.chunks:
+                await asyncio.sleep(chunk["delay"])
+                yield load_response(chunk["response"])
+        return stream()
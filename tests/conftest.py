@@ -0,0 +1,60 @@
+"""
+Shared test setup
+Puts the repository root on the import path and builds tiny images in memory
+"""
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_png(width: int, height: int, pixels, color_type: int = 0, filter_type: int = 0) -> bytes:
+    """
+    An 8-bit PNG from raw rows of channel values.
+
+    Every row is stored with filter_type; the values are pre-filtered so
+    the decoder has to undo the filter to get `pixels` back.
+    """
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}[color_type]
+    stride = width * channels
+    raw = bytearray()
+    previous = bytearray(stride)
+    for row in range(height):
+        line = bytearray(pixels[row * stride:(row + 1) * stride])
+        filtered = bytearray(stride)
+        for i in range(stride):
+            left = line[i - channels] if i >= channels else 0
+            up = previous[i]
+            predictor = {0: 0, 1: left, 2: up, 3: (left + up) >> 1}[filter_type]
+            filtered[i] = (line[i] - predictor) & 0xFF
+        raw += bytes([filter_type]) + filtered
+        previous = line
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw))) + chunk(b"IEND", b"")
+
+
+@pytest.fixture
+def png():
+    return make_png
+
+
+@pytest.fixture
+def browser_page():
+    """A headless Chromium page on sync Playwright (skipped where Playwright or its browser isn't installed)"""
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch(headless=True)
+        except Exception as e:
+            pytest.skip(f"Chromium is not available: {e}")
+        page = browser.new_page(viewport={"width": 1440, "height": 900})
+        yield page
+        browser.close()
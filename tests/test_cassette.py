@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.genai")
+
+from cassette import RECORD, REPLAY, Cassette, CassetteClient, CassetteMiss, fingerprint, merge_chunks, model_chunk
+from streaming import RecordedModel
+
+
+def request(text: str, image: bytes = b"\x89PNG", mime_type: str = "image/png"):
+    return [{"role": "user", "parts": [{"text": text}, {"inline_data": {"data": image, "mime_type": mime_type}}]}]
+
+
+def chunk(*texts, delay: float = 0.5):
+    return model_chunk([{"text": text} for text in texts], delay)
+
+
+def texts(response):
+    return [part.text for part in response.candidates[0].content.parts]
+
+
+def test_fingerprint_ignores_image_bytes_but_not_the_request():
+    key = fingerprint("model", request("Bold the title", b"frame one"))
+    assert fingerprint("model", request("Bold the title", b"frame two")) == key
+    assert fingerprint("model", request("Bold the title", mime_type="image/jpeg")) != key
+    assert fingerprint("model", request("Italicize the title")) != key
+    assert fingerprint("other-model", request("Bold the title")) != key
+    assert fingerprint("model", request("Bold the title"), {"temperature": 0}) != key
+
+
+def test_recordings_replay_in_order(tmp_path):
+    recorder = Cassette(str(tmp_path), RECORD, speed=0)
+    key = fingerprint("model", request("Bold the title"))
+    recorder.record(key, "model", [chunk("first")])
+    recorder.record(key, "model", [chunk("second")])
+
+    player = Cassette(str(tmp_path), REPLAY, speed=0)
+    assert player.next(key) == [chunk("first")]
+    assert player.next(key) == [chunk("second")]
+    # Asked more often than recorded: the last answer again
+    assert player.next(key) == [chunk("second")]
+    player.rewind()
+    assert player.next(key) == [chunk("first")]
+    assert player.stats() == {"recorded": 0, "replayed": 4, "misses": 0, "model_seconds": 2.0}
+
+
+def test_a_new_recording_replaces_an_earlier_run(tmp_path):
+    key = fingerprint("model", request("Bold the title"))
+    Cassette(str(tmp_path), RECORD).record(key, "model", [chunk("old run")])
+    Cassette(str(tmp_path), RECORD).record(key, "model", [chunk("new run")])
+    assert Cassette(str(tmp_path), REPLAY).next(key) == [chunk("new run")]
+
+
+def test_an_unrecorded_request_is_a_miss(tmp_path):
+    player = Cassette(str(tmp_path), REPLAY)
+    with pytest.raises(CassetteMiss):
+        player.next(fingerprint("model", request("never asked")))
+    assert player.stats()["misses"] == 1
+
+
+def test_replay_delay_scales_with_speed(tmp_path):
+    assert Cassette(str(tmp_path), REPLAY, speed=1).delay(2.0) == 2.0
+    assert Cassette(str(tmp_path), REPLAY, speed=10).delay(2.0) == pytest.approx(0.2)
+    assert Cassette(str(tmp_path), REPLAY, speed=0).delay(2.0) == 0.0
+
+
+def test_merge_joins_the_parts_of_a_recorded_stream():
+    merged = merge_chunks([chunk("Clicking"), chunk(" Bold", "."), chunk()])
+    assert [part["text"] for part in merged["candidates"][0]["content"]["parts"]] == ["Clicking", " Bold", "."]
+    assert merge_chunks([chunk("only")]) == chunk("only")["response"]
+
+
+def test_an_early_closed_stream_records_what_was_read(tmp_path):
+    recorded = [chunk("Clicking", delay=0), chunk(" Bold", delay=0), chunk(".", delay=0)]
+    recorder = Cassette(str(tmp_path), RECORD)
+    client = CassetteClient(RecordedModel(recorded), recorder)
+    key = fingerprint("model", request("Bold the title"))
+
+    stream = client.models.generate_content_stream(model="model", contents=request("Bold the title"))
+    assert texts(next(stream)) == ["Clicking"]
+    stream.close()  # A cancelled demonstration stops reading
+
+    assert [item["response"] for item in Cassette(str(tmp_path), REPLAY).next(key)] == [recorded[0]["response"]]
+
+
+def test_an_early_closed_async_stream_records_what_was_read(tmp_path):
+    recorded = [chunk("Clicking", delay=0), chunk(" Bold", delay=0)]
+    client = CassetteClient(RecordedModel(recorded), Cassette(str(tmp_path), RECORD))
+
+    async def read_one():
+        stream = await client.aio.models.generate_content_stream(model="model", contents=request("Bold the title"))
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert texts(asyncio.run(read_one())) == ["Clicking"]
+    key = fingerprint("model", request("Bold the title"))
+    assert len(Cassette(str(tmp_path), REPLAY).next(key)) == 1
+
+
+def test_a_recording_replays_through_recorded_model(tmp_path):
+    recorder = Cassette(str(tmp_path), RECORD)
+    client = CassetteClient(RecordedModel([chunk("Clicking", delay=0), chunk(" Bold", delay=0)]), recorder)
+    assert [texts(response) for response in client.models.generate_content_stream(model="model", contents=request("Bold the title"))] == [["Clicking"], [" Bold"]]
+
+    # A cassette interaction is exactly what RecordedModel plays
+    key = fingerprint("model", request("Bold the title"))
+    played = RecordedModel(Cassette(str(tmp_path), REPLAY).next(key))
+    assert texts(played.generate_content()) == ["Clicking", " Bold"]
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.genai")
+
+from google.genai.types import Content, Part
+
+from conversation_history import ConversationHistory, HistoryPolicy, payload_bytes
+
+SCREENSHOT_BYTES = 50_000
+
+
+def policy(**overrides) -> HistoryPolicy:
+    settings = dict(keep_screenshots=2, max_screenshot_bytes=10**9, max_tokens=10**9, keep_turns=1, strip_thoughts=True)
+    settings.update(overrides)
+    return HistoryPolicy(**settings)
+
+
+def screenshot(png, shade: int = 0) -> Part:
+    return Part.from_bytes(data=png(2, 2, [shade] * 4), mime_type="image/png")
+
+
+def full_screenshot() -> Part:
+    """A screenshot as large as a real one (its pixels don't matter to the history)"""
+    return Part.from_bytes(data=b"\x89PNG\r\n\x1a\n" + os.urandom(SCREENSHOT_BYTES), mime_type="image/png")
+
+
+class PayloadRecordingClient:
+    """Stand-in for genai.Client that answers every turn with one click and records each request's upload size"""
+
+    def __init__(self):
+        self.models = self
+        self.payloads = []
+
+    def generate_content(self, model=None, contents=None, config=None):
+        self.payloads.append(payload_bytes(contents))
+        return Content(role="model", parts=[Part(text=f"Clicking, step {len(self.payloads)}")])
+
+
+def run_demo(client: PayloadRecordingClient, history: ConversationHistory, turns: int = 15):
+    """The agent loop's use of the history: prune, send, then add the model's turn and the next screenshot"""
+    history.add_user([Part(text="Make the title bold"), full_screenshot()])
+    for turn in range(turns):
+        history.prune()
+        history.add_model(client.generate_content(contents=history.contents))
+        history.add_user([Part(text="clicked"), full_screenshot()], url="https://docs/d", actions=["click_at"], step_text=f"step {turn}")
+
+
+def test_prune_keeps_only_the_newest_screenshots(png):
+    history = ConversationHistory(policy(keep_screenshots=2))
+    history.add_user([Part(text="Bold the title"), screenshot(png)])
+    for step in range(3):
+        history.add_model(Content(role="model", parts=[Part(text=f"step {step}")]))
+        history.add_user([screenshot(png, step + 1)], url=f"https://docs/{step}", actions=["click_at"], step_text=f"step {step}")
+
+    assert history.prune() > 0
+    assert history.screenshot_count() == 2
+    first, second = history.contents[0].parts[1].text, history.contents[2].parts[0].text
+    assert first.startswith("[Earlier screenshot omitted")
+    assert "https://docs/0" in second and "click_at" in second and "step 0" in second
+    assert history.contents[-1].parts[0].inline_data is not None
+
+
+def test_prune_enforces_the_byte_budget_but_keeps_the_newest(png):
+    history = ConversationHistory(policy(keep_screenshots=10, max_screenshot_bytes=1))
+    history.add_user([Part(text="task"), screenshot(png)])
+    history.add_model(Content(role="model", parts=[Part(text="look")]))
+    history.add_user([screenshot(png, 9)])
+
+    history.prune()
+    assert history.screenshot_count() == 1
+    assert history.contents[-1].parts[0].inline_data is not None
+
+
+def test_upload_size_per_turn_stays_flat():
+    client = PayloadRecordingClient()
+    run_demo(client, ConversationHistory(policy(keep_screenshots=3)))
+    # Once the window is full, each turn drops one screenshot as it adds one; only the short text grows
+    settled = client.payloads[3:]
+    assert max(settled) - min(settled) < SCREENSHOT_BYTES / 10
+    assert client.payloads[-1] < 3 * SCREENSHOT_BYTES + 5000
+
+    unbounded = PayloadRecordingClient()
+    run_demo(unbounded, ConversationHistory(policy(keep_screenshots=100)))
+    assert unbounded.payloads[-1] > 14 * SCREENSHOT_BYTES
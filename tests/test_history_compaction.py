@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.genai")
+
+from google.genai.types import Content, Part
+
+from conversation_history import HINT_PREFIX, IMAGE_TILE_TOKENS, ConversationHistory, HistoryPolicy, image_tokens
+
+
+def policy(**overrides) -> HistoryPolicy:
+    settings = dict(keep_screenshots=2, max_screenshot_bytes=10**9, max_tokens=10**9, keep_turns=1, strip_thoughts=True)
+    settings.update(overrides)
+    return HistoryPolicy(**settings)
+
+
+def texts(history: ConversationHistory):
+    return [[part.text for part in content.parts if part.text] for content in history.contents]
+
+
+def test_a_repeated_hint_is_only_kept_on_its_latest_turn():
+    hint = f"{HINT_PREFIX} Try the keyboard"
+    history = ConversationHistory(policy())
+    history.add_user([Part(text="task")])
+    for step in range(2):
+        history.add_model(Content(role="model", parts=[Part(text=f"step {step}")]))
+        history.add_user([Part(text="clicked"), Part(text=hint)])
+
+    assert texts(history)[2] == ["clicked"]
+    assert texts(history)[4] == ["clicked", hint]
+
+
+def test_repeated_text_that_is_not_a_hint_is_kept():
+    history = ConversationHistory(policy())
+    history.add_user([Part(text="task")])
+    for step in range(2):
+        history.add_model(Content(role="model", parts=[Part(text=f"step {step}")]))
+        history.add_user([Part(text="clicked"), Part(text="Cell A1 selected")])
+
+    assert texts(history)[2] == texts(history)[4] == ["clicked", "Cell A1 selected"]
+
+
+def test_compact_folds_the_oldest_steps_into_a_summary():
+    history = ConversationHistory(policy(max_tokens=200, keep_turns=2))
+    history.add_user([Part(text="Make the title bold")])
+    for step in range(6):
+        history.add_model(Content(role="model", parts=[Part(text=f"Clicking the title, step {step}")]))
+        history.add_user([Part(text="x" * 200)], url="https://docs/d", actions=["click_at"], step_text=f"Step {step}")
+
+    folded = history.compact()
+    assert folded == history.folded_steps == 4
+    assert sum(1 for content in history.contents if content.role == "model") == 2
+    task = texts(history)[0]
+    assert task[0] == "Make the title bold"
+    assert task[1].startswith("[Steps already taken")
+    assert "Step 0" in task[1] and "Step 3" in task[1] and "Step 4" not in task[1]
+
+
+def test_thought_summaries_are_not_resent():
+    history = ConversationHistory(policy(strip_thoughts=True))
+    history.add_model(Content(role="model", parts=[Part(text="thinking", thought=True), Part(text="Click Bold")]))
+    assert texts(history) == [["Click Bold"]]
+
+
+def test_image_tokens_follow_the_tile_size(png):
+    assert image_tokens(png(300, 200, [0] * 60000)) == IMAGE_TILE_TOKENS
+    assert image_tokens(png(1440, 900, [0] * 1296000)) == 2 * 2 * IMAGE_TILE_TOKENS
@@ -0,0 +1,145 @@
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from request_router import BLOCK, CACHED, CONTINUE, FETCH, AssetCache, RequestRouter, RoutingRules
+
+DOC_PAGE = b"""<!doctype html>
+<html>
+  <head><link rel="stylesheet" href="/static/docs.css"><script src="/static/docs.js"></script></head>
+  <body>
+    <div id="editor">Untitled document</div>
+    <img src="/gen_204?atyp=i">
+    <img src="http://localhost:%d/pixel.gif">
+  </body>
+</html>"""
+
+
+class FakeDocsHandler(BaseHTTPRequestHandler):
+    """A Docs stand-in: an editor page, versioned static assets, a beacon and a telemetry host"""
+
+    hits = Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path == "/document":
+            self._send(200, "text/html", DOC_PAGE % self.server.server_port, "no-cache")
+        elif self.path == "/static/docs.js":
+            self._send(200, "application/javascript", b"window.loaded = true;", "public, max-age=86400")
+        elif self.path == "/static/docs.css":
+            self._send(200, "text/css", b"#editor { color: #202124; }", "public, immutable")
+        else:
+            self._send(204, "text/plain", b"", "no-store")
+
+    def _send(self, status, content_type, body, cache_control):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def docs_server():
+    FakeDocsHandler.hits = Counter()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDocsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def router(tmp_path, **rules) -> RequestRouter:
+    rules.setdefault("block", ["*/gen_204*", "localhost"])
+    rules.setdefault("allow", [])
+    rules.setdefault("block_types", [])
+    cache = AssetCache(str(tmp_path / "assets"), max_bytes=10**6, min_max_age=3600)
+    return RequestRouter(RoutingRules(**rules), cache, enabled=True)
+
+
+def request(url: str, resource_type: str = "script", method: str = "GET"):
+    return SimpleNamespace(url=url, resource_type=resource_type, method=method)
+
+
+def test_allow_rules_win_over_block_rules():
+    rules = RoutingRules(block=["*.doubleclick.net", "*/gen_204*"], allow=["*/gen_204?keep*"], block_types=["font"])
+    assert rules.blocks("https://ad.doubleclick.net/pixel", "image")
+    assert rules.blocks("https://doubleclick.net/pixel", "image")
+    assert rules.blocks("https://docs.google.com/gen_204?atyp=i", "image")
+    assert not rules.blocks("https://docs.google.com/gen_204?keep=1", "image")
+    assert rules.blocks("https://fonts.gstatic.com/s/roboto.woff2", "font")
+    assert not rules.blocks("https://docs.google.com/document/d/1", "document")
+
+
+def test_only_long_lived_responses_are_cached(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=10**6, min_max_age=3600)
+    assert cache.store("https://x/a.js", 200, {"cache-control": "max-age=86400"}, b"a")
+    assert not cache.store("https://x/b.js", 200, {"cache-control": "max-age=60"}, b"b")
+    assert not cache.store("https://x/c.js", 200, {"cache-control": "no-store, max-age=86400"}, b"c")
+    assert not cache.store("https://x/d.js", 404, {"cache-control": "max-age=86400"}, b"d")
+    assert cache.lookup("https://x/a.js")["body"] == b"a"
+    assert cache.lookup("https://x/b.js") is None
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=10**6, min_max_age=0)
+    for url in ("https://x/v1/app.js", "https://x/v2/app.js"):
+        cache.store(url, 200, {"cache-control": "immutable"}, b"same bytes")
+    assert len(cache._files("objects")) == 1
+    assert cache.lookup("https://x/v2/app.js")["body"] == b"same bytes"
+
+
+def test_a_damaged_body_is_a_miss(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=10**6, min_max_age=0)
+    cache.store("https://x/app.js", 200, {"cache-control": "immutable"}, b"original")
+    with open(cache._files("objects")[0], "wb") as f:
+        f.write(b"corrupted")
+    assert cache.lookup("https://x/app.js") is None
+
+
+def test_decide(tmp_path):
+    routing = router(tmp_path)
+    assert routing.decide(request("http://127.0.0.1/gen_204?a=1", "image"))[0] == BLOCK
+    assert routing.decide(request("http://localhost/pixel.gif", "image"))[0] == BLOCK
+    assert routing.decide(request("http://127.0.0.1/document", "document"))[0] == CONTINUE
+    assert routing.decide(request("http://127.0.0.1/save", "script", "POST"))[0] == CONTINUE
+    assert routing.decide(request("http://127.0.0.1/static/docs.js"))[0] == FETCH
+    routing.cache.store("http://127.0.0.1/static/docs.js", 200, {"cache-control": "max-age=86400"}, b"js")
+    action, entry = routing.decide(request("http://127.0.0.1/static/docs.js"))
+    assert action == CACHED and entry["body"] == b"js"
+
+
+def test_routing_against_a_local_docs_server(browser_page, docs_server, tmp_path):
+    routing = router(tmp_path)
+    routing.install(browser_page.context)
+    document_url = f"http://127.0.0.1:{docs_server.server_port}/document"
+
+    browser_page.goto(document_url)
+    assert browser_page.evaluate("window.loaded") is True
+    # The beacon and the telemetry host never reach the network
+    assert FakeDocsHandler.hits["/gen_204?atyp=i"] == 0
+    assert FakeDocsHandler.hits["/pixel.gif"] == 0
+    assert FakeDocsHandler.hits["/static/docs.js"] == 1
+
+    browser_page.goto(document_url)
+    assert browser_page.evaluate("window.loaded") is True
+    # Static assets came from the local cache the second time; the page itself didn't
+    assert FakeDocsHandler.hits["/static/docs.js"] == 1
+    assert FakeDocsHandler.hits["/static/docs.css"] == 1
+    assert FakeDocsHandler.hits["/document"] == 2
+
+    stats = routing.stats()
+    assert stats["127.0.0.1"]["blocked"] == 2 and stats["localhost"]["blocked"] == 2
+    assert stats["127.0.0.1"]["cache_hits"] == 2
+    assert stats["127.0.0.1"]["bytes"] > 0 and stats["127.0.0.1"]["time_ms"] > 0
+    assert routing.totals()["cached_bytes"] == len(b"window.loaded = true;") + len(b"#editor { color: #202124; }")
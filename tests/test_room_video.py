@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import io
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("livekit.rtc")
+Image = pytest.importorskip("PIL.Image")
+os.environ.setdefault("GOOGLE_API_KEY", "unused")  # browser_controller creates a client at import
+
+from livekit import api, rtc
+
+import config
+from async_browser_controller import AsyncBrowserAutomation
+from room_video import TRACK_NAME, BrowserVideoPublisher
+
+# Keys livekit-server --dev accepts
+DEV_KEY, DEV_SECRET = "devkey", "secret"
+
+
+def publisher(**overrides) -> BrowserVideoPublisher:
+    settings = dict(max_fps=15, min_fps=5, width=1280, min_width=640, quality=70, keepalive=0.2, cpu_budget=0.25)
+    settings.update(overrides)
+    return BrowserVideoPublisher(**settings)
+
+
+def jpeg(color) -> str:
+    """A screencast frame as Chromium sends it: base64 JPEG"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 40), color).save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class CapturingSource:
+    """Stand-in for rtc.VideoSource that keeps what was published"""
+
+    def __init__(self):
+        self.frames = []
+
+    def capture_frame(self, frame):
+        self.frames.append(frame)
+
+
+def test_a_frame_not_yet_published_is_replaced():
+    video = publisher()
+    video._offer("first")
+    video._offer("second")
+    assert video._mailbox == "second"
+    assert (video._stats["received"], video._stats["dropped"]) == (2, 1)
+
+
+def test_overload_lowers_frame_rate_before_resolution():
+    video = publisher()
+    for _ in range(3):
+        video._window = {"cpu": 0.5, "late": 0, "frames": 10}
+        video._adapt(1.0)
+    assert video.fps == 5 and video.width == 1280 and video._restart is None
+    video._window = {"cpu": 0.5, "late": 0, "frames": 10}
+    video._adapt(1.0)
+    assert video.width == 960 and video._restart["maxWidth"] == 960
+
+
+def test_headroom_restores_resolution_before_frame_rate():
+    video = publisher()
+    video.fps, video.width = 5, 720
+    video._window = {"cpu": 0.0, "late": 0, "frames": 10}
+    video._adapt(1.0)
+    assert (video.fps, video.width) == (5, 960)
+    for _ in range(2):
+        video._window = {"cpu": 0.0, "late": 0, "frames": 10}
+        video._adapt(1.0)
+    assert video.width == 1280 and video.fps == 7.5
+
+
+def test_late_frames_count_as_overload():
+    video = publisher()
+    video._window = {"cpu": 0.0, "late": 5, "frames": 10}
+    video._adapt(1.0)
+    assert video.fps == 10
+
+
+def test_identical_frames_are_skipped_and_the_last_one_kept_alive():
+    async def run():
+        video = publisher(keepalive=0.2)
+        video._source = CapturingSource()
+        task = asyncio.create_task(video._publish_frames())
+        for data in (jpeg("white"), jpeg("white"), jpeg("black")):
+            video._offer(data)
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.35)
+        task.cancel()
+        return video
+
+    video = asyncio.run(run())
+    assert video._stats["published"] == 2 and video._stats["idle"] == 1
+    assert video._stats["keepalive"] >= 1
+    assert len(video._source.frames) == 2 + video._stats["keepalive"]
+
+
+@pytest.fixture
+def livekit_server():
+    """A local livekit-server in dev mode (skipped where the binary isn't installed)"""
+    binary = shutil.which("livekit-server")
+    if not binary:
+        pytest.skip("livekit-server is not installed")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [binary, "--dev", "--bind", "127.0.0.1", "--port", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                pytest.skip("livekit-server did not start")
+            time.sleep(0.1)
+    yield f"ws://127.0.0.1:{port}"
+    process.terminate()
+    process.wait(timeout=10)
+
+
+def token(identity: str, room: str) -> str:
+    grants = api.VideoGrants(room_join=True, room=room)
+    return api.AccessToken(DEV_KEY, DEV_SECRET).with_identity(identity).with_grants(grants).to_jwt()
+
+
+def test_the_page_is_streamed_to_a_local_livekit_server(livekit_server, monkeypatch):
+    async_api = pytest.importorskip("playwright.async_api")
+    monkeypatch.setattr(config, "BROWSER_VIDEO", True)
+
+    async def run():
+        async with async_api.async_playwright() as playwright:
+            try:
+                browser = await playwright.chromium.launch(headless=True)
+            except Exception as e:
+                pytest.skip(f"Chromium is not available: {e}")
+            page = await browser.new_page(viewport={"width": 1440, "height": 900})
+            await page.set_content("<div contenteditable style='height: 600px'>Untitled document</div>")
+            automation = AsyncBrowserAutomation()
+            automation.page = page
+
+            learner, agent = rtc.Room(), rtc.Room()
+            received = asyncio.Event()
+            subscribed = {}
+            readers = []
+
+            @learner.on("track_subscribed")
+            def on_track(track, publication, participant):
+                subscribed["name"] = publication.name
+
+                async def read():
+                    async for event in rtc.VideoStream(track):
+                        subscribed["size"] = (event.frame.width, event.frame.height)
+                        received.set()
+                readers.append(asyncio.ensure_future(read()))
+
+            await learner.connect(livekit_server, token("learner", "lesson"))
+            await agent.connect(livekit_server, token("docbot", "lesson"))
+            video = publisher(width=960)
+            try:
+                assert await video.start(agent, automation)
+                await page.keyboard.type(" and some typing")  # Repaint, so Chromium sends a frame
+                await asyncio.wait_for(received.wait(), timeout=20)
+            finally:
+                await video.aclose()
+                for reader in readers:
+                    reader.cancel()
+                await learner.disconnect()
+                await agent.disconnect()
+                await browser.close()
+            return video, subscribed
+
+    video, subscribed = asyncio.run(run())
+    assert subscribed["name"] == TRACK_NAME
+    assert subscribed["size"][0] <= 960
+    assert video.stats()["published"] >= 1
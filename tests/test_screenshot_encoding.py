@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import struct
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from screenshot_encoding import ScreenshotEncoder, decode_png_gray, fingerprint_distance, image_size
+
+
+class FakeCdpSession:
+    """Answers Page.getLayoutMetrics with a scrolled viewport and records the screenshot requests"""
+
+    def __init__(self, scroll_x: float, scroll_y: float):
+        self.scroll = {"pageX": scroll_x, "pageY": scroll_y}
+        self.captures = []
+
+    def send(self, method: str, params: dict = None):
+        if method == "Page.getLayoutMetrics":
+            return {"cssVisualViewport": dict(self.scroll, clientWidth=1440, clientHeight=900)}
+        self.captures.append(params)
+        return {"data": base64.b64encode(b"frame").decode()}
+
+
+class FakeAsyncCdpSession(FakeCdpSession):
+    async def send(self, method: str, params: dict = None):
+        return FakeCdpSession.send(self, method, params)
+
+
+class FakePage:
+    viewport_size = {"width": 1440, "height": 900}
+
+    def __init__(self, session):
+        self.context = self
+        self._session = session
+
+    def new_cdp_session(self, page):
+        return self._session
+
+    def on(self, event, handler):
+        pass
+
+
+class FakeAsyncPage(FakePage):
+    async def new_cdp_session(self, page):
+        return self._session
+
+
+def test_cdp_capture_clips_the_scrolled_viewport():
+    session = FakeCdpSession(0, 1200)
+    encoder = ScreenshotEncoder(format="webp", quality=70, scale=0.5, tier="")
+    assert encoder.capture(FakePage(session)) == b"frame"
+    clip = session.captures[-1]["clip"]
+    assert (clip["x"], clip["y"], clip["width"], clip["height"], clip["scale"]) == (0, 1200, 1440, 900, 0.5)
+    assert session.captures[-1]["quality"] == 70
+
+
+def test_async_cdp_capture_clips_the_scrolled_viewport():
+    session = FakeAsyncCdpSession(40, 300)
+    encoder = ScreenshotEncoder(format="png", scale=0.75, tier="")
+    asyncio.run(encoder.capture_async(FakeAsyncPage(session)))
+    clip = session.captures[-1]["clip"]
+    assert (clip["x"], clip["y"]) == (40, 300)
+    assert "quality" not in session.captures[-1]
+
+
+def test_frame_size_follows_the_scale():
+    assert ScreenshotEncoder(format="jpeg", scale=0.5, tier="").frame_size(1440, 900) == (720, 450)
+
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(ValueError):
+        ScreenshotEncoder(format="gif", tier="")
+    with pytest.raises(ValueError):
+        ScreenshotEncoder(format="png", scale=1.5, tier="")
+    with pytest.raises(ValueError):
+        ScreenshotEncoder(tier="ultra")
+
+
+@pytest.mark.parametrize("filter_type", [0, 1, 2, 3])
+def test_decode_png_gray_undoes_row_filters(png, filter_type):
+    pixels = [0, 64, 128, 255, 10, 20, 30, 40, 200, 150, 100, 50]
+    width, height, gray = decode_png_gray(png(4, 3, pixels, filter_type=filter_type))
+    assert (width, height) == (4, 3)
+    assert gray == pixels
+
+
+def test_decode_png_gray_converts_rgb_to_luminance(png):
+    pixels = [255, 0, 0, 0, 255, 0, 0, 0, 255, 255, 255, 255]
+    _, _, gray = decode_png_gray(png(2, 2, pixels, color_type=2, filter_type=1))
+    assert gray == [76, 149, 29, 255]
+
+
+def test_decode_png_gray_rejects_other_formats():
+    with pytest.raises(ValueError):
+        decode_png_gray(b"\xff\xd8\xff\xe0not a png")
+
+
+def test_image_size_reads_png_header(png):
+    assert image_size(png(7, 5, [0] * 35)) == (7, 5)
+
+
+def test_image_size_reads_jpeg_start_of_frame():
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    sof0 = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 900, 1440) + bytes(10)
+    assert image_size(b"\xff\xd8" + app0 + sof0) == (1440, 900)
+
+
+def test_image_size_reads_webp_vp8x():
+    header = b"RIFF" + bytes(4) + b"WEBP" + b"VP8X" + bytes(8)
+    data = header + (1279).to_bytes(3, "little") + (799).to_bytes(3, "little")
+    assert image_size(data) == (1280, 800)
+
+
+def test_image_size_of_unknown_data_is_none():
+    assert image_size(b"GIF89a" + bytes(20)) is None
+
+
+def test_fingerprint_distance():
+    assert fingerprint_distance([0, 255], [0, 255]) == 0.0
+    assert fingerprint_distance([0, 0], [255, 255]) == 1.0
+    assert fingerprint_distance([0, 0], [0, 51]) == pytest.approx(0.1)
+    assert fingerprint_distance([0], [0, 0]) == 1.0
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.genai")
+
+from google.genai.types import Content, Part
+
+from conversation_history import SNAPSHOT_PLACEHOLDER, SNAPSHOT_PREFIX, ConversationHistory, HistoryPolicy
+from ui_snapshot import UiObserver
+
+
+class ScriptedPage:
+    """A page whose snapshot script returns the given deltas in turn"""
+
+    def __init__(self, *deltas, url="https://docs.google.com/document/d/1"):
+        self.deltas = list(deltas)
+        self.url = url
+        self.handlers = {}
+
+    def evaluate(self, script, max_elements):
+        return self.deltas.pop(0)
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+
+def delta(changed=(), removed=(), total=None, fresh=False, focused=None):
+    changed = [[element_id, json.dumps(element)] for element_id, element in changed]
+    total = len(changed) if total is None else total
+    return {"fresh": fresh, "changed": changed, "removed": list(removed), "total": total, "title": "Untitled document", "focused": focused}
+
+
+BOLD = (1, ["button", "Bold (Ctrl+B)", "", [400, 60, 420, 80]])
+ITALIC = (2, ["button", "Italic (Ctrl+I)", "", [420, 60, 440, 80]])
+FILE_MENU = (3, ["menuitem", "File", "", [10, 30, 40, 45]])
+
+
+def test_screenshots_come_with_fresh_pages_and_big_changes_only():
+    observer = UiObserver(mode="auto", max_elements=100, change_threshold=0.5, max_text_turns=10)
+    page = ScriptedPage(
+        delta([BOLD, ITALIC, FILE_MENU], fresh=True),
+        delta([(1, ["button", "Bold (Ctrl+B)", "pressed", [400, 60, 420, 80]])], total=3),
+        delta([], removed=[1, 2], total=1),
+    )
+    assert observer.observe(page).screenshot
+    small = observer.observe(page)
+    assert not small.screenshot and small.changed == pytest.approx(1 / 3)
+    assert 'button "Bold (Ctrl+B)" (pressed) [400,60,420,80]' in small.text
+    large = observer.observe(page)
+    assert large.screenshot and "Bold" not in large.text and 'menuitem "File"' in large.text
+
+
+def test_snapshot_lists_controls_in_reading_order():
+    observer = UiObserver(mode="both", max_elements=100, change_threshold=0.5, max_text_turns=10)
+    observation = observer.observe(ScriptedPage(delta([ITALIC, BOLD, FILE_MENU], fresh=True, focused=["textbox", "Document content"])))
+    lines = observation.text.splitlines()
+    assert lines[0] == f"{SNAPSHOT_PREFIX}: Untitled document at https://docs.google.com/document/d/1]"
+    assert lines[1] == 'Focused: textbox "Document content"'
+    assert [line.split('"')[1] for line in lines[2:]] == ["File", "Bold (Ctrl+B)", "Italic (Ctrl+I)"]
+
+
+def test_a_screenshot_is_forced_after_too_many_text_only_turns():
+    observer = UiObserver(mode="auto", max_elements=100, change_threshold=0.5, max_text_turns=2)
+    page = ScriptedPage(delta([BOLD], fresh=True), *[delta([], total=1) for _ in range(3)])
+    assert [observer.observe(page).screenshot for _ in range(4)] == [True, False, False, True]
+
+
+def test_a_closed_page_is_forgotten():
+    observer = UiObserver(mode="auto", max_elements=100, change_threshold=0.5, max_text_turns=10)
+    page = ScriptedPage(delta([BOLD], fresh=True))
+    observer.observe(page)
+    page.handlers["close"](page)
+    assert id(page) not in observer._elements
+
+
+def test_screenshot_mode_never_snapshots():
+    observer = UiObserver(mode="screenshot")
+    observation = observer.observe(ScriptedPage())
+    assert observation.screenshot and observation.text is None
+
+
+def test_only_the_newest_ui_snapshot_is_sent_in_full():
+    history = ConversationHistory(HistoryPolicy(keep_screenshots=2, max_screenshot_bytes=10**9, max_tokens=10**9, keep_turns=1, strip_thoughts=True))
+    history.add_user([Part(text="task"), Part(text=f"{SNAPSHOT_PREFIX}: doc]\nold")])
+    history.add_model(Content(role="model", parts=[Part(text="look")]))
+    history.add_user([Part(text=f"{SNAPSHOT_PREFIX}: doc]\nnew")])
+
+    texts = [[part.text for part in content.parts if part.text] for content in history.contents]
+    assert texts[0] == ["task", SNAPSHOT_PLACEHOLDER]
+    assert texts[-1] == [f"{SNAPSHOT_PREFIX}: doc]\nnew"]
@@ -0,0 +1,264 @@
+"""
+Latency Tracing for demonstrations
+Records timed spans for every turn of the agent loop to a rotating JSONL file
+and aggregates them into percentiles
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+import config
+
+# Span names recorded by the agent loop
+DEMO = "demo"                      # A whole demonstration
+TURN = "turn"                      # One model turn: request, actions, screenshot
+MODEL_REQUEST = "model_request"    # The Gemini computer-use call (attrs: payload_bytes, token counts)
+THINKING = "thinking"              # Streamed responses only: request until the first non-thought part
+SPEECH_SUMMARY = "speech_summary"  # Gemini Flash summarization on the speech stage
+ACTION = "action"                  # The page operations of one function call
+SETTLE = "settle"                  # Waiting for the UI to settle after an action
+SCREENSHOT = "screenshot"          # Capturing and encoding a screenshot (attrs: bytes)
+UI_SNAPSHOT = "ui_snapshot"        # Extracting the text snapshot of the UI (attrs: changed, screenshot)
+REPLAY = "replay"                  # Replaying a recorded demonstration
+
+# Trace of the demonstration running in the current thread or task
+_current: contextvars.ContextVar[Optional["DemoTrace"]] = contextvars.ContextVar("docbot_trace", default=None)
+
+
+class DemoTrace:
+    """
+    Spans of one demonstration.
+
+    Spans are written as they end, one JSON line each, tagged with the
+    demonstration ID and the current turn. Spans may end on other threads
+    (the speech stage), so nothing here relies on being on the loop's thread.
+    """
+
+    def __init__(self, tracer: "Tracer", task: str, **attrs):
+        self.tracer = tracer
+        self.id = uuid.uuid4().hex[:12]
+        self.task = task
+        self.attrs = attrs
+        self.turn = 0
+        self.started = time.monotonic()
+        self._turn_started: Optional[float] = None
+        self._totals: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Time a block; the yielded dict can take attributes known only at the end"""
+        started = time.monotonic()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, started, **attrs)
+
+    def record(self, name: str, started: float, ended: Optional[float] = None, **attrs):
+        """Record a span that started at the given time.monotonic() value"""
+        ended = time.monotonic() if ended is None else ended
+        duration_ms = (ended - started) * 1000
+        with self._lock:
+            self._totals[name] += duration_ms
+        self.tracer.emit({
+            "demo": self.id,
+            "turn": self.turn,
+            "span": name,
+            "start_ms": round((started - self.started) * 1000, 1),
+            "duration_ms": round(duration_ms, 1),
+            **attrs,
+        })
+
+    def timed(self, name: str, fn: Callable) -> Callable:
+        """Wrap a function (e.g. the speech summarizer) so every call becomes a span"""
+        def wrapper(*args, **kwargs):
+            with self.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def timed_async(self, name: str, fn: Callable) -> Callable:
+        """timed() for coroutine functions"""
+        async def wrapper(*args, **kwargs):
+            with self.span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    def begin_turn(self, turn: int):
+        """Close the previous turn's span and start the next"""
+        self._end_turn()
+        self.turn = turn
+        self._turn_started = time.monotonic()
+
+    def finish(self, **attrs):
+        """Close the last turn, record the whole demonstration and print where its time went"""
+        self._end_turn()
+        self.record(DEMO, self.started, task=self.task, turns=self.turn, **self.attrs, **attrs)
+        with self._lock:
+            totals = {name: ms for name, ms in self._totals.items() if name not in (DEMO, TURN)}
+        breakdown = ", ".join(f"{name} {ms / 1000:.1f}s" for name, ms in sorted(totals.items(), key=lambda item: -item[1]))
+        print(f"⏱️ Demonstration took {time.monotonic() - self.started:.1f}s over {self.turn} turn(s): {breakdown or 'no spans'}")
+
+    def _end_turn(self):
+        if self._turn_started is not None:
+            self.record(TURN, self._turn_started)
+            self._turn_started = None
+
+
+class Tracer:
+    """
+    Writes spans to a rotating JSONL file and keeps recent durations in memory.
+
+    The file rotates at TRACE_MAX_BYTES and keeps TRACE_BACKUPS old files,
+    so tracing can stay on in production. The in-memory window (the last
+    TRACE_WINDOW durations per span name) backs percentiles() without
+    rereading the file.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None, backups: Optional[int] = None, window: Optional[int] = None, enabled: Optional[bool] = None):
+        self.path = config.TRACE_PATH if path is None else path
+        self.max_bytes = config.TRACE_MAX_BYTES if max_bytes is None else max_bytes
+        self.backups = config.TRACE_BACKUPS if backups is None else backups
+        self.window = config.TRACE_WINDOW if window is None else window
+        self.enabled = config.TRACE_ENABLED if enabled is None else enabled
+        self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+        self._logger: Optional[logging.Logger] = None
+
+    def start_demo(self, task: str, **attrs) -> Optional[DemoTrace]:
+        """A new demonstration trace, or None when tracing is off"""
+        return DemoTrace(self, task, **attrs) if self.enabled else None
+
+    def emit(self, record: Dict[str, Any]):
+        with self._lock:
+            self._durations[record["span"]].append(record["duration_ms"])
+        logger = self._file_logger()
+        if logger:
+            logger.info(json.dumps(record, default=str))
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles of the recent spans recorded by this process"""
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+        return summarize(durations)
+
+    def reset(self):
+        """Forget the in-memory durations (the trace file is left alone)"""
+        with self._lock:
+            self._durations.clear()
+
+    def _file_logger(self) -> Optional[logging.Logger]:
+        if not self.path:
+            return None
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger = logging.getLogger(f"docbot.trace.{self.path}")
+                    logger.setLevel(logging.INFO)
+                    logger.propagate = False  # Spans go to the trace file only, not the console
+                    logger.addHandler(handler)
+                    self._logger = logger
+        return self._logger
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(len(ordered) * fraction)) - 1))]
+
+
+def summarize(durations: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """count, mean, p50, p95, p99 and max in milliseconds for each span name"""
+    summary = {}
+    for name, values in sorted(durations.items()):
+        if not values:
+            continue
+        summary[name] = {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 1),
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "max_ms": max(values),
+        }
+    return summary
+
+
+def read_spans(path: Optional[str] = None, limit: Optional[int] = None) -> Iterable[Dict[str, Any]]:
+    """
+    Spans from a trace file and its rotated backups, newest last.
+
+    Args:
+        path: Trace file (default: TRACE_PATH)
+        limit: Only the most recent spans
+    """
+    path = path or config.TRACE_PATH
+    files = [f"{path}.{index}" for index in range(config.TRACE_BACKUPS, 0, -1)] + [path]
+    spans: Deque[Dict[str, Any]] = deque(maxlen=limit)
+    for file_path in files:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        pass  # A line cut short by a crash or a rotation
+        except FileNotFoundError:
+            continue
+    return spans
+
+
+def trace_percentiles(path: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """Percentiles per span name over the most recent spans in a trace file (readable from another process)"""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for span in read_spans(path, limit or config.TRACE_WINDOW * 20):
+        if "span" in span and "duration_ms" in span:
+            durations[span["span"]].append(span["duration_ms"])
+    return summarize(durations)
+
+
+def activate(trace: Optional[DemoTrace]) -> contextvars.Token:
+    """Make a trace current for the calling thread or task (undo with deactivate)"""
+    return _current.set(trace)
+
+
+def deactivate(token: contextvars.Token):
+    _current.reset(token)
+
+
+def current_trace() -> Optional[DemoTrace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """Time a block as part of the current demonstration; a no-op outside one"""
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    with trace.span(name, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def record_since(name: str, started: float, **attrs):
+    """Record a span of the current demonstration that started at a time.monotonic() value"""
+    trace = _current.get()
+    if trace is not None:
+        trace.record(name, started, **attrs)
+
+
+# Tracer shared by every demonstration in the worker process
+tracer = Tracer()
@@ -0,0 +1,115 @@
+"""
+Trajectory Store for repeated demonstrations
+Records successful action sequences so common lessons can be replayed locally
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import config
+
+
+def task_key(task: str) -> str:
+    """Normalize a task so trivially different phrasings share a trajectory"""
+    words = re.sub(r"[^a-z0-9\s]", " ", task.lower()).split()
+    return " ".join(words)
+
+
+class TrajectoryRecorder:
+    """Collects the steps of one demonstration as it runs"""
+
+    def __init__(self, task: str, key: Optional[str] = None):
+        self.task = task
+        self.key = key or task_key(task)
+        self.steps: List[Dict[str, Any]] = []
+        self.failed = False
+
+    def add_step(self, url: str, fingerprint: List[int], speech: List[str], function_calls: List[Any]):
+        """
+        Record one model turn.
+
+        Args:
+            url: Page URL the model was looking at
+            fingerprint: Thumbnail of the frame the model was looking at
+            speech: Utterances spoken for this step (strings, or futures resolving to them)
+            function_calls: The FunctionCall objects (or {"name", "args"} dicts) executed
+        """
+        calls = []
+        for call in function_calls:
+            name = call["name"] if isinstance(call, dict) else call.name
+            args = dict(call["args"] if isinstance(call, dict) else (call.args or {}))
+            # Safety decisions are per-run confirmations, not part of the lesson
+            args.pop("safety_decision", None)
+            calls.append({"name": name, "args": args})
+        self.steps.append({
+            "url": url,
+            "fingerprint": fingerprint,
+            "speech": list(speech),
+            "calls": calls,
+        })
+
+    def mark_failed(self):
+        """Don't save this run (an action errored or the run was cut short)"""
+        self.failed = True
+
+    def to_dict(self, final_fingerprint: List[int], final_message: str) -> Dict[str, Any]:
+        """Serializable trajectory"""
+        steps = [
+            dict(step, speech=[item.result() if isinstance(item, (Future, asyncio.Future)) else item for item in step["speech"]])
+            for step in self.steps
+        ]
+        return {
+            "task": self.task,
+            "key": self.key,
+            "steps": steps,
+            "final_fingerprint": final_fingerprint,
+            "final_message": final_message,
+            "recorded_at": time.time(),
+        }
+
+
+class TrajectoryStore:
+    """On-disk store of recorded trajectories, one JSON file per task key"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or config.TRAJECTORY_DIR
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load the trajectory for a task key, if one was recorded"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                trajectory = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable trajectory {path}: {e}")
+            return None
+        # Hash collisions are practically impossible, but never replay the wrong lesson
+        if trajectory.get("key") != key or not trajectory.get("steps"):
+            return None
+        return trajectory
+
+    def save(self, trajectory: Dict[str, Any]):
+        """Atomically write a trajectory, replacing any previous recording"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(trajectory["key"])
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(trajectory, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,218 @@
+"""
+UI Settle Detection for browser actions
+Waits until the page stops changing after an action instead of sleeping a fixed time
+"""
+import asyncio
+import time
+from typing import Optional
+
+import config
+from screenshot_encoding import ScreenshotEncoder, fingerprint_distance
+
+# Installed once per document (and re-installed by the init script after navigations).
+# Tracks the time of the last DOM mutation and the fetch/XHR requests in flight.
+SETTLE_PROBE_JS = """
+(() => {
+    if (window.__docbotSettle) return;
+    const state = window.__docbotSettle = { lastChange: performance.now(), inflight: new Map(), nextId: 0 };
+    const touch = () => { state.lastChange = performance.now(); };
+    const start = () => { const id = state.nextId++; state.inflight.set(id, performance.now()); return id; };
+    const finish = (id) => { state.inflight.delete(id); touch(); };
+
+    const observe = () => new MutationObserver(touch).observe(document.documentElement || document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+    if (document.documentElement) observe(); else document.addEventListener('DOMContentLoaded', observe);
+
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (...args) {
+            const id = start();
+            return originalFetch.apply(this, args).finally(() => finish(id));
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        const id = start();
+        this.addEventListener('loadend', () => finish(id), { once: true });
+        return originalSend.apply(this, args);
+    };
+})();
+"""
+
+# True once the DOM has been quiet for quietMs and no recent request is still in flight.
+# Requests older than requestWindowMs are ignored: Docs keeps long-polling channels open forever.
+SETTLED_JS = """
+([quietMs, requestWindowMs]) => {
+    const state = window.__docbotSettle;
+    if (!state) return true;
+    const now = performance.now();
+    for (const started of state.inflight.values()) {
+        if (now - started < requestWindowMs) return false;
+    }
+    return now - state.lastChange >= quietMs;
+}
+"""
+
+
+class SettleDetector:
+    """
+    Decides when the UI has finished reacting to an action.
+
+    Modes:
+        dom:    DOM mutation and fetch/XHR quiescence, polled every animation frame
+        frames: two consecutive frame thumbnails that match (for canvas-rendered content)
+        fixed:  the original behaviour, load state plus a fixed one-second sleep
+
+    Every mode returns as soon as the page is settled, and never waits
+    longer than the configured ceiling.
+    """
+
+    def __init__(self, mode: Optional[str] = None, quiet_ms: Optional[int] = None, timeout_ms: Optional[int] = None, request_window_ms: Optional[int] = None):
+        self.mode = (mode or config.UI_SETTLE_MODE).lower()
+        if self.mode not in ("dom", "frames", "fixed"):
+            raise ValueError(f"Unknown settle mode '{self.mode}'")
+        self.quiet_ms = config.UI_SETTLE_QUIET_MS if quiet_ms is None else quiet_ms
+        self.timeout_ms = config.UI_SETTLE_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        self.request_window_ms = config.UI_SETTLE_REQUEST_WINDOW_MS if request_window_ms is None else request_window_ms
+        self._encoder = ScreenshotEncoder(format="png", tier="")
+        self._probed_pages = set()
+
+    def install(self, page):
+        """Install the DOM/network probe on a page (idempotent, only used in dom mode)"""
+        if self.mode != "dom" or id(page) in self._probed_pages:
+            return
+        page.add_init_script(SETTLE_PROBE_JS)
+        page.evaluate(SETTLE_PROBE_JS)
+        self._remember_probe(page)
+
+    async def install_async(self, page):
+        """install() for async Playwright pages"""
+        if self.mode != "dom" or id(page) in self._probed_pages:
+            return
+        await page.add_init_script(SETTLE_PROBE_JS)
+        await page.evaluate(SETTLE_PROBE_JS)
+        self._remember_probe(page)
+
+    def _remember_probe(self, page):
+        self._probed_pages.add(id(page))
+        page.on("close", lambda _: self._probed_pages.discard(id(page)))
+
+    def wait(self, page) -> float:
+        """
+        Block until the page has settled or the ceiling is reached.
+
+        Args:
+            page: Playwright page object
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout_ms / 1000
+        if self.mode == "fixed":
+            try:
+                page.wait_for_load_state(timeout=5000)
+            except Exception:
+                pass  # Ignore timeout if page hasn't navigated
+            time.sleep(1)
+        elif self.mode == "frames":
+            self._wait_frames(page, deadline)
+        else:
+            self._wait_dom(page, deadline)
+        return time.monotonic() - start
+
+    async def wait_async(self, page) -> float:
+        """
+        wait() for async Playwright pages; yields to the event loop while waiting.
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout_ms / 1000
+        if self.mode == "fixed":
+            try:
+                await page.wait_for_load_state(timeout=5000)
+            except Exception:
+                pass  # Ignore timeout if page hasn't navigated
+            await asyncio.sleep(1)
+        elif self.mode == "frames":
+            await self._wait_frames_async(page, deadline)
+        else:
+            await self._wait_dom_async(page, deadline)
+        return time.monotonic() - start
+
+    def _wait_dom(self, page, deadline: float):
+        """Poll the in-page probe once per animation frame"""
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return
+            try:
+                # Covers actions that started a navigation
+                page.wait_for_load_state("domcontentloaded", timeout=remaining_ms)
+                self.install(page)
+                remaining_ms = max(1, int((deadline - time.monotonic()) * 1000))
+                page.wait_for_function(
+                    SETTLED_JS,
+                    arg=[self.quiet_ms, self.request_window_ms],
+                    polling="raf",
+                    timeout=remaining_ms,
+                )
+                return
+            except Exception as e:
+                # The execution context is destroyed when a navigation starts mid-wait; try again on the new document
+                if "context was destroyed" not in str(e) and "navigation" not in str(e).lower():
+                    return
+
+    def _wait_frames(self, page, deadline: float):
+        """Wait for two consecutive matching frame thumbnails"""
+        previous = None
+        while time.monotonic() < deadline:
+            try:
+                current = self._encoder.fingerprint(page)
+            except Exception:
+                return
+            if previous is not None and fingerprint_distance(previous, current) <= config.UI_SETTLE_FRAME_TOLERANCE:
+                return
+            previous = current
+            time.sleep(min(self.quiet_ms / 1000, max(0.0, deadline - time.monotonic())))
+
+    async def _wait_dom_async(self, page, deadline: float):
+        """_wait_dom() for async Playwright pages"""
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=remaining_ms)
+                await self.install_async(page)
+                remaining_ms = max(1, int((deadline - time.monotonic()) * 1000))
+                await page.wait_for_function(
+                    SETTLED_JS,
+                    arg=[self.quiet_ms, self.request_window_ms],
+                    polling="raf",
+                    timeout=remaining_ms,
+                )
+                return
+            except Exception as e:
+                if "context was destroyed" not in str(e) and "navigation" not in str(e).lower():
+                    return
+
+    async def _wait_frames_async(self, page, deadline: float):
+        """_wait_frames() for async Playwright pages"""
+        previous = None
+        while time.monotonic() < deadline:
+            try:
+                current = await self._encoder.fingerprint_async(page)
+            except Exception:
+                return
+            if previous is not None and fingerprint_distance(previous, current) <= config.UI_SETTLE_FRAME_TOLERANCE:
+                return
+            previous = current
+            await asyncio.sleep(min(self.quiet_ms / 1000, max(0.0, deadline - time.monotonic())))
+
+
+# Detector used when no per-instance detector is given
+default_settle = SettleDetector()
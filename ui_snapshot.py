@@ -0,0 +1,177 @@
+"""
+UI Snapshots for the agent loop
+Compact text observations of the visible Docs UI (menus, toolbar buttons, dialogs, focus)
+sent alongside, or on quiet turns instead of, screenshots
+"""
+import json
+from typing import Any, Dict, Optional
+
+import config
+from conversation_history import SNAPSHOT_PREFIX
+
+# Collects the visible, labelled controls in one pass. Element IDs live in a WeakMap and the
+# previous snapshot in the page, so each call returns only what changed since the last one
+# (and nothing in the DOM is touched, so the settle probe doesn't notice). "fresh" tells the
+# caller the page state was lost (a new document) and the delta is a full snapshot.
+SNAPSHOT_JS = """
+(maxElements) => {
+    let state = window.__docbotSnapshot;
+    const fresh = !state;
+    if (fresh) state = window.__docbotSnapshot = { ids: new WeakMap(), next: 1, last: new Map() };
+    const width = window.innerWidth, height = window.innerHeight;
+    const containers = new Set(['menubar', 'toolbar', 'menu', 'dialog', 'alertdialog', 'listbox', 'tablist']);
+    const stateAttributes = [['aria-pressed', 'pressed'], ['aria-expanded', 'expanded'], ['aria-checked', 'checked'],
+                             ['aria-selected', 'selected'], ['aria-disabled', 'disabled']];
+    const grid = (value, size) => Math.round(Math.min(Math.max(value, 0), size) / size * 1000);
+    const describe = (element) => {
+        const role = element.getAttribute('role') || element.tagName.toLowerCase();
+        let name = element.getAttribute('aria-label') || element.getAttribute('title') || '';
+        if (!name && !containers.has(role)) name = element.innerText || element.value || element.placeholder || '';
+        return [role, name.replace(/\\s+/g, ' ').trim().slice(0, 60)];
+    };
+
+    const current = new Map();
+    const selector = '[role=menubar],[role=toolbar],[role=menu],[role=menuitem],[role=menuitemcheckbox],[role=menuitemradio],'
+        + '[role=button],[role=tab],[role=option],[role=checkbox],[role=radio],[role=combobox],[role=textbox],[role=listbox],'
+        + '[role=dialog],[role=alertdialog],[role=tooltip],button,input:not([type=hidden]),select,textarea,a[href]';
+    for (const element of document.querySelectorAll(selector)) {
+        const rect = element.getBoundingClientRect();
+        if (rect.width < 2 || rect.height < 2 || rect.bottom <= 0 || rect.right <= 0 || rect.top >= height || rect.left >= width) continue;
+        const style = getComputedStyle(element);
+        if (style.visibility === 'hidden' || style.display === 'none' || style.opacity === '0') continue;
+        const [role, name] = describe(element);
+        if (!name && !containers.has(role) && role !== 'textbox') continue;
+        const states = stateAttributes.filter(([attribute]) => element.getAttribute(attribute) === 'true').map(([, label]) => label);
+        let id = state.ids.get(element);
+        if (!id) { id = state.next++; state.ids.set(element, id); }
+        current.set(id, JSON.stringify([role, name, states.join(' '),
+            [grid(rect.left, width), grid(rect.top, height), grid(rect.right, width), grid(rect.bottom, height)]]));
+        if (current.size >= maxElements) break;
+    }
+
+    const changed = [], removed = [];
+    for (const [id, line] of current) if (state.last.get(id) !== line) changed.push([id, line]);
+    for (const id of state.last.keys()) if (!current.has(id)) removed.push(id);
+    state.last = current;
+
+    const active = document.activeElement;
+    const focused = active && active !== document.body ? describe(active) : null;
+    return { fresh, changed, removed, total: current.size, focused, title: document.title };
+}
+"""
+
+# Added to the teaching prompt when snapshots are sent
+SNAPSHOT_INSTRUCTIONS = """
+UI SNAPSHOTS: Some turns include a text snapshot of the visible controls (role, label, state and
+box as x1,y1,x2,y2 on the same 0-1000 grid as your actions). When a turn has no screenshot, the
+screen only changed as the snapshot shows: act on the boxes it lists."""
+
+
+class UiObservation:
+    """What the model is shown after a turn: the snapshot text, and whether to attach a screenshot"""
+
+    def __init__(self, text: Optional[str], screenshot: bool, changed: float):
+        self.text = text
+        self.screenshot = screenshot
+        self.changed = changed  # Fraction of the listed controls that changed since the previous snapshot
+
+
+class UiObserver:
+    """
+    Decides how the model observes the page after each turn.
+
+    Modes:
+        screenshot: a screenshot only (the original behaviour)
+        both:       a screenshot plus a UI snapshot
+        auto:       a UI snapshot every turn, plus a screenshot when the URL
+                    changed, the snapshot changed by more than change_threshold,
+                    or max_text_turns turns went by without one
+
+    Snapshots are incremental: the page returns only the controls that
+    changed since the last call and the full list is kept here, per page.
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_elements: Optional[int] = None, change_threshold: Optional[float] = None, max_text_turns: Optional[int] = None):
+        self.mode = (mode or config.OBSERVATION_MODE).lower()
+        if self.mode not in ("screenshot", "both", "auto"):
+            raise ValueError(f"Unknown observation mode '{self.mode}'")
+        self.max_elements = config.OBSERVATION_MAX_ELEMENTS if max_elements is None else max_elements
+        self.change_threshold = config.OBSERVATION_CHANGE_THRESHOLD if change_threshold is None else change_threshold
+        self.max_text_turns = config.OBSERVATION_MAX_TEXT_TURNS if max_text_turns is None else max_text_turns
+        self._elements: Dict[int, Dict[int, list]] = {}  # id(page) -> element ID -> [role, name, states, box]
+        self._last_url: Dict[int, str] = {}
+        self._text_turns: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "screenshot"
+
+    def observe(self, page, force_screenshot: bool = False) -> UiObservation:
+        """Snapshot the page and decide whether this turn also needs a screenshot"""
+        if not self.enabled:
+            return UiObservation(None, True, 1.0)
+        try:
+            delta = page.evaluate(SNAPSHOT_JS, self.max_elements)
+        except Exception as e:
+            print(f"UI snapshot error: {e}")
+            return UiObservation(None, True, 1.0)
+        return self._observation(page, delta, force_screenshot)
+
+    async def observe_async(self, page, force_screenshot: bool = False) -> UiObservation:
+        """observe() for async Playwright pages"""
+        if not self.enabled:
+            return UiObservation(None, True, 1.0)
+        try:
+            delta = await page.evaluate(SNAPSHOT_JS, self.max_elements)
+        except Exception as e:
+            print(f"UI snapshot error: {e}")
+            return UiObservation(None, True, 1.0)
+        return self._observation(page, delta, force_screenshot)
+
+    def forget(self, page):
+        """Drop what is known about a page (its next snapshot is sent in full, with a screenshot)"""
+        for table in (self._elements, self._last_url, self._text_turns):
+            table.pop(id(page), None)
+
+    def _observation(self, page, delta: Dict[str, Any], force_screenshot: bool) -> UiObservation:
+        key = id(page)
+        if key not in self._elements:
+            page.on("close", lambda _: self.forget(page))
+        elements = self._elements.setdefault(key, {})
+        if delta["fresh"]:
+            elements.clear()
+        for element_id in delta["removed"]:
+            elements.pop(element_id, None)
+        for element_id, line in delta["changed"]:
+            elements[element_id] = json.loads(line)
+        changed = (len(delta["changed"]) + len(delta["removed"])) / max(1, delta["total"] + len(delta["removed"]))
+
+        url = page.url
+        screenshot = (
+            self.mode == "both"
+            or force_screenshot
+            or delta["fresh"]
+            or url != self._last_url.get(key)
+            or changed > self.change_threshold
+            or self._text_turns.get(key, 0) >= self.max_text_turns
+        )
+        self._last_url[key] = url
+        self._text_turns[key] = 0 if screenshot else self._text_turns.get(key, 0) + 1
+        return UiObservation(self._render(elements, delta, url), screenshot, changed)
+
+    @staticmethod
+    def _render(elements: Dict[int, list], delta: Dict[str, Any], url: str) -> str:
+        """The snapshot as text, in reading order"""
+        lines = [f"{SNAPSHOT_PREFIX}: {delta.get('title') or 'untitled'} at {url}]"]
+        focused = delta.get("focused")
+        if focused:
+            lines.append(f'Focused: {focused[0]} "{focused[1]}"')
+        for role, name, states, box in sorted(elements.values(), key=lambda element: (element[3][1], element[3][0])):
+            label = f' "{name}"' if name else ""
+            state = f" ({states})" if states else ""
+            lines.append(f"{role}{label}{state} [{box[0]},{box[1]},{box[2]},{box[3]}]")
+        return "\n".join(lines)
+
+
+# Observer shared by the agent loops
+default_observer = UiObserver()
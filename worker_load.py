@@ -0,0 +1,191 @@
+"""
+Worker Load for LiveKit dispatch
+Reports how close the worker is to its browser capacity and turns rooms away when it is full
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import psutil
+
+import config
+from browser_pool import AsyncBrowserHost, BrowserPool, get_pool
+from demo_queue import DemoQueue, demo_queue
+
+# Seconds between event-loop lag probes, and how many recent probes count
+LAG_PROBE_INTERVAL = 0.25
+LAG_WINDOW = 8
+# Seconds an accepted room holds a page before its session has leased it
+RESERVATION_TTL = 30.0
+# Seconds a Chromium memory sample is reused (walking the process tree isn't free)
+MEMORY_SAMPLE_TTL = 2.0
+
+
+class LoopLagProbe:
+    """
+    Measures how late the event loops a worker depends on run their callbacks.
+
+    Each watched loop reschedules a tick every LAG_PROBE_INTERVAL; how much
+    later than asked it actually runs is that loop's lag. A blocked loop
+    stops ticking, so the time since its last tick counts as lag too. A
+    loop that is stopped (not running, but not closed either) isn't
+    blocked, so it is left out until it runs again.
+    """
+
+    def __init__(self):
+        self._loops: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+    def watch(self, loop: asyncio.AbstractEventLoop):
+        """Start probing a loop (idempotent; callable from any thread)"""
+        with self._lock:
+            if id(loop) in self._loops:
+                return
+            state = {"loop": loop, "lags": deque(maxlen=LAG_WINDOW), "last_tick": time.monotonic()}
+            self._loops[id(loop)] = state
+        loop.call_soon_threadsafe(self._tick, state, time.monotonic())
+
+    def lag(self) -> float:
+        """Worst recent lag in seconds across the watched loops"""
+        now = time.monotonic()
+        worst = 0.0
+        with self._lock:
+            for key, state in list(self._loops.items()):
+                if state["loop"].is_closed():
+                    del self._loops[key]
+                    continue
+                if not state["loop"].is_running():
+                    state["paused"] = True  # Its next tick is late because the loop was stopped, not blocked
+                    continue
+                stalled = now - state["last_tick"] - LAG_PROBE_INTERVAL
+                worst = max(worst, stalled, max(state["lags"], default=0.0))
+        return max(0.0, worst)
+
+    def _tick(self, state: dict, expected: float):
+        now = time.monotonic()
+        if not state.pop("paused", False):
+            state["lags"].append(max(0.0, now - expected))
+        state["last_tick"] = now
+        if not state["loop"].is_closed():
+            state["loop"].call_later(LAG_PROBE_INTERVAL, self._tick, state, now + LAG_PROBE_INTERVAL)
+
+
+class WorkerCapacity:
+    """
+    Load of this worker as LiveKit should see it, from browser-side state.
+
+    Each signal is scaled so 1.0 means saturated, and the load is the
+    highest of them (the resource that runs out first):
+
+        pages:   pages leased or promised to accepted rooms, out of those in service
+        demos:   demonstrations running, out of the pool's pages
+        memory:  Chromium's RSS against WORKER_BROWSER_MEMORY_MB, and the
+                 machine's memory against WORKER_SYSTEM_MEMORY_HIGH
+        lag:     event-loop lag against WORKER_MAX_LOOP_LAG_MS
+        cpu:     the machine's CPU
+
+    LiveKit stops dispatching to the worker once the load reaches
+    WORKER_LOAD_THRESHOLD; request() also turns away a room that arrives
+    anyway when no page is left for it.
+    """
+
+    def __init__(self, pool: Optional[BrowserPool] = None, queue: Optional[DemoQueue] = None, threshold: Optional[float] = None, browser_memory_mb: Optional[float] = None, system_memory_high: Optional[float] = None, max_loop_lag_ms: Optional[float] = None):
+        self._pool = pool
+        self.queue = queue or demo_queue
+        self.threshold = config.WORKER_LOAD_THRESHOLD if threshold is None else threshold
+        self.browser_memory_mb = config.WORKER_BROWSER_MEMORY_MB if browser_memory_mb is None else browser_memory_mb
+        self.system_memory_high = config.WORKER_SYSTEM_MEMORY_HIGH if system_memory_high is None else system_memory_high
+        self.max_loop_lag_ms = config.WORKER_MAX_LOOP_LAG_MS if max_loop_lag_ms is None else max_loop_lag_ms
+        self.probe = LoopLagProbe()
+        self._reservations: Dict[str, float] = {}  # Room name -> when its job was accepted
+        self._lock = threading.Lock()
+        self._memory_sample = (0.0, 0.0)  # (when, Chromium RSS in MB)
+        self._hosts_watched = False
+        psutil.cpu_percent()  # The first reading only sets the baseline the next one is measured from
+
+    @property
+    def pool(self) -> BrowserPool:
+        return self._pool or get_pool()
+
+    def signals(self) -> Dict[str, float]:
+        """Each load signal scaled to 0-1 (1.0 is saturated)"""
+        self._watch_loops()
+        pool = self.pool.stats()
+        in_service = pool["size"] - pool["out_of_service"]
+        sessions = set(self.pool.sessions())
+        reserved = self._reserved(sessions)
+        return {
+            "pages": 1.0 if in_service <= 0 else (pool["leased"] + reserved) / in_service,
+            "demos": self.queue.stats()["running"] / max(1, pool["size"]),
+            "memory": max(
+                self._browser_rss_mb() / self.browser_memory_mb if self.browser_memory_mb > 0 else 0.0,
+                psutil.virtual_memory().percent / 100 / self.system_memory_high,
+            ),
+            "lag": self.probe.lag() * 1000 / self.max_loop_lag_ms,
+            "cpu": psutil.cpu_percent() / 100,
+        }
+
+    def load(self) -> float:
+        """The worker's load, 0-1"""
+        return min(1.0, max(self.signals().values()))
+
+    async def request(self, job_request):
+        """LiveKit request_fnc: accept a room if there is capacity for it, reject it otherwise"""
+        signals = self.signals()
+        if signals["pages"] >= 1.0 or max(signals.values()) >= self.threshold:
+            busiest = max(signals, key=signals.get)
+            print(f"🚫 Rejecting room {job_request.room.name}: worker saturated ({busiest} {signals[busiest]:.2f})")
+            await job_request.reject()
+            return
+        with self._lock:
+            self._reservations[job_request.room.name] = time.monotonic()
+        await job_request.accept()
+
+    def _reserved(self, sessions) -> int:
+        """Accepted rooms that haven't leased their page yet"""
+        now = time.monotonic()
+        with self._lock:
+            for room, accepted_at in list(self._reservations.items()):
+                if room in sessions or now - accepted_at > RESERVATION_TTL:
+                    del self._reservations[room]
+            return len(self._reservations)
+
+    def _browser_rss_mb(self) -> float:
+        """Resident memory of the pool hosts' Chromium processes (browser, renderers, GPU), in MB"""
+        sampled_at, rss = self._memory_sample
+        if time.monotonic() - sampled_at < MEMORY_SAMPLE_TTL:
+            return rss
+        total = 0
+        for host in self.pool.hosts:
+            if not host.pid:
+                continue  # Not launched yet
+            try:
+                browser = psutil.Process(host.pid)
+                processes = [browser] + browser.children(recursive=True)
+            except psutil.Error:
+                continue  # Crashed; relaunched on its next recycle
+            for process in processes:
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass  # Exited while we looked
+        self._memory_sample = (time.monotonic(), total / 2**20)
+        return self._memory_sample[1]
+
+    def _watch_loops(self):
+        """Probe the loop asking for the load and the async hosts' loops, which drive the pages"""
+        try:
+            self.probe.watch(asyncio.get_running_loop())
+        except RuntimeError:
+            pass  # Called outside an event loop
+        if not self._hosts_watched:
+            for host in self.pool.hosts:
+                if isinstance(host, AsyncBrowserHost):
+                    self.probe.watch(host.loop)
+                    self._hosts_watched = True
+
+
+# Capacity model shared by the worker's load_fnc and request_fnc
+default_capacity = WorkerCapacity()